@@ -0,0 +1,309 @@
+"""
+Test de charge de l'API FastAPI (src/api/main.py).
+
+Seede un registre synthétique (code pays ZZ, voir benchmarks/synthetic.py) dans la base
+DATABASE_URL, démarre l'API sous uvicorn ou gunicorn avec le nombre de workers demandé
+(ou cible une API déjà démarrée avec --url), puis envoie un trafic mixte (liste, détail,
+historique, recherche approchée, filtrage par lot) depuis --concurrency clients simultanés.
+Rapporte par endpoint le débit et les latences p50/p95/p99, les compare aux objectifs
+--slo et ajoute le résultat à un historique JSONL.
+
+Utilisation (depuis la racine du dépôt):
+    PYTHONPATH=. python -m benchmarks.load_test --registry-size 100000 --workers 4 --concurrency 32 --duration 60
+    PYTHONPATH=. python -m benchmarks.load_test --server gunicorn --slo detail=50,list=300,screen=500
+    PYTHONPATH=. python -m benchmarks.load_test --url http://localhost:8000 --no-seed --country MA
+
+Le générateur de trafic tourne dans un seul processus asyncio: au-delà de quelques
+centaines de requêtes par seconde, vérifier qu'il ne sature pas lui-même un processeur.
+
+ATTENTION: utiliser une base dédiée (le registre seedé est supprimé à la fin, sauf --keep-data).
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+from benchmarks.synthetic import BENCH_COUNTRY_CODE, load_keywords, generate_registry, seed_registry, cleanup_registry
+from benchmarks.run_benchmarks import git_revision
+
+DEFAULT_HISTORY = "benchmarks/results/load_test.jsonl"
+# Poids par défaut du trafic: consultations unitaires majoritaires, filtrage par lot plus rare
+DEFAULT_MIX = "list=15,detail=35,history=10,search=25,screen=15"
+PERCENTILES = (50, 95, 99)
+# Identifiants et noms tirés du registre pour construire les requêtes
+SAMPLE_SIZE = 2000
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]]
+
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """'list=15,detail=35' -> {"list": 15.0, "detail": 35.0}"""
+    weights = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, value = part.partition("=")
+        weights[name.strip()] = float(value)
+    return weights
+
+
+def percentile(sorted_values: List[float], p: float) -> Optional[float]:
+    """Percentile par rang le plus proche d'une liste triée."""
+    if not sorted_values:
+        return None
+    rank = max(int(-(-p * len(sorted_values) // 100)), 1)
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def request_builders(country_code: str, pep_ids: List[str], names: List[str],
+                     registry_size: int, screen_size: int) -> Dict[str, Callable[[random.Random], Request]]:
+    """Constructeurs de requêtes (méthode, chemin, corps JSON) par endpoint."""
+    return {
+        "list": lambda rng: ("GET", f"/peps?country_code={country_code}&limit=100"
+                                    f"&offset={rng.randrange(0, max(registry_size - 100, 1))}", None),
+        "detail": lambda rng: ("GET", f"/peps/{rng.choice(pep_ids)}", None),
+        "history": lambda rng: ("GET", f"/peps/{rng.choice(pep_ids)}/history", None),
+        # Nom tronqué: recherche approchée plutôt qu'exacte
+        "search": lambda rng: ("GET", f"/peps/search?country_code={country_code}&q={quote(rng.choice(names)[:-1])}", None),
+        "screen": lambda rng: ("POST", "/peps/screen", {
+            "country_code": country_code,
+            "names": [rng.choice(names) for _ in range(screen_size)],
+        }),
+    }
+
+
+def sample_registry(country_code: str) -> Tuple[List[str], List[str], int]:
+    """Identifiants et noms d'un échantillon de PPE du pays, et taille du registre du pays."""
+    from src.db_connector import DBConnector
+    with DBConnector() as db:
+        rows = db.execute(
+            "SELECT id, master_name FROM pep_master WHERE country_code = %s LIMIT %s;",
+            (country_code, SAMPLE_SIZE), fetch=True
+        )
+        size = db.execute("SELECT COUNT(*) AS size FROM pep_master WHERE country_code = %s;", (country_code,), fetch=True)
+    if not rows:
+        raise RuntimeError(f"Aucun PPE pour le pays {country_code}: seeder le registre ou changer --country.")
+    return [str(row["id"]) for row in rows], [row["master_name"] for row in rows], size[0]["size"]
+
+
+def start_server(args) -> subprocess.Popen:
+    """Démarre l'API (uvicorn ou gunicorn avec gunicorn.conf.py) et attend qu'elle réponde."""
+    env = dict(os.environ)
+    if args.server == "gunicorn":
+        env.update(GUNICORN_BIND=f"{args.host}:{args.port}", WEB_CONCURRENCY=str(args.workers))
+        command = [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "src.api.main:app"]
+    else:
+        command = [sys.executable, "-m", "uvicorn", "src.api.main:app", "--host", args.host,
+                   "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"]
+    print(f"Démarrage de l'API ({args.server}, {args.workers} workers): {' '.join(command)}")
+    process = subprocess.Popen(command, env=env)
+
+    import httpx
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"L'API s'est arrêtée au démarrage (code {process.returncode}).")
+        try:
+            if httpx.get(f"http://{args.host}:{args.port}/openapi.json", timeout=1.0).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    stop_server(process)
+    raise RuntimeError(f"L'API ne répond pas après {args.startup_timeout}s.")
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+async def drive_traffic(base_url: str, builders: Dict[str, Callable[[random.Random], Request]],
+                        weights: Dict[str, float], concurrency: int, duration: float, warmup: float,
+                        seed: int, timeout: float) -> Tuple[Dict[str, List[float]], Dict[str, int], float]:
+    """
+    Envoie le trafic depuis concurrency clients pendant warmup + duration secondes.
+    Retourne les latences (secondes) et le nombre d'erreurs par endpoint (hors warmup),
+    ainsi que la durée de la mesure.
+    """
+    import httpx
+    endpoints = [name for name in weights if weights[name] > 0]
+    endpoint_weights = [weights[name] for name in endpoints]
+    latencies: Dict[str, List[float]] = {name: [] for name in endpoints}
+    errors: Dict[str, int] = {name: 0 for name in endpoints}
+    loop = asyncio.get_running_loop()
+    measure_from = loop.time() + warmup
+    stop_at = measure_from + duration
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+        async def user(worker: int):
+            rng = random.Random(seed * 1000 + worker)
+            while loop.time() < stop_at:
+                name = rng.choices(endpoints, weights=endpoint_weights)[0]
+                method, path, body = builders[name](rng)
+                started = loop.time()
+                try:
+                    response = await client.request(method, path, json=body)
+                    failed = response.status_code >= 400
+                except httpx.HTTPError:
+                    failed = True
+                finished = loop.time()
+                if started >= measure_from and finished <= stop_at:
+                    latencies[name].append(finished - started)
+                    if failed:
+                        errors[name] += 1
+
+        await asyncio.gather(*(user(worker) for worker in range(concurrency)))
+    return latencies, errors, duration
+
+
+def summarize(latencies: Dict[str, List[float]], errors: Dict[str, int], duration: float) -> Dict[str, Dict[str, Any]]:
+    """Débit, taux d'erreur et percentiles de latence (ms) par endpoint, et pour l'ensemble."""
+    series = dict(latencies)
+    series["total"] = [value for values in latencies.values() for value in values]
+    errors = {**errors, "total": sum(errors.values())}
+    report = {}
+    for name, values in series.items():
+        values = sorted(values)
+        report[name] = {
+            "requests": len(values),
+            "errors": errors[name],
+            "requests_per_second": round(len(values) / duration, 2) if duration > 0 else None,
+            "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else None,
+            **{f"p{p}_ms": round(percentile(values, p) * 1000, 2) if values else None for p in PERCENTILES},
+            "max_ms": round(values[-1] * 1000, 2) if values else None,
+        }
+    return report
+
+
+def check_slo(report: Dict[str, Dict[str, Any]], objectives: Dict[str, float], slo_percentile: int) -> List[str]:
+    """Endpoints dont la latence au percentile slo_percentile dépasse l'objectif (ms), ou en erreur."""
+    violations = []
+    key = f"p{slo_percentile}_ms"
+    for name, objective in objectives.items():
+        observed = report.get(name, {}).get(key)
+        if observed is None or observed > objective:
+            violations.append(f"{name} ({key}={observed} > {objective})")
+    for name, stats in report.items():
+        if name != "total" and stats["errors"]:
+            violations.append(f"{name} ({stats['errors']} erreurs)")
+    return violations
+
+
+def print_report(report: Dict[str, Dict[str, Any]]):
+    header = f"{'endpoint':<10} {'req':>8} {'err':>6} {'req/s':>9} " + " ".join(f"{f'p{p} ms':>9}" for p in PERCENTILES) + f" {'max ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report.items():
+        cells = [stats["requests_per_second"]] + [stats[f"p{p}_ms"] for p in PERCENTILES] + [stats["max_ms"]]
+        print(f"{name:<10} {stats['requests']:>8} {stats['errors']:>6} " + " ".join(
+            f"{value:>9.1f}" if value is not None else f"{'-':>9}" for value in cells
+        ))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge de l'API du registre PPE.")
+    parser.add_argument("--url", default=None, help="API déjà démarrée (par défaut: démarrée par le script)")
+    parser.add_argument("--server", choices=["uvicorn", "gunicorn"], default="uvicorn", help="Serveur démarré")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("WEB_CONCURRENCY", "4")), help="Workers du serveur")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=60.0, help="Délai maximal de démarrage de l'API (s)")
+    parser.add_argument("--registry-size", type=int, default=10000, help="Nombre de fiches seedées")
+    parser.add_argument("--no-seed", action="store_true", help="Utiliser le registre existant de --country")
+    parser.add_argument("--country", default=BENCH_COUNTRY_CODE, help="Code pays interrogé (ZZ: registre seedé)")
+    parser.add_argument("--keep-data", action="store_true", help="Ne pas supprimer le registre seedé à la fin")
+    parser.add_argument("--concurrency", type=int, default=16, help="Clients simultanés")
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée de la mesure (s)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Durée de chauffe exclue des mesures (s)")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Délai maximal d'une requête (s)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Poids des endpoints (défaut: {DEFAULT_MIX})")
+    parser.add_argument("--screen-size", type=int, default=50, help="Noms par requête de filtrage par lot")
+    parser.add_argument("--slo", default="", help="Objectifs de latence en ms par endpoint, ex. detail=50,total=200")
+    parser.add_argument("--slo-percentile", type=int, choices=PERCENTILES, default=95, help="Percentile des objectifs")
+    parser.add_argument("--seed", type=int, default=42, help="Graine du registre et du trafic")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="Fichier JSONL d'historique des résultats")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    weights = parse_weights(args.mix)
+    objectives = parse_weights(args.slo)
+    country_code = args.country.upper()
+
+    seeded = not args.no_seed
+    if seeded:
+        from src.db_connector import DBConnector
+        country_code = BENCH_COUNTRY_CODE
+        with DBConnector() as db:
+            cleanup_registry(db)
+            print(f"Seed du registre synthétique: {args.registry_size} fiches maîtres...")
+            seed_registry(db, generate_registry(args.registry_size, load_keywords(), seed=args.seed))
+
+    server = None
+    try:
+        pep_ids, names, registry_size = sample_registry(country_code)
+        builders = request_builders(country_code, pep_ids, names, registry_size, args.screen_size)
+        unknown = set(weights) - set(builders)
+        if unknown:
+            print(f"Endpoints inconnus dans --mix: {', '.join(sorted(unknown))}")
+            return 2
+
+        base_url = args.url
+        if base_url is None:
+            server = start_server(args)
+            base_url = f"http://{args.host}:{args.port}"
+
+        print(f"Trafic: {args.concurrency} clients, {args.warmup:.0f}s de chauffe puis {args.duration:.0f}s de mesure ({args.mix}).")
+        latencies, errors, duration = asyncio.run(drive_traffic(
+            base_url, builders, weights, args.concurrency, args.duration, args.warmup, args.seed, args.timeout
+        ))
+    finally:
+        if server is not None:
+            stop_server(server)
+        if seeded and not args.keep_data:
+            from src.db_connector import DBConnector
+            with DBConnector() as db:
+                cleanup_registry(db)
+
+    report = summarize(latencies, errors, duration)
+    print_report(report)
+    violations = check_slo(report, objectives, args.slo_percentile)
+
+    entry = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "params": {
+            "target": args.url or f"{args.server}:{args.workers}", "registry_size": registry_size,
+            "country": country_code, "concurrency": args.concurrency, "duration": args.duration,
+            "mix": weights, "screen_size": args.screen_size, "seed": args.seed,
+        },
+        "slo": {"percentile": args.slo_percentile, "objectives_ms": objectives, "violations": violations},
+        "results": report,
+    }
+    history_path = Path(args.history)
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"Résultats enregistrés dans {history_path}")
+
+    if violations:
+        print(f"Objectifs de latence non tenus: {', '.join(violations)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+"""
+Test d'équivalence du moteur de scoring vectorisé (src/etl/matching.py) avec
+l'implémentation historique fuzzywuzzy (boucle Python, "score > 85").
+
+Génère des paires de noms synthétiques (identiques, inversés, fautes de frappe,
+civilités, noms différents) et vérifie que les décisions de correspondance et le
+meilleur choix retenu sont identiques. Nécessite fuzzywuzzy et python-Levenshtein
+(le SequenceMatcher pur Python de fuzzywuzzy donne des ratios légèrement différents).
+
+Utilisation:
+    PYTHONPATH=. python -m benchmarks.matching_equivalence --names 2000
+"""
+import argparse
+import random
+import sys
+import time
+
+from benchmarks.synthetic import random_person
+from src.etl.matching import SIMILARITY_THRESHOLD, score_matrix, is_match, best_matches
+
+
+def mutate(name: str, rng: random.Random) -> str:
+    """Produit une variante réaliste d'un nom (faute, inversion, civilité, casse)."""
+    choice = rng.random()
+    if choice < 0.25:
+        i = rng.randrange(len(name))
+        return name[:i] + name[i + 1:]
+    if choice < 0.45:
+        return " ".join(reversed(name.split()))
+    if choice < 0.6:
+        return f"M. {name}"
+    if choice < 0.75:
+        return name.upper()
+    if choice < 0.9:
+        i = rng.randrange(len(name))
+        return name[:i] + rng.choice("aeiou") + name[i:]
+    return random_person(rng)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Équivalence rapidfuzz / fuzzywuzzy pour la déduplication.")
+    parser.add_argument("--names", type=int, default=1000, help="Nombre de noms du registre synthétique")
+    parser.add_argument("--queries", type=int, default=300, help="Nombre de noms recherchés")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    try:
+        import Levenshtein  # noqa: F401
+        from fuzzywuzzy import fuzz as legacy_fuzz
+    except ImportError:
+        print("fuzzywuzzy et python-Levenshtein sont requis: pip install fuzzywuzzy python-Levenshtein")
+        return 2
+
+    rng = random.Random(args.seed)
+    choices = [random_person(rng) for _ in range(args.names)]
+    queries = [mutate(rng.choice(choices), rng) for _ in range(args.queries)]
+    lowered_choices = [c.lower().strip() for c in choices]
+    lowered_queries = [q.lower().strip() for q in queries]
+
+    # Implémentation historique: boucle Python, meilleur score strictement supérieur à 85
+    start = time.perf_counter()
+    legacy_matrix = [[legacy_fuzz.token_sort_ratio(q, c) for c in lowered_choices] for q in lowered_queries]
+    legacy_seconds = time.perf_counter() - start
+    legacy_best = []
+    for row in legacy_matrix:
+        best, highest = None, SIMILARITY_THRESHOLD
+        for index, score in enumerate(row):
+            if score > highest:
+                best, highest = (index, score), score
+        legacy_best.append(best)
+
+    start = time.perf_counter()
+    matrix = score_matrix(lowered_queries, lowered_choices, score_cutoff=0)
+    vectorized_seconds = time.perf_counter() - start
+    vectorized_best = best_matches(lowered_queries, lowered_choices)
+    mask = is_match(matrix)
+
+    mismatches = 0
+    for i, query in enumerate(lowered_queries):
+        for j, choice in enumerate(lowered_choices):
+            legacy_decision = legacy_matrix[i][j] > SIMILARITY_THRESHOLD
+            if legacy_decision != bool(mask[i, j]):
+                mismatches += 1
+                print(f"Décision différente: '{query}' / '{choice}' (fuzzywuzzy={legacy_matrix[i][j]}, rapidfuzz={matrix[i, j]:.2f})")
+        if legacy_best[i] != vectorized_best[i]:
+            mismatches += 1
+            print(f"Meilleur choix différent pour '{query}': {legacy_best[i]} / {vectorized_best[i]}")
+
+    pairs = len(queries) * len(choices)
+    print(f"{pairs} paires comparées. fuzzywuzzy: {legacy_seconds:.3f}s, rapidfuzz cdist: {vectorized_seconds:.3f}s "
+          f"({legacy_seconds / max(vectorized_seconds, 1e-9):.0f}x).")
+    if mismatches:
+        print(f"ÉCHEC: {mismatches} différences.")
+        return 1
+    print("OK: décisions et meilleurs choix identiques.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
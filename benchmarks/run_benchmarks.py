@@ -0,0 +1,295 @@
+"""
+Suite de benchmarks reproductible du registre PPE.
+
+Mesure le débit de Transformer.extract_entities, EntityResolver.resolve,
+Loader.load_records, des exporteurs et des endpoints de l'API contre une base
+PostgreSQL locale (DATABASE_URL), puis enregistre les résultats dans un
+historique JSONL pour détecter les régressions d'une exécution à l'autre.
+
+Utilisation (depuis la racine du dépôt):
+    PYTHONPATH=. python -m benchmarks.run_benchmarks --registry-size 10000
+    PYTHONPATH=. python -m benchmarks.run_benchmarks --suites extract,match --articles 500
+
+ATTENTION: utiliser une base dédiée. Les données seedées utilisent le code pays
+fictif ZZ et sont supprimées à la fin, mais les benchmarks d'export lisent tout le registre.
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Dict, Any, Callable
+from urllib.parse import quote
+
+from benchmarks.synthetic import (
+    BENCH_COUNTRY_CODE, load_keywords, generate_articles, generate_registry,
+    seed_registry, cleanup_registry, random_person
+)
+
+SUITES = ["extract", "scoring", "match", "load", "export", "api"]
+DEFAULT_HISTORY = "benchmarks/results/history.jsonl"
+
+
+def timed(func: Callable[[], int]) -> Dict[str, Any]:
+    """Exécute func (qui retourne le nombre d'opérations) et calcule le débit."""
+    start = time.perf_counter()
+    ops = func()
+    seconds = time.perf_counter() - start
+    return {
+        "ops": ops,
+        "seconds": round(seconds, 6),
+        "ops_per_second": round(ops / seconds, 3) if seconds > 0 else None,
+    }
+
+
+def bench_config() -> Dict[str, Any]:
+    from src.config import Config
+    config = dict(Config("MA").data)
+    config["country_code"] = BENCH_COUNTRY_CODE
+    return config
+
+
+def bench_extract(args, keywords: List[str]) -> Dict[str, Any]:
+    from src.etl.transformer import Transformer
+    transformer = Transformer(bench_config())
+    articles = generate_articles(args.articles, keywords, seed=args.seed)
+
+    def run():
+        for article in articles:
+            transformer.extract_entities(article["content"])
+        return len(articles)
+
+    return timed(run)
+
+
+def bench_scoring(args, keywords: List[str]) -> Dict[str, Any]:
+    """Matrice de scores fuzzy (requêtes x registre) sans base de données."""
+    import random
+    from src.etl.matching import score_matrix, is_match
+    rng = random.Random(args.seed + 3)
+    choices = [random_person(rng).lower() for _ in range(args.registry_size)]
+    queries = [random_person(rng).lower() for _ in range(args.queries)]
+
+    def run():
+        is_match(score_matrix(queries, choices))
+        return len(queries)
+
+    return timed(run)
+
+
+def bench_match(args, keywords: List[str]) -> Dict[str, Any]:
+    import random
+    from src.etl.entity_resolution import EntityResolver
+    resolver = EntityResolver(BENCH_COUNTRY_CODE)
+    rng = random.Random(args.seed + 1)
+    names = [random_person(rng) for _ in range(args.queries)]
+
+    def run():
+        resolver.resolve(names)
+        return len(names)
+
+    return timed(run)
+
+
+def bench_load(args, keywords: List[str]) -> Dict[str, Any]:
+    from src.etl.loader import Loader
+    # Graine différente du registre seedé: uniquement des créations de PPE
+    records = list(generate_registry(args.load_records, keywords, seed=args.seed + 2))
+    loader = Loader(BENCH_COUNTRY_CODE)
+
+    def run():
+        loader.load_records(records)
+        return len(records)
+
+    return timed(run)
+
+
+def bench_export(args, keywords: List[str]) -> Dict[str, Any]:
+    from src.etl.exporter import Exporter
+    results = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        exporter = Exporter(output_dir=output_dir)
+        results["json"] = timed(lambda: _count_exported(exporter.generate_json_export()))
+        results["csv"] = timed(lambda: _count_exported(exporter.generate_csv_export()))
+    return results
+
+
+def _count_exported(path: str) -> int:
+    """Nombre d'enregistrements d'un export (lignes CSV ou éléments JSON)."""
+    if not path:
+        return 0
+    if path.endswith(".csv"):
+        with open(path, 'r', encoding='utf-8') as f:
+            return max(sum(1 for _ in f) - 1, 0)
+    with open(path, 'r', encoding='utf-8') as f:
+        return len(json.load(f))
+
+
+def bench_api(args, keywords: List[str]) -> Dict[str, Any]:
+    from fastapi.testclient import TestClient
+    from src.api.main import app
+    from src.db_connector import DBConnector
+
+    with DBConnector() as db:
+        rows = db.execute(
+            "SELECT id, master_name FROM pep_master WHERE country_code = %s LIMIT %s;",
+            (BENCH_COUNTRY_CODE, args.api_requests), fetch=True
+        )
+    pep_ids = [str(row["id"]) for row in rows] or ["00000000-0000-0000-0000-000000000000"]
+    names = [row["master_name"] for row in rows] or ["Aziz Akhannouch"]
+
+    client = TestClient(app)
+    endpoints = {
+        "list": lambda i: f"/peps?country_code={BENCH_COUNTRY_CODE}&limit=100&offset={(i * 100) % max(args.registry_size, 1)}",
+        "detail": lambda i: f"/peps/{pep_ids[i % len(pep_ids)]}",
+        "history": lambda i: f"/peps/{pep_ids[i % len(pep_ids)]}/history",
+        "search": lambda i: f"/peps/search?country_code={BENCH_COUNTRY_CODE}&q={quote(names[i % len(names)][:-1])}",
+        "last_updated": lambda i: "/metrics/last_updated",
+    }
+
+    results = {}
+    for name, build_url in endpoints.items():
+        def run(build_url=build_url):
+            for i in range(args.api_requests):
+                response = client.get(build_url(i))
+                if response.status_code >= 500:
+                    raise RuntimeError(f"{build_url(i)} a retourné {response.status_code}")
+            return args.api_requests
+        results[name] = timed(run)
+    return results
+
+
+BENCHMARKS = {
+    "extract": bench_extract,
+    "scoring": bench_scoring,
+    "match": bench_match,
+    "load": bench_load,
+    "export": bench_export,
+    "api": bench_api,
+}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def flatten(results: Dict[str, Any], prefix: str = "") -> Dict[str, Dict[str, Any]]:
+    """Aplatit {"export": {"json": {...}}} en {"export.json": {...}}."""
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if "ops_per_second" in value:
+            flat[name] = value
+        else:
+            flat.update(flatten(value, prefix=f"{name}."))
+    return flat
+
+
+def compare_with_previous(entry: Dict[str, Any], history_path: Path, tolerance: float) -> List[str]:
+    """Compare avec la dernière exécution de mêmes paramètres; retourne les régressions."""
+    if not history_path.exists():
+        return []
+    previous = None
+    with open(history_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            candidate = json.loads(line)
+            if candidate.get("params") == entry["params"]:
+                previous = candidate
+    if previous is None:
+        return []
+
+    regressions = []
+    current = flatten(entry["results"])
+    for name, old in flatten(previous["results"]).items():
+        new = current.get(name)
+        if not new or not old.get("ops_per_second") or not new.get("ops_per_second"):
+            continue
+        ratio = new["ops_per_second"] / old["ops_per_second"]
+        print(f"  {name}: {old['ops_per_second']:.1f} -> {new['ops_per_second']:.1f} ops/s ({ratio:.2f}x, réf. {previous['revision']})")
+        if ratio < 1 - tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du registre PPE.")
+    parser.add_argument("--suites", default=",".join(SUITES), help=f"Suites à exécuter ({','.join(SUITES)})")
+    parser.add_argument("--registry-size", type=int, default=10000, help="Nombre de fiches maîtres seedées (1k à 1M)")
+    parser.add_argument("--articles", type=int, default=200, help="Nombre d'articles synthétiques pour l'extraction")
+    parser.add_argument("--queries", type=int, default=50, help="Nombre de noms recherchés pour le matching")
+    parser.add_argument("--load-records", type=int, default=1000, help="Nombre d'enregistrements chargés par le Loader")
+    parser.add_argument("--api-requests", type=int, default=200, help="Nombre de requêtes par endpoint")
+    parser.add_argument("--seed", type=int, default=42, help="Graine des générateurs")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="Fichier JSONL d'historique des résultats")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Baisse de débit tolérée avant de signaler une régression")
+    parser.add_argument("--keep-data", action="store_true", help="Ne pas supprimer le registre seedé à la fin")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        print(f"Suites inconnues: {', '.join(sorted(unknown))}")
+        return 2
+
+    keywords = load_keywords()
+    needs_db = any(s in suites for s in ["match", "load", "export", "api"])
+
+    if needs_db:
+        from src.db_connector import DBConnector
+        with DBConnector() as db:
+            cleanup_registry(db)
+            print(f"Seed du registre synthétique: {args.registry_size} fiches maîtres...")
+            start = time.perf_counter()
+            seed_registry(db, generate_registry(args.registry_size, keywords, seed=args.seed))
+            print(f"Seed terminé en {time.perf_counter() - start:.1f}s.")
+
+    results = {}
+    try:
+        for suite in suites:
+            print(f"--- Benchmark: {suite} ---")
+            results[suite] = BENCHMARKS[suite](args, keywords)
+            print(json.dumps(results[suite], indent=2))
+    finally:
+        if needs_db and not args.keep_data:
+            from src.db_connector import DBConnector
+            with DBConnector() as db:
+                cleanup_registry(db)
+
+    entry = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": sys.version.split()[0],
+        "params": {
+            "suites": suites, "registry_size": args.registry_size, "articles": args.articles,
+            "queries": args.queries, "load_records": args.load_records,
+            "api_requests": args.api_requests, "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    history_path = Path(args.history)
+    print("--- Comparaison avec l'exécution précédente ---")
+    regressions = compare_with_previous(entry, history_path, args.tolerance)
+
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(history_path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(f"Résultats enregistrés dans {history_path}")
+
+    if regressions:
+        print(f"RÉGRESSIONS détectées (> {args.tolerance:.0%}): {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,232 @@
+"""
+Générateurs de données synthétiques pour les benchmarks: articles de presse
+marocains (texte politique/économique en français) et registres PPE de
+1 000 à 1 000 000 de fiches maîtres. Les générateurs sont déterministes
+(graine fixe) pour que les résultats soient comparables d'une exécution à l'autre.
+"""
+import io
+import json
+import random
+import re
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import List, Dict, Any, Iterator
+
+from src.etl.models import PepRecord, Position, TransformedRecord, dumps_str
+from src.etl.normalization import normalize_name
+from src.etl.partitions import ensure_partitions
+
+# Pays fictif réservé aux benchmarks: les données seedées ne se mélangent pas au registre réel
+BENCH_COUNTRY_CODE = "ZZ"
+
+FIRST_NAMES = [
+    "Aziz", "Mohamed", "Ahmed", "Youssef", "Hassan", "Abdellatif", "Nizar", "Saad", "Fouzi",
+    "Abdelouafi", "Mustapha", "Rachid", "Karim", "Driss", "Omar", "Khalid", "Said", "Hakim",
+    "Nadia", "Fatima", "Leila", "Amina", "Ghita", "Nabila", "Salma", "Khadija", "Zineb",
+    "Meriem", "Asmaa", "Hanane", "Latifa", "Samira", "Bouchra", "Imane", "Houda", "Yasmina"
+]
+
+LAST_NAMES = [
+    "Akhannouch", "El Othmani", "Benkirane", "Baraka", "Lekjaa", "Laftit", "Bourita", "Jouahri",
+    "Benmoussa", "Ouahbi", "Mezzour", "Fettah", "Benali", "El Alami", "Bennani", "Tazi", "Berrada",
+    "Chraibi", "El Fassi", "Kettani", "Sqalli", "Bensouda", "Lahlou", "Amrani", "Idrissi",
+    "Alaoui", "Belkhayat", "Guessous", "Benjelloun", "Sefrioui", "Ziani", "Ouazzani", "Hajji",
+    "Mansouri", "Cherkaoui", "Naciri", "Filali", "Rami", "Skalli", "Zniber"
+]
+
+INSTITUTIONS = [
+    "Ministère de l'Économie et des Finances", "Ministère de l'Intérieur", "Bank Al-Maghrib",
+    "Office Chérifien des Phosphates", "Caisse de Dépôt et de Gestion", "Chambre des Représentants",
+    "Cour des Comptes", "Wilaya de Casablanca-Settat", "Autorité Marocaine du Marché des Capitaux",
+    "Office National de l'Électricité et de l'Eau Potable", "Royal Air Maroc", "Conseil de la Région de Rabat-Salé-Kénitra"
+]
+
+SENTENCE_TEMPLATES = [
+    "{name}, {keyword} de {institution}, a présidé ce mardi une réunion consacrée au budget de l'année prochaine.",
+    "Le Conseil de gouvernement a annoncé la {keyword} de {name} à la tête de {institution}.",
+    "Selon nos sources, {name} aurait été reçu par le chef du gouvernement pour évoquer la situation de {institution}.",
+    "Lors de la séance plénière, {name} a défendu le projet de loi de finances face aux députés de l'opposition.",
+    "{name} a rappelé que {institution} poursuivra ses investissements dans les énergies renouvelables.",
+    "Le {keyword} {name} s'est entretenu avec une délégation européenne sur la coopération économique.",
+    "La nomination de {name} au {keyword} de {institution} a été saluée par les milieux d'affaires.",
+]
+
+FILLER_SENTENCES = [
+    "Le taux de croissance devrait atteindre 3,2% selon les prévisions de Bank Al-Maghrib.",
+    "Les négociations avec les partenaires sociaux reprendront la semaine prochaine à Rabat.",
+    "Le marché boursier de Casablanca a clôturé la séance en légère hausse.",
+    "Cette réforme s'inscrit dans le cadre du nouveau modèle de développement.",
+    "Plusieurs élus ont demandé la création d'une commission d'enquête parlementaire.",
+    "La région de Souss-Massa bénéficiera d'un programme d'investissement de 2 milliards de dirhams.",
+]
+
+MEDIA_SOURCES = [
+    ("Le360", "https://fr.le360.ma", 0.2),
+    ("Hespress", "https://fr.hespress.com", 0.2),
+    ("L'Economiste", "https://www.leconomiste.com", 0.15),
+    ("Le Matin", "https://lematin.ma", 0.15),
+]
+
+# URLs des articles de generate_articles(): <source>/bench/<seed>/<n>
+SYNTHETIC_URL_PATTERN = "^(" + "|".join(re.escape(url) for _, url, _ in MEDIA_SOURCES) + r")/bench/[0-9]+/[0-9]+$"
+
+
+def load_keywords(config_path: str = "config/ma.json") -> List[str]:
+    """Charge les mots-clés de fonction depuis la configuration pays."""
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f).get("keywords", [])
+
+
+def random_person(rng: random.Random) -> str:
+    """Génère un nom complet marocain (parfois avec deux prénoms)."""
+    first = rng.choice(FIRST_NAMES)
+    if rng.random() < 0.1:
+        first = f"{first} {rng.choice(FIRST_NAMES)}"
+    return f"{first} {rng.choice(LAST_NAMES)}"
+
+
+def generate_articles(count: int, keywords: List[str], seed: int = 42, sentences: int = 8) -> List[Dict[str, Any]]:
+    """
+    Génère des articles bruts au format attendu par Transformer.process_raw_data
+    (url, source_type, weight, content, publish_date).
+    """
+    rng = random.Random(seed)
+    base_date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    articles = []
+    for i in range(count):
+        source_name, source_url, weight = rng.choice(MEDIA_SOURCES)
+        title = rng.choice(SENTENCE_TEMPLATES).format(
+            name=random_person(rng), keyword=rng.choice(keywords), institution=rng.choice(INSTITUTIONS)
+        )
+        body = []
+        for _ in range(sentences):
+            if rng.random() < 0.5:
+                body.append(rng.choice(SENTENCE_TEMPLATES).format(
+                    name=random_person(rng), keyword=rng.choice(keywords), institution=rng.choice(INSTITUTIONS)
+                ))
+            else:
+                body.append(rng.choice(FILLER_SENTENCES))
+        articles.append({
+            "source_type": "media",
+            "source": source_name,
+            "url": f"{source_url}/bench/{seed}/{i}",
+            "weight": weight,
+            "content": f"{title} {' '.join(body)}",
+            "publish_date": (base_date + timedelta(days=rng.randint(0, 364))).strftime("%Y-%m-%d"),
+        })
+    return articles
+
+
+def generate_registry(count: int, keywords: List[str], seed: int = 42,
+                      country_code: str = BENCH_COUNTRY_CODE) -> Iterator[TransformedRecord]:
+    """
+    Génère (paresseusement) des enregistrements transformés au format produit par
+    Transformer.process_raw_data (TransformedRecord).
+    """
+    rng = random.Random(seed)
+    now = datetime(2025, 6, 1, tzinfo=timezone.utc).isoformat()
+    for _ in range(count):
+        pep_id = str(uuid.UUID(int=rng.getrandbits(128), version=4))
+        full_name = random_person(rng)
+        confidence_score = round(rng.choice([0.15, 0.2, 0.35, 0.6, 0.8, 1.0]), 2)
+        status = "active" if confidence_score >= 0.6 else "under_review"
+        record = PepRecord(
+            id=pep_id,
+            full_name=full_name,
+            aliases=[full_name.lower()],
+            gender=None,
+            date_of_birth=None,
+            nationality=[country_code],
+            relationship_type=["DomesticPEP"],
+            current_positions=[Position(
+                title=rng.choice(keywords),
+                institution=rng.choice(INSTITUTIONS),
+                source_id=None
+            )],
+            past_positions=[],
+            family_members=[],
+            associated_entities=[],
+            sanctions_match=[],
+            confidence_score=confidence_score,
+            source_documents=[],
+            first_seen=now,
+            last_updated=now,
+            status=status,
+            notes="Enregistrement synthétique (benchmark)."
+        )
+        yield TransformedRecord(pep_id=pep_id, record=record, confidence_score=confidence_score, status=status)
+
+
+def seed_registry(db, records: Iterator[TransformedRecord], country_code: str = BENCH_COUNTRY_CODE,
+                  chunk_size: int = 50000) -> int:
+    """
+    Charge un registre synthétique via COPY (pep_master, pep_version puis pep_alias),
+    sans passer par le Loader, pour pouvoir seeder un million de fiches rapidement.
+    """
+    total = 0
+    chunk = []
+    for item in records:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            total += _copy_chunk(db, chunk, country_code)
+            chunk = []
+    if chunk:
+        total += _copy_chunk(db, chunk, country_code)
+    return total
+
+
+def _copy_chunk(db, chunk: List[TransformedRecord], country_code: str) -> int:
+    masters = io.StringIO()
+    versions = io.StringIO()
+    aliases = io.StringIO()
+    for item in chunk:
+        version_id = str(uuid.uuid5(uuid.NAMESPACE_URL, item.pep_id))
+        record = item.record
+        masters.write("\t".join([item.pep_id, country_code, _copy_escape(record.full_name), version_id, record.last_updated]) + "\n")
+        versions.write("\t".join([
+            version_id, item.pep_id, _copy_escape(dumps_str(record)),
+            str(item.confidence_score), item.status, record.first_seen, record.last_updated,
+            f"[{record.last_updated},)"
+        ]) + "\n")
+        aliases.write("\t".join([
+            item.pep_id, country_code, _copy_escape(record.full_name), _copy_escape(normalize_name(record.full_name)),
+            version_id, record.first_seen, record.last_updated
+        ]) + "\n")
+    masters.seek(0)
+    versions.seek(0)
+    aliases.seek(0)
+    dates = [datetime.fromisoformat(item.record.last_updated) for item in chunk]
+    ensure_partitions(db, min(dates), max(dates))
+    db.cursor.copy_expert("COPY pep_master (id, country_code, master_name, current_version_id, current_version_at) FROM STDIN", masters)
+    db.cursor.copy_expert(
+        "COPY pep_version (version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated, valid_period) FROM STDIN",
+        versions
+    )
+    db.cursor.copy_expert(
+        "COPY pep_alias (pep_id, country_code, alias_name, alias_norm, first_seen_version_id, first_seen, last_seen) FROM STDIN",
+        aliases
+    )
+    return len(chunk)
+
+
+def _copy_escape(value: str) -> str:
+    """Échappe une valeur pour le format texte de COPY."""
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def cleanup_registry(db, country_code: str = BENCH_COUNTRY_CODE):
+    """Supprime toutes les données seedées pour le pays de benchmark."""
+    db.execute("DELETE FROM change_event WHERE country_code = %s;", (country_code,))
+    db.execute("DELETE FROM audit_log WHERE pep_id IN (SELECT id FROM pep_master WHERE country_code = %s);", (country_code,))
+    db.execute("DELETE FROM audit_log_archive WHERE pep_id IN (SELECT id FROM pep_master WHERE country_code = %s);", (country_code,))
+    db.execute("DELETE FROM pep_alias WHERE country_code = %s;", (country_code,))
+    db.execute("UPDATE pep_master SET current_version_id = NULL WHERE country_code = %s;", (country_code,))
+    db.execute("DELETE FROM pep_version WHERE pep_id IN (SELECT id FROM pep_master WHERE country_code = %s);", (country_code,))
+    db.execute("DELETE FROM pep_version_archive WHERE pep_id IN (SELECT id FROM pep_master WHERE country_code = %s);", (country_code,))
+    db.execute("DELETE FROM pep_master WHERE country_code = %s;", (country_code,))
+    # Articles synthétiques seulement: hôtes de MEDIA_SOURCES, chemin /bench/<seed>/<n> (generate_articles)
+    # et chemin Data Lake du pays de benchmark (Transformer.process_raw_data)
+    db.execute(
+        "DELETE FROM source_document WHERE url ~ %s AND raw_data_path LIKE %s;",
+        (SYNTHETIC_URL_PATTERN, f"/data/{country_code}/%")
+    )
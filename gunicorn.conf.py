@@ -0,0 +1,16 @@
+# Configuration Gunicorn de l'API (utilisée par le Dockerfile)
+import os
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# L'application est importée une seule fois dans le processus maître puis
+# partagée en copy-on-write par les workers (démarrage plus rapide).
+preload_app = True
+
+def on_starting(server):
+    # Objets de l'application préchargée sortis des générations suivies par le GC: sinon le
+    # premier cycle de collecte dans chaque worker toucherait leurs pages et annulerait le partage
+    import gc
+    gc.freeze()
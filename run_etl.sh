@@ -5,4 +5,5 @@ export PYTHONPATH=$PYTHONPATH:/app/src
 cd /app
 
 # Exécuter le script ETL avec le bon PYTHONPATH
-PYTHONPATH=. /usr/local/bin/python src/etl/pep_etl.py
+# Tous les pays de config/, un processus par pays (voir src/etl/orchestrator.py)
+PYTHONPATH=. /usr/local/bin/python -m src.etl.orchestrator
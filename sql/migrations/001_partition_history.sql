@@ -0,0 +1,92 @@
+-- Migration: partitionnement mensuel de pep_version (last_updated) et audit_log (timestamp)
+-- pour une base créée avec une version antérieure de schema.sql.
+-- Les tables existantes sont renommées, recopiées dans les tables partitionnées puis supprimées.
+-- À exécuter dans une fenêtre de maintenance (le pipeline ETL et l'API doivent être arrêtés).
+
+BEGIN;
+
+ALTER TABLE pep_master ADD COLUMN IF NOT EXISTS current_version_at TIMESTAMP WITH TIME ZONE;
+
+-- Libère les noms des tables et de leurs clés primaires
+ALTER TABLE audit_log RENAME TO audit_log_unpartitioned;
+ALTER INDEX audit_log_pkey RENAME TO audit_log_unpartitioned_pkey;
+ALTER TABLE pep_version RENAME TO pep_version_unpartitioned;
+ALTER INDEX pep_version_pkey RENAME TO pep_version_unpartitioned_pkey;
+
+CREATE TABLE pep_version (
+    version_id UUID NOT NULL,
+    pep_id UUID NOT NULL REFERENCES pep_master(id),
+    data_jsonb JSONB NOT NULL,
+    confidence_score NUMERIC(3, 2) NOT NULL,
+    status VARCHAR(32) NOT NULL,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_updated TIMESTAMP WITH TIME ZONE NOT NULL,
+    PRIMARY KEY (version_id, last_updated)
+) PARTITION BY RANGE (last_updated);
+
+-- La séquence existante (audit_log_log_id_seq) est conservée pour ne pas réutiliser d'identifiants
+CREATE TABLE audit_log (
+    log_id BIGINT NOT NULL DEFAULT nextval('audit_log_log_id_seq'),
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    pep_id UUID REFERENCES pep_master(id),
+    version_id UUID,
+    actor VARCHAR(128) NOT NULL,
+    source TEXT,
+    reason TEXT NOT NULL,
+    PRIMARY KEY (log_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+ALTER SEQUENCE audit_log_log_id_seq OWNED BY audit_log.log_id;
+
+-- Une partition par mois, du plus ancien mois présent jusqu'à trois mois après le mois courant (UTC)
+DO $$
+DECLARE
+    first_month DATE;
+    month DATE;
+    tbl TEXT;
+BEGIN
+    SELECT date_trunc('month', LEAST(
+        (SELECT MIN(last_updated) FROM pep_version_unpartitioned),
+        (SELECT MIN(timestamp) FROM audit_log_unpartitioned),
+        NOW()
+    ) AT TIME ZONE 'UTC')::date INTO first_month;
+
+    FOR month IN
+        SELECT generate_series(first_month, date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months', INTERVAL '1 month')::date
+    LOOP
+        FOREACH tbl IN ARRAY ARRAY['pep_version', 'audit_log'] LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                tbl || to_char(month, '"_y"YYYY"m"MM'), tbl,
+                month::text || ' 00:00:00+00', (month + INTERVAL '1 month')::date::text || ' 00:00:00+00'
+            );
+        END LOOP;
+    END LOOP;
+END $$;
+
+INSERT INTO pep_version (version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated)
+SELECT version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated
+FROM pep_version_unpartitioned;
+
+INSERT INTO audit_log (log_id, timestamp, pep_id, version_id, actor, source, reason)
+SELECT log_id, COALESCE(timestamp, NOW()), pep_id, version_id, actor, source, reason
+FROM audit_log_unpartitioned;
+
+UPDATE pep_master pm SET current_version_at = pv.last_updated
+FROM pep_version pv
+WHERE pv.version_id = pm.current_version_id;
+
+DROP TABLE audit_log_unpartitioned;
+DROP TABLE pep_version_unpartitioned;
+
+-- Index (créés sur la table parente, donc sur chaque partition)
+CREATE INDEX IF NOT EXISTS idx_pep_version_pep_id ON pep_version(pep_id);
+CREATE INDEX IF NOT EXISTS idx_pep_version_last_updated ON pep_version(last_updated DESC);
+CREATE INDEX IF NOT EXISTS idx_pep_version_pep_updated ON pep_version(pep_id, last_updated DESC, version_id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_log_pep_id ON audit_log(pep_id);
+CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_log_pep_timestamp ON audit_log(pep_id, timestamp DESC, log_id DESC);
+
+COMMIT;
+
+ANALYZE pep_version;
+ANALYZE audit_log;
@@ -0,0 +1,52 @@
+-- Migration: périodes de validité des versions (requêtes "à date", paramètre as_of de l'API)
+-- pour une base migrée avec 001_partition_history.sql.
+-- Chaque version est valide de son last_updated jusqu'au last_updated de la version suivante du même PPE.
+
+BEGIN;
+
+ALTER TABLE pep_version ADD COLUMN IF NOT EXISTS valid_period TSTZRANGE;
+ALTER TABLE pep_version_archive ADD COLUMN IF NOT EXISTS valid_period TSTZRANGE;
+
+-- Historique chaud et archivé ordonnés ensemble (la version suivante peut être dans l'autre table)
+CREATE TEMP TABLE tmp_version_validity ON COMMIT DROP AS
+SELECT version_id, last_updated,
+       tstzrange(last_updated, LEAD(last_updated) OVER (PARTITION BY pep_id ORDER BY last_updated, version_id)) AS valid_period
+FROM (
+    SELECT version_id, pep_id, last_updated FROM pep_version
+    UNION ALL
+    SELECT version_id, pep_id, last_updated FROM pep_version_archive
+) AS versions;
+
+UPDATE pep_version pv SET valid_period = t.valid_period
+FROM tmp_version_validity t
+WHERE pv.version_id = t.version_id AND pv.last_updated = t.last_updated;
+
+UPDATE pep_version_archive pva SET valid_period = t.valid_period
+FROM tmp_version_validity t
+WHERE pva.version_id = t.version_id;
+
+ALTER TABLE pep_version ALTER COLUMN valid_period SET NOT NULL;
+ALTER TABLE pep_version_archive ALTER COLUMN valid_period SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_pep_version_valid_period ON pep_version USING GIST (valid_period);
+CREATE INDEX IF NOT EXISTS idx_pep_version_archive_valid_period ON pep_version_archive USING GIST (valid_period);
+
+CREATE OR REPLACE FUNCTION close_replaced_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE pep_version
+    SET valid_period = tstzrange(lower(valid_period), GREATEST(lower(valid_period), NEW.current_version_at))
+    WHERE version_id = OLD.current_version_id
+      AND last_updated = OLD.current_version_at
+      AND upper_inf(valid_period);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_close_replaced_version ON pep_master;
+CREATE TRIGGER trg_close_replaced_version
+AFTER UPDATE OF current_version_id ON pep_master
+FOR EACH ROW
+WHEN (OLD.current_version_id IS DISTINCT FROM NEW.current_version_id AND OLD.current_version_id IS NOT NULL)
+EXECUTE FUNCTION close_replaced_version();
+
+COMMIT;
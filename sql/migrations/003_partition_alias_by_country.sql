@@ -0,0 +1,61 @@
+-- Migration: partitionnement de pep_alias par pays (PARTITION BY LIST (country_code))
+-- pour une base créée avec une version antérieure de schema.sql.
+-- Une partition par pays présent, plus pep_alias_default pour les pays sans partition;
+-- les partitions des nouveaux pays sont créées par le loader (src/etl/partitions.ensure_country_partitions).
+-- À exécuter dans une fenêtre de maintenance (le pipeline ETL et l'API doivent être arrêtés).
+
+BEGIN;
+
+-- Libère les noms de la table, de ses contraintes et de ses index
+ALTER TABLE pep_alias RENAME TO pep_alias_unpartitioned;
+ALTER INDEX pep_alias_pkey RENAME TO pep_alias_unpartitioned_pkey;
+ALTER INDEX pep_alias_pep_id_alias_norm_key RENAME TO pep_alias_unpartitioned_pep_id_alias_norm_key;
+ALTER INDEX idx_pep_alias_country_norm RENAME TO idx_pep_alias_unpartitioned_country_norm;
+ALTER INDEX idx_pep_alias_norm_trgm RENAME TO idx_pep_alias_unpartitioned_norm_trgm;
+ALTER INDEX idx_pep_alias_norm_tokens RENAME TO idx_pep_alias_unpartitioned_norm_tokens;
+
+-- La séquence existante (pep_alias_alias_id_seq) est conservée pour ne pas réutiliser d'identifiants
+CREATE TABLE pep_alias (
+    alias_id BIGINT NOT NULL DEFAULT nextval('pep_alias_alias_id_seq'),
+    pep_id UUID NOT NULL REFERENCES pep_master(id),
+    country_code VARCHAR(2) NOT NULL,
+    alias_name TEXT NOT NULL,
+    alias_norm TEXT NOT NULL,
+    first_seen_version_id UUID,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (alias_id, country_code),
+    UNIQUE (country_code, pep_id, alias_norm)
+) PARTITION BY LIST (country_code);
+ALTER SEQUENCE pep_alias_alias_id_seq OWNED BY pep_alias.alias_id;
+
+CREATE TABLE pep_alias_default PARTITION OF pep_alias DEFAULT;
+
+-- Une partition par pays présent (codes pays de deux lettres, voir partitions.country_partition_name)
+DO $$
+DECLARE
+    cc TEXT;
+BEGIN
+    FOR cc IN SELECT DISTINCT country_code FROM pep_alias_unpartitioned WHERE country_code ~ '^[A-Za-z]{2}$' LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF pep_alias FOR VALUES IN (%L)',
+            'pep_alias_' || lower(cc), cc
+        );
+    END LOOP;
+END $$;
+
+INSERT INTO pep_alias (alias_id, pep_id, country_code, alias_name, alias_norm, first_seen_version_id, first_seen, last_seen)
+SELECT alias_id, pep_id, country_code, alias_name, alias_norm, first_seen_version_id, first_seen, last_seen
+FROM pep_alias_unpartitioned;
+
+DROP TABLE pep_alias_unpartitioned;
+
+-- Index (créés sur la table parente, donc sur chaque partition pays)
+CREATE INDEX IF NOT EXISTS idx_pep_alias_country_norm ON pep_alias(country_code, alias_norm);
+CREATE INDEX IF NOT EXISTS idx_pep_alias_norm_trgm ON pep_alias USING GIN (alias_norm gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS idx_pep_alias_norm_tokens ON pep_alias USING GIN (string_to_array(alias_norm, ' '));
+CREATE INDEX IF NOT EXISTS idx_pep_master_country ON pep_master(country_code);
+
+COMMIT;
+
+ANALYZE pep_alias;
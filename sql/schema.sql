@@ -17,32 +17,60 @@ CREATE TABLE IF NOT EXISTS pep_master (
     id UUID PRIMARY KEY,
     country_code VARCHAR(2) NOT NULL, -- Pour la modularité par pays
     master_name VARCHAR(255) NOT NULL,
-    current_version_id UUID -- Clé étrangère vers la version la plus récente dans pep_version
+    current_version_id UUID, -- Clé étrangère vers la version la plus récente dans pep_version
+    current_version_at TIMESTAMP WITH TIME ZONE -- last_updated de cette version (élagage des partitions de pep_version)
 );
 
 -- Table 3: pep_version
 -- Historique des versions (immuable) de chaque enregistrement PPE.
+-- Partitionnée par mois sur last_updated (partitions pep_version_yAAAAmMM, voir src/etl/partitions.py).
 CREATE TABLE IF NOT EXISTS pep_version (
-    version_id UUID PRIMARY KEY,
+    version_id UUID NOT NULL,
     pep_id UUID NOT NULL REFERENCES pep_master(id),
     data_jsonb JSONB NOT NULL, -- Contient le corps complet de l'enregistrement PPE (point 5)
     confidence_score NUMERIC(3, 2) NOT NULL,
     status VARCHAR(32) NOT NULL, -- 'active', 'former', 'under_review'
     first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
-    last_updated TIMESTAMP WITH TIME ZONE NOT NULL
-);
+    last_updated TIMESTAMP WITH TIME ZONE NOT NULL,
+    -- Période de validité [création, remplacement): borne supérieure ouverte pour la version courante
+    valid_period TSTZRANGE NOT NULL,
+    PRIMARY KEY (version_id, last_updated) -- La clé de partitionnement fait partie de la clé primaire
+) PARTITION BY RANGE (last_updated);
 
 -- Table 4: audit_log
 -- Journal d'audit pour chaque modification ou action significative.
+-- Partitionnée par mois sur timestamp (partitions audit_log_yAAAAmMM).
+-- version_id n'a pas de clé étrangère: version_id seul n'est plus une clé unique de pep_version.
 CREATE TABLE IF NOT EXISTS audit_log (
-    log_id BIGSERIAL PRIMARY KEY,
-    timestamp TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    log_id BIGSERIAL NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
     pep_id UUID REFERENCES pep_master(id),
-    version_id UUID REFERENCES pep_version(version_id),
+    version_id UUID,
     actor VARCHAR(128) NOT NULL, -- 'System', 'Human', 'ETL_Process'
     source TEXT, -- URL ou nom du processus ETL
-    reason TEXT NOT NULL -- Description de l'action (e.g., 'Nouveau PEP créé', 'Changement de poste')
-);
+    reason TEXT NOT NULL, -- Description de l'action (e.g., 'Nouveau PEP créé', 'Changement de poste')
+    PRIMARY KEY (log_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Partitions mensuelles du mois courant et des trois mois suivants (UTC). Les mois
+-- suivants sont créés par le loader et par python -m src.etl.maintenance partitions.
+DO $$
+DECLARE
+    month DATE;
+    tbl TEXT;
+BEGIN
+    FOR month IN
+        SELECT generate_series(date_trunc('month', NOW() AT TIME ZONE 'UTC'), date_trunc('month', NOW() AT TIME ZONE 'UTC') + INTERVAL '3 months', INTERVAL '1 month')::date
+    LOOP
+        FOREACH tbl IN ARRAY ARRAY['pep_version', 'audit_log'] LOOP
+            EXECUTE format(
+                'CREATE TABLE IF NOT EXISTS %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                tbl || to_char(month, '"_y"YYYY"m"MM'), tbl,
+                month::text || ' 00:00:00+00', (month + INTERVAL '1 month')::date::text || ' 00:00:00+00'
+            );
+        END LOOP;
+    END LOOP;
+END $$;
 
 -- Index pour optimiser les requêtes
 CREATE INDEX IF NOT EXISTS idx_pep_version_pep_id ON pep_version(pep_id);
@@ -54,3 +82,257 @@ CREATE INDEX IF NOT EXISTS idx_audit_log_timestamp ON audit_log(timestamp DESC);
 -- Mise à jour de la clé current_version_id dans pep_master après l'insertion dans pep_version
 -- Note: En production, ceci serait géré par une fonction/trigger ou directement par la logique de l'application.
 -- Pour la simulation, nous considérons que la logique ETL gère cette mise à jour.
+
+-- Table 5: etl_run
+-- Statistiques de chaque exécution du pipeline ETL (durées par étape et compteurs).
+-- Les endpoints /metrics lisent la dernière ligne de cette table au lieu de parcourir pep_version.
+CREATE TABLE IF NOT EXISTS etl_run (
+    run_id UUID PRIMARY KEY,
+    country_code VARCHAR(2) NOT NULL,
+    started_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    finished_at TIMESTAMP WITH TIME ZONE,
+    status VARCHAR(32) NOT NULL, -- 'running', 'success', 'failed'
+    duration_seconds NUMERIC(12, 3),
+    stage_durations JSONB NOT NULL DEFAULT '{}'::jsonb, -- {"extract": 12.3, "transform": 4.5, ...}
+    items_crawled INTEGER NOT NULL DEFAULT 0,
+    entities_extracted INTEGER NOT NULL DEFAULT 0,
+    dedup_hits INTEGER NOT NULL DEFAULT 0,
+    versions_created INTEGER NOT NULL DEFAULT 0,
+    versions_skipped INTEGER NOT NULL DEFAULT 0,
+    extra_counters JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_run_country_finished ON etl_run(country_code, finished_at DESC);
+CREATE INDEX IF NOT EXISTS idx_pep_version_last_updated ON pep_version(last_updated DESC);
+
+-- Table 6: pep_alias
+-- Tous les noms sous lesquels un PPE a été rapporté (toutes versions, toutes variantes extraites).
+-- alias_norm est la forme normalisée (src/etl/normalization.normalize_name) utilisée pour le matching.
+-- Partitionnée par pays: une partition (et des index de noms) par pays, créée par le loader
+-- (src/etl/partitions.ensure_country_partitions); pep_alias_default reçoit les autres pays.
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE TABLE IF NOT EXISTS pep_alias (
+    alias_id BIGSERIAL,
+    pep_id UUID NOT NULL REFERENCES pep_master(id),
+    country_code VARCHAR(2) NOT NULL,
+    alias_name TEXT NOT NULL, -- Forme telle que rapportée par la source
+    alias_norm TEXT NOT NULL, -- Forme normalisée (clé de recherche)
+    first_seen_version_id UUID, -- Première version dans laquelle l'alias apparaît
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    last_seen TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (alias_id, country_code),
+    UNIQUE (country_code, pep_id, alias_norm)
+) PARTITION BY LIST (country_code);
+
+CREATE TABLE IF NOT EXISTS pep_alias_default PARTITION OF pep_alias DEFAULT;
+
+-- B-tree pour les recherches exactes, GIN trigramme pour les recherches approchées (%, LIKE, similarity),
+-- créés sur chaque partition pays
+CREATE INDEX IF NOT EXISTS idx_pep_alias_country_norm ON pep_alias(country_code, alias_norm);
+CREATE INDEX IF NOT EXISTS idx_pep_alias_norm_trgm ON pep_alias USING GIN (alias_norm gin_trgm_ops);
+-- GIN sur les jetons du nom: blocage par jeton entier de la résolution d'entités (opérateur &&)
+CREATE INDEX IF NOT EXISTS idx_pep_alias_norm_tokens ON pep_alias USING GIN (string_to_array(alias_norm, ' '));
+-- Registres par pays (exports et listes de l'API filtrés par country_code)
+CREATE INDEX IF NOT EXISTS idx_pep_master_country ON pep_master(country_code);
+
+-- Pagination par clé de l'historique et du journal d'audit (API /peps/{id}/versions et /audit)
+CREATE INDEX IF NOT EXISTS idx_pep_version_pep_updated ON pep_version(pep_id, last_updated DESC, version_id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_log_pep_timestamp ON audit_log(pep_id, timestamp DESC, log_id DESC);
+
+-- Tables 7 et 8: pep_version_archive, audit_log_archive
+-- Stockage froid des versions anciennes déplacées par la compaction (python -m src.etl.maintenance compact)
+-- et des entrées d'audit qui les référencent. La version courante d'un PPE n'est jamais archivée.
+-- Partitionnées par année, comme l'historique chaud par mois (partitions pep_version_archive_yAAAA et
+-- audit_log_archive_yAAAA, créées par la compaction: voir src/etl/partitions.ensure_archive_partitions).
+CREATE TABLE IF NOT EXISTS pep_version_archive (
+    version_id UUID NOT NULL,
+    pep_id UUID NOT NULL REFERENCES pep_master(id),
+    data_jsonb JSONB NOT NULL,
+    confidence_score NUMERIC(3, 2) NOT NULL,
+    status VARCHAR(32) NOT NULL,
+    first_seen TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_updated TIMESTAMP WITH TIME ZONE NOT NULL,
+    valid_period TSTZRANGE NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (version_id, last_updated)
+) PARTITION BY RANGE (last_updated);
+
+CREATE TABLE IF NOT EXISTS audit_log_archive (
+    log_id BIGINT NOT NULL,
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    pep_id UUID REFERENCES pep_master(id),
+    version_id UUID, -- Version de pep_version_archive (sans clé étrangère, comme audit_log)
+    actor VARCHAR(128) NOT NULL,
+    source TEXT,
+    reason TEXT NOT NULL,
+    archived_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (log_id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+CREATE INDEX IF NOT EXISTS idx_pep_version_archive_pep_updated ON pep_version_archive(pep_id, last_updated DESC, version_id DESC);
+CREATE INDEX IF NOT EXISTS idx_audit_log_archive_pep_timestamp ON audit_log_archive(pep_id, timestamp DESC, log_id DESC);
+
+-- Requêtes "à date" (as_of): version valide à un instant donné (valid_period @> instant)
+CREATE INDEX IF NOT EXISTS idx_pep_version_valid_period ON pep_version USING GIST (valid_period);
+CREATE INDEX IF NOT EXISTS idx_pep_version_archive_valid_period ON pep_version_archive USING GIST (valid_period);
+
+-- Clôture de la période de validité de la version remplacée lorsque pep_master pointe
+-- vers une nouvelle version (quel que soit le backend: COPY/UPDATE ou fonction load_version_plan)
+CREATE OR REPLACE FUNCTION close_replaced_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE pep_version
+    SET valid_period = tstzrange(lower(valid_period), GREATEST(lower(valid_period), NEW.current_version_at))
+    WHERE version_id = OLD.current_version_id
+      AND last_updated = OLD.current_version_at
+      AND upper_inf(valid_period);
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_close_replaced_version ON pep_master;
+CREATE TRIGGER trg_close_replaced_version
+AFTER UPDATE OF current_version_id ON pep_master
+FOR EACH ROW
+WHEN (OLD.current_version_id IS DISTINCT FROM NEW.current_version_id AND OLD.current_version_id IS NOT NULL)
+EXECUTE FUNCTION close_replaced_version();
+
+-- Table 9: change_event
+-- Flux de changements (outbox) alimenté par le loader dans la transaction d'écriture des versions.
+-- Consommé par l'API (/changes, /changes/stream) via event_id croissant; NOTIFY pep_changes réveille les abonnés.
+CREATE TABLE IF NOT EXISTS change_event (
+    event_id BIGSERIAL PRIMARY KEY,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    country_code VARCHAR(2) NOT NULL,
+    pep_id UUID NOT NULL REFERENCES pep_master(id),
+    version_id UUID, -- Rattaché à la version conservée par la compaction; peut désigner une version archivée
+    event_type VARCHAR(32) NOT NULL, -- 'pep_created', 'version_created'
+    payload JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+CREATE INDEX IF NOT EXISTS idx_change_event_country_id ON change_event(country_code, event_id);
+CREATE INDEX IF NOT EXISTS idx_change_event_created_at ON change_event(created_at);
+
+-- Les transactions qui publient des événements sont sérialisées (verrou consultatif pris avant
+-- l'attribution des event_id): les identifiants deviennent visibles dans l'ordre croissant et
+-- un abonné qui reprend après son dernier event_id ne manque aucun événement.
+CREATE OR REPLACE FUNCTION change_event_serialize() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('change_event'));
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION change_event_notify() RETURNS TRIGGER AS $$
+BEGIN
+    -- Délivré à la validation de la transaction (et fusionné si répété)
+    PERFORM pg_notify('pep_changes', '');
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_change_event_serialize ON change_event;
+CREATE TRIGGER trg_change_event_serialize
+BEFORE INSERT ON change_event
+FOR EACH STATEMENT
+EXECUTE FUNCTION change_event_serialize();
+
+DROP TRIGGER IF EXISTS trg_change_event_notify ON change_event;
+CREATE TRIGGER trg_change_event_notify
+AFTER INSERT ON change_event
+FOR EACH STATEMENT
+EXECUTE FUNCTION change_event_notify();
+
+-- Table 10: crawl_page_stats
+-- Statistiques par page de départ des spiders (rubrique, flux RSS), utilisées par le planificateur
+-- de crawl (src/etl/scheduler.py) pour estimer le taux de changement et le rendement de chaque page.
+CREATE TABLE IF NOT EXISTS crawl_page_stats (
+    country_code VARCHAR(2) NOT NULL,
+    page_url TEXT NOT NULL,
+    spider VARCHAR(64) NOT NULL,
+    source_type VARCHAR(32) NOT NULL,
+    weight NUMERIC(3, 2) NOT NULL DEFAULT 0,
+    fetches INTEGER NOT NULL DEFAULT 0,
+    changes INTEGER NOT NULL DEFAULT 0, -- fetchs dont la liste de liens différait du fetch précédent
+    observed_days NUMERIC(12, 4) NOT NULL DEFAULT 0, -- somme des intervalles entre fetchs successifs
+    yield_avg NUMERIC(10, 3), -- nouvelles mentions de PPE par fetch (moyenne mobile exponentielle)
+    cost_avg NUMERIC(10, 3), -- requêtes par fetch (la page et les articles suivis)
+    last_signature CHAR(40), -- empreinte SHA-1 des liens de la page au dernier fetch
+    last_crawled_at TIMESTAMP WITH TIME ZONE,
+    last_changed_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (country_code, page_url)
+);
+
+-- Table 11: etl_checkpoint
+-- Points de reprise des exécutions du pipeline (src/etl/checkpoints.py): items collectés (extract),
+-- enregistrements transformés (transform) et marqueurs des lots chargés (load, écrits dans la
+-- transaction du lot). Supprimés à la fin d'une exécution réussie (par run_id), ou au démarrage
+-- suivant du pays au-delà de l'âge de reprise (PEP_ETL_RESUME_MAX_AGE_HOURS).
+CREATE TABLE IF NOT EXISTS etl_checkpoint (
+    run_id UUID NOT NULL,
+    country_code VARCHAR(2) NOT NULL,
+    stage VARCHAR(16) NOT NULL, -- 'extract', 'transform', 'load'
+    batch_no INTEGER NOT NULL,
+    payload JSONB, -- lot d'items ou d'enregistrements (NULL pour les marqueurs de chargement)
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (run_id, stage, batch_no)
+);
+
+CREATE INDEX IF NOT EXISTS idx_etl_checkpoint_country_created ON etl_checkpoint(country_code, created_at DESC);
+
+-- Chargement d'un lot par le backend Supabase (src/etl/storage.SupabaseBackend), appelé via
+-- PostgREST (rpc): le plan de versioning du lot (maîtres, versions, mises à jour des maîtres,
+-- audit, alias, événements) et son marqueur de reprise sont écrits dans une seule transaction,
+-- comme le lot COPY du backend PostgreSQL. Retourne FALSE sans rien écrire si le marqueur du
+-- lot existe déjà (lot chargé par une tentative précédente dont la réponse a été perdue).
+CREATE OR REPLACE FUNCTION load_version_plan(plan JSONB) RETURNS BOOLEAN AS $$
+BEGIN
+    IF plan->'checkpoint' IS NOT NULL AND jsonb_typeof(plan->'checkpoint') = 'object' THEN
+        INSERT INTO etl_checkpoint (run_id, country_code, stage, batch_no)
+        VALUES ((plan->'checkpoint'->>'run_id')::uuid, plan->'checkpoint'->>'country_code', 'load',
+                (plan->'checkpoint'->>'batch_no')::integer)
+        ON CONFLICT (run_id, stage, batch_no) DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN FALSE;
+        END IF;
+    END IF;
+
+    INSERT INTO pep_master (id, country_code, master_name, current_version_id, current_version_at)
+    SELECT id, country_code, master_name, current_version_id, current_version_at
+    FROM jsonb_to_recordset(plan->'master_inserts')
+         AS m(id UUID, country_code VARCHAR(2), master_name VARCHAR(255), current_version_id UUID, current_version_at TIMESTAMPTZ);
+
+    INSERT INTO pep_version (version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated, valid_period)
+    SELECT version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated, valid_period
+    FROM jsonb_to_recordset(plan->'versions')
+         AS v(version_id UUID, pep_id UUID, data_jsonb JSONB, confidence_score NUMERIC(3, 2), status VARCHAR(32),
+              first_seen TIMESTAMPTZ, last_updated TIMESTAMPTZ, valid_period TSTZRANGE);
+
+    -- Le trigger trg_close_replaced_version clôture les versions remplacées
+    UPDATE pep_master pm
+    SET current_version_id = u.current_version_id, current_version_at = u.current_version_at
+    FROM jsonb_to_recordset(plan->'master_updates') AS u(id UUID, current_version_id UUID, current_version_at TIMESTAMPTZ)
+    WHERE pm.id = u.id;
+
+    INSERT INTO audit_log (timestamp, pep_id, version_id, actor, source, reason)
+    SELECT timestamp, pep_id, version_id, actor, source, reason
+    FROM jsonb_to_recordset(plan->'audits')
+         AS a(timestamp TIMESTAMPTZ, pep_id UUID, version_id UUID, actor VARCHAR(128), source TEXT, reason TEXT);
+
+    -- Même règle que src/etl/aliases.upsert_aliases: un alias déjà connu met seulement à jour last_seen
+    INSERT INTO pep_alias (pep_id, country_code, alias_name, alias_norm, first_seen_version_id, first_seen, last_seen)
+    SELECT DISTINCT ON (pep_id, alias_norm) pep_id, country_code, alias_name, alias_norm,
+           first_seen_version_id, first_seen, last_seen
+    FROM jsonb_to_recordset(plan->'aliases')
+         AS al(pep_id UUID, country_code VARCHAR(2), alias_name TEXT, alias_norm TEXT,
+               first_seen_version_id UUID, first_seen TIMESTAMPTZ, last_seen TIMESTAMPTZ)
+    ORDER BY pep_id, alias_norm, first_seen
+    ON CONFLICT (country_code, pep_id, alias_norm) DO UPDATE SET last_seen = GREATEST(pep_alias.last_seen, EXCLUDED.last_seen);
+
+    INSERT INTO change_event (created_at, country_code, pep_id, version_id, event_type, payload)
+    SELECT created_at, country_code, pep_id, version_id, event_type, payload
+    FROM jsonb_to_recordset(plan->'events')
+         AS e(created_at TIMESTAMPTZ, country_code VARCHAR(2), pep_id UUID, version_id UUID, event_type VARCHAR(32), payload JSONB);
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,119 @@
+"""
+Flux de changements du registre (table change_event, alimentée par le loader).
+
+Un seul LISTEN pep_changes par processus (ChangeNotifier, thread dédié) réveille les
+abonnés Server-Sent Events; chaque abonné relit ensuite la table à partir de son dernier
+event_id. La reprise après déconnexion utilise l'en-tête Last-Event-ID (ou ?since=).
+"""
+import asyncio
+import select
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+import psycopg2
+from starlette.concurrency import run_in_threadpool
+from src.config import DB_CONFIG
+from src.db_connector import DBConnector
+from src.etl.models import dumps_str
+
+CHANGE_CHANNEL = "pep_changes"
+# Commentaire SSE envoyé sans événement pour garder la connexion ouverte (proxys)
+HEARTBEAT_SECONDS = 15
+CHANGE_BATCH_SIZE = 500
+
+def fetch_changes(country_code: Optional[str], since: int, limit: int = CHANGE_BATCH_SIZE) -> List[Dict[str, Any]]:
+    """Événements d'event_id strictement supérieur à since, dans l'ordre."""
+    query = """
+    SELECT event_id, created_at, country_code, pep_id, version_id, event_type, payload
+    FROM change_event
+    WHERE event_id > %s AND (%s::text IS NULL OR country_code = %s)
+    ORDER BY event_id
+    LIMIT %s;
+    """
+    with DBConnector() as db:
+        return db.execute(query, (since, country_code, country_code, limit), fetch=True)
+
+def latest_event_id() -> int:
+    with DBConnector() as db:
+        result = db.execute("SELECT COALESCE(MAX(event_id), 0) AS event_id FROM change_event;", fetch=True)
+    return result[0]['event_id']
+
+def format_sse(row: Dict[str, Any]) -> str:
+    """Sérialise un événement au format text/event-stream."""
+    data = dumps_str(row)
+    return f"id: {row['event_id']}\nevent: {row['event_type']}\ndata: {data}\n\n"
+
+class ChangeNotifier:
+    """Écoute NOTIFY pep_changes sur une connexion dédiée et réveille les abonnés asyncio."""
+
+    def __init__(self, channel: str = CHANGE_CHANNEL, reconnect_delay: float = 5.0):
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self._subscribers: Set[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = set()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def subscribe(self) -> asyncio.Event:
+        event = asyncio.Event()
+        with self._lock:
+            self._subscribers.add((asyncio.get_running_loop(), event))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._listen, name="change-notifier", daemon=True)
+                self._thread.start()
+        return event
+
+    def unsubscribe(self, event: asyncio.Event):
+        with self._lock:
+            self._subscribers = {(loop, e) for loop, e in self._subscribers if e is not event}
+
+    def _wake_all(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, event in subscribers:
+            loop.call_soon_threadsafe(event.set)
+
+    def _listen(self):
+        while True:
+            conn = None
+            try:
+                conn = psycopg2.connect(**DB_CONFIG)
+                conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+                with conn.cursor() as cursor:
+                    cursor.execute(f"LISTEN {self.channel};")
+                # Des événements ont pu être publiés pendant une reconnexion
+                self._wake_all()
+                while True:
+                    if select.select([conn], [], [], HEARTBEAT_SECONDS) == ([], [], []):
+                        continue
+                    conn.poll()
+                    if conn.notifies:
+                        conn.notifies.clear()
+                        self._wake_all()
+            except Exception as e:
+                print(f"Flux de changements: connexion LISTEN perdue ({e}), reconnexion dans {self.reconnect_delay}s.")
+                if conn is not None:
+                    conn.close()
+                time.sleep(self.reconnect_delay)
+
+notifier = ChangeNotifier()
+
+async def stream_changes(country_code: Optional[str], since: Optional[int]) -> AsyncIterator[str]:
+    """Générateur SSE: envoie les événements après since, puis attend les notifications."""
+    wakeup = notifier.subscribe()
+    try:
+        last_id = since if since is not None else await run_in_threadpool(latest_event_id)
+        yield f"retry: {HEARTBEAT_SECONDS * 1000}\n\n"
+        while True:
+            rows = await run_in_threadpool(fetch_changes, country_code, last_id)
+            for row in rows:
+                last_id = row['event_id']
+                yield format_sse(row)
+            if len(rows) == CHANGE_BATCH_SIZE:
+                continue
+            try:
+                await asyncio.wait_for(wakeup.wait(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": heartbeat\n\n"
+            wakeup.clear()
+    finally:
+        notifier.unsubscribe(wakeup)
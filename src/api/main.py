@@ -1,50 +1,196 @@
-from fastapi import FastAPI, HTTPException, Query
-from typing import List, Dict, Any, Optional
+import base64
+import itertools
+import json
+import uuid
+from datetime import datetime, timezone
+from fastapi import Body, FastAPI, Header, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from typing import List, Dict, Any, Optional, Tuple, Callable, Iterable, Iterator
 from src.db_connector import DBConnector
+from src.api.change_feed import CHANGE_BATCH_SIZE, fetch_changes, stream_changes
+from src.etl.models import dumps, loads
+from src.etl.normalization import normalize_name
+
+class FastJSONResponse(JSONResponse):
+    """Réponse JSON sérialisée par le sérialiseur commun du projet (orjson s'il est installé)."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class RawJSONResponse(Response):
+    """Corps JSON déjà sérialisé (documents data_jsonb::text rendus par PostgreSQL)."""
+    media_type = "application/json"
 
 app = FastAPI(
     title="PEP Registry API - Morocco",
     description="API REST pour l'accès au registre des Personnes Politiquement Exposées (PPE) marocaines, avec historique et auditabilité.",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=FastJSONResponse
 )
 
+# Taille de page par défaut de l'historique des versions et du journal d'audit
+HISTORY_PAGE_SIZE = 50
+# Lignes lues par aller-retour du curseur serveur lors de la diffusion d'une liste
+STREAM_BATCH_SIZE = 500
+# Noms acceptés par requête de filtrage par lot (/peps/screen)
+MAX_SCREEN_NAMES = 1000
+
+# Historique complet des versions (chaud et archivé), pour les requêtes à date et include_archived
+ALL_VERSIONS = """(
+    SELECT version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated, valid_period FROM pep_version
+    UNION ALL
+    SELECT version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated, valid_period FROM pep_version_archive
+)"""
+
+def as_utc(value: datetime) -> datetime:
+    """Une date sans fuseau horaire est interprétée en UTC."""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+def json_array(documents: Iterable[str]) -> bytes:
+    """Tableau JSON construit à partir de documents déjà sérialisés, sans les décoder."""
+    return b"[" + ",".join(documents).encode("utf-8") + b"]"
+
+def stream_json_array(query: str, params: tuple) -> Iterator[bytes]:
+    """
+    Diffuse un tableau JSON formé de la première colonne (texte JSON) des lignes de query,
+    lues par curseur serveur: la liste n'est ni décodée ni chargée entièrement en mémoire.
+    Le premier fragment (b"[") n'est produit qu'une fois le premier lot lu, pour que
+    l'appelant puisse encore répondre 500 si la requête échoue.
+    """
+    with DBConnector() as db:
+        cursor = db.conn.cursor(name="stream_json_array")
+        cursor.execute(query, params)
+        rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        yield b"["
+        separator = b""
+        while rows:
+            yield separator + ",".join(row[0] for row in rows).encode("utf-8")
+            separator = b","
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+        yield b"]"
+        cursor.close()
+
+def encode_cursor(timestamp: datetime, row_id: Any) -> str:
+    """Curseur de pagination opaque: position (horodatage, identifiant) de la dernière ligne renvoyée."""
+    payload = json.dumps([timestamp.isoformat(), str(row_id)])
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, id_type: Callable[[str], Any] = str) -> Tuple[str, Any]:
+    """Décode un curseur; id_type convertit (et valide) l'identifiant (uuid.UUID, int...)."""
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        datetime.fromisoformat(timestamp)
+        return timestamp, str(id_type(row_id))
+    except (ValueError, TypeError, AttributeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Curseur de pagination invalide.")
+
+def fetch_version_page(db: DBConnector, pep_id: str, limit: int, cursor: Optional[str] = None,
+                       include_archived: bool = False) -> Dict[str, Any]:
+    """
+    Page de l'historique des versions, de la plus récente à la plus ancienne.
+    Pagination par clé (last_updated, version_id) via l'index idx_pep_version_pep_updated:
+    le coût d'une page ne dépend pas de la longueur de l'historique.
+    """
+    source = f"{ALL_VERSIONS} AS versions" if include_archived else "pep_version"
+    query = f"SELECT version_id, confidence_score, status, first_seen, last_updated FROM {source} WHERE pep_id = %s"
+    params: List[Any] = [pep_id]
+    if cursor:
+        # La borne simple sur last_updated permet l'élagage des partitions mensuelles
+        timestamp, version_id = decode_cursor(cursor, uuid.UUID)
+        query += " AND last_updated <= %s::timestamptz AND (last_updated, version_id) < (%s::timestamptz, %s::uuid)"
+        params.extend([timestamp, timestamp, version_id])
+    query += " ORDER BY last_updated DESC, version_id DESC LIMIT %s;"
+    params.append(limit + 1)
+    rows = db.execute(query, tuple(params), fetch=True)
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]['last_updated'], items[-1]['version_id']) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def fetch_audit_page(db: DBConnector, pep_id: str, limit: int, cursor: Optional[str] = None,
+                     include_archived: bool = False) -> Dict[str, Any]:
+    """Page du journal d'audit, de l'entrée la plus récente à la plus ancienne (clé: timestamp, log_id)."""
+    source = "audit_log"
+    if include_archived:
+        source = """(
+            SELECT log_id, timestamp, pep_id, version_id, actor, source, reason FROM audit_log
+            UNION ALL
+            SELECT log_id, timestamp, pep_id, version_id, actor, source, reason FROM audit_log_archive
+        ) AS audit"""
+    query = f"SELECT log_id, timestamp, version_id, actor, source, reason FROM {source} WHERE pep_id = %s"
+    params: List[Any] = [pep_id]
+    if cursor:
+        timestamp, log_id = decode_cursor(cursor, int)
+        query += " AND timestamp <= %s::timestamptz AND (timestamp, log_id) < (%s::timestamptz, %s::bigint)"
+        params.extend([timestamp, timestamp, log_id])
+    query += " ORDER BY timestamp DESC, log_id DESC LIMIT %s;"
+    params.append(limit + 1)
+    rows = db.execute(query, tuple(params), fetch=True)
+    items = rows[:limit]
+    next_cursor = encode_cursor(items[-1]['timestamp'], items[-1]['log_id']) if len(rows) > limit else None
+    return {"items": items, "next_cursor": next_cursor}
+
+def normalize_country_code(country_code: Optional[str]) -> Optional[str]:
+    """Code pays à deux lettres en majuscules, comme dans pep_master et pep_alias ("ma" -> "MA")."""
+    if country_code is None:
+        return None
+    country_code = country_code.strip().upper()
+    if len(country_code) != 2 or not country_code.isascii() or not country_code.isalpha():
+        raise HTTPException(status_code=400, detail="Code pays invalide.")
+    return country_code
+
+def pep_exists(db: DBConnector, pep_id: str) -> bool:
+    return bool(db.execute("SELECT 1 FROM pep_master WHERE id = %s;", (pep_id,), fetch=True))
+
+def fetch_current_document(db: DBConnector, pep_id: str, as_of: Optional[datetime] = None) -> Optional[str]:
+    """
+    Version actuelle d'un PEP, ou version valide à as_of (index GiST sur valid_period),
+    en texte JSON tel que rendu par PostgreSQL (data_jsonb::text).
+    """
+    if as_of is not None:
+        # Version valide à la date demandée (last_updated <= as_of élague les partitions ultérieures)
+        query = f"""
+        SELECT pv.data_jsonb::text AS document
+        FROM {ALL_VERSIONS} AS pv
+        WHERE pv.pep_id = %s AND pv.last_updated <= %s AND pv.valid_period @> %s::timestamptz
+        ORDER BY pv.last_updated DESC
+        LIMIT 1;
+        """
+        rows = db.execute(query, (pep_id, as_of, as_of), fetch=True)
+    else:
+        query = """
+        SELECT pv.data_jsonb::text AS document
+        FROM pep_master pm
+        JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+        WHERE pm.id = %s;
+        """
+        rows = db.execute(query, (pep_id,), fetch=True)
+    return rows[0]['document'] if rows else None
+
 # Fonction utilitaire pour récupérer les données d'un PEP
-def fetch_pep_details(pep_id: str, fetch_history: bool = False) -> Optional[Dict[str, Any]]:
-    """Récupère les détails du PEP à partir de la base de données."""
+def fetch_pep_details(pep_id: str, fetch_history: bool = False, history_limit: int = HISTORY_PAGE_SIZE,
+                      as_of: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """
+    Récupère les détails du PEP à partir de la base de données (version actuelle, ou
+    version valide à la date as_of).
+    Avec fetch_history, ajoute la première page de l'historique des versions et du journal
+    d'audit (history_limit lignes) et les curseurs des pages suivantes.
+    """
     try:
         with DBConnector() as db:
-            # Récupérer la version actuelle
-            query_current = """
-            SELECT pv.data_jsonb
-            FROM pep_master pm
-            JOIN pep_version pv ON pm.current_version_id = pv.version_id
-            WHERE pm.id = %s;
-            """
-            current_data = db.execute(query_current, (pep_id,), fetch=True)
-            
-            if not current_data:
+            document = fetch_current_document(db, pep_id, as_of)
+            if document is None:
                 return None
             
-            result = current_data[0]['data_jsonb']
+            result = loads(document)
             
             if fetch_history:
-                # Récupérer l'historique des versions
-                query_history = """
-                SELECT version_id, confidence_score, status, last_updated
-                FROM pep_version
-                WHERE pep_id = %s
-                ORDER BY last_updated DESC;
-                """
-                result['version_history'] = db.execute(query_history, (pep_id,), fetch=True)
-                
-                # Récupérer l'audit log
-                query_audit = """
-                SELECT timestamp, actor, source, reason
-                FROM audit_log
-                WHERE pep_id = %s
-                ORDER BY timestamp DESC;
-                """
-                result['audit_log'] = db.execute(query_audit, (pep_id,), fetch=True)
+                versions = fetch_version_page(db, pep_id, history_limit)
+                result['version_history'] = versions['items']
+                result['version_history_next_cursor'] = versions['next_cursor']
+
+                audit = fetch_audit_page(db, pep_id, history_limit)
+                result['audit_log'] = audit['items']
+                result['audit_log_next_cursor'] = audit['next_cursor']
                 
             return result
             
@@ -58,77 +204,400 @@ async def list_peps(
     status: str = Query(None, description="Filtrer par statut (active, former, under_review)"),
     min_confidence: float = Query(None, description="Score de confiance minimum (0.0 à 1.0)"),
     limit: int = Query(100, description="Nombre maximum de résultats"),
-    offset: int = Query(0, description="Décalage pour la pagination")
+    offset: int = Query(0, description="Décalage pour la pagination"),
+    as_of: Optional[datetime] = Query(None, description="Date (ISO 8601, UTC par défaut): état du registre à cette date")
 ):
     """
-    Récupère une liste paginée des enregistrements PPE.
+    Récupère une liste paginée des enregistrements PPE (versions actuelles, ou versions
+    valides à la date as_of). Les documents sont diffusés tels que PostgreSQL les rend,
+    sans décodage ni ré-encodage.
     """
+    country_code = normalize_country_code(country_code)
+    if as_of is not None:
+        as_of = as_utc(as_of)
+        base_query = f"""
+        SELECT pv.data_jsonb::text
+        FROM pep_master pm
+        JOIN {ALL_VERSIONS} AS pv ON pv.pep_id = pm.id
+        WHERE pm.country_code = %s AND pv.last_updated <= %s AND pv.valid_period @> %s::timestamptz
+        """
+        params = [country_code, as_of, as_of]
+    else:
+        base_query = """
+        SELECT pv.data_jsonb::text
+        FROM pep_master pm
+        JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+        WHERE pm.country_code = %s
+        """
+        params = [country_code]
+    
+    if status:
+        base_query += " AND pv.status = %s"
+        params.append(status)
+    
+    if min_confidence is not None:
+        base_query += " AND pv.confidence_score >= %s"
+        params.append(min_confidence)
+        
+    base_query += " LIMIT %s OFFSET %s"
+    params.extend([limit, offset])
+    
+    body = stream_json_array(base_query, tuple(params))
+    try:
+        first_chunk = next(body)
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+    return StreamingResponse(itertools.chain([first_chunk], body), media_type="application/json")
+
+@app.get("/peps/lookup", response_model=List[Dict[str, Any]], summary="Recherche exacte d'un PPE par nom ou ancien nom")
+async def lookup_pep(
+    name: str = Query(..., description="Nom, variante ou ancien nom du PPE"),
+    country_code: str = Query("MA", description="Code pays (MA par défaut)")
+):
+    """
+    Recherche un nom normalisé (sans accents, ponctuation ni civilités) dans la table
+    des alias et retourne la version actuelle des PPE correspondants.
+    """
+    country_code = normalize_country_code(country_code)
+    alias_norm = normalize_name(name)
+    if not alias_norm:
+        raise HTTPException(status_code=400, detail="Nom vide.")
     try:
         with DBConnector() as db:
-            base_query = """
-            SELECT pv.data_jsonb
+            query = """
+            SELECT pv.data_jsonb::text AS document
             FROM pep_master pm
-            JOIN pep_version pv ON pm.current_version_id = pv.version_id
-            WHERE pm.country_code = %s
+            JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+            WHERE pm.id IN (
+                SELECT pep_id FROM pep_alias WHERE country_code = %s AND alias_norm = %s
+            );
             """
-            params = [country_code]
-            
-            if status:
-                base_query += " AND pv.status = %s"
-                params.append(status)
-            
-            if min_confidence is not None:
-                base_query += " AND pv.confidence_score >= %s"
-                params.append(min_confidence)
-                
-            base_query += " LIMIT %s OFFSET %s;"
-            params.extend([limit, offset])
-            
-            results = db.execute(base_query, tuple(params), fetch=True)
-            
-            return [res['data_jsonb'] for res in results]
-            
+            results = db.execute(query, (country_code, alias_norm), fetch=True)
+            return RawJSONResponse(json_array(res['document'] for res in results))
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.post("/peps/screen", response_model=List[Dict[str, Any]], summary="Filtrage d'une liste de noms (recherche exacte par lot)")
+async def screen_names(
+    names: List[str] = Body(..., embed=True, description=f"Noms à filtrer (au plus {MAX_SCREEN_NAMES})"),
+    country_code: str = Body("MA", embed=True, description="Code pays (MA par défaut)")
+):
+    """
+    Recherche exacte de chaque nom (comme /peps/lookup) en une seule requête: retourne,
+    dans l'ordre des noms reçus, {"name", "matches"} avec la version actuelle des PPE trouvés.
+    """
+    country_code = normalize_country_code(country_code)
+    if len(names) > MAX_SCREEN_NAMES:
+        raise HTTPException(status_code=400, detail=f"Au plus {MAX_SCREEN_NAMES} noms par requête.")
+    if not names:
+        return []
+    normalized = [normalize_name(name) for name in names]
+    try:
+        with DBConnector() as db:
+            query = """
+            SELECT pa.alias_norm, pv.data_jsonb::text AS document
+            FROM (
+                SELECT DISTINCT pep_id, alias_norm FROM pep_alias
+                WHERE country_code = %s AND alias_norm = ANY(%s)
+            ) pa
+            JOIN pep_master pm ON pm.id = pa.pep_id
+            JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+            ORDER BY pa.alias_norm, pm.master_name;
+            """
+            results = db.execute(query, (country_code, sorted({norm for norm in normalized if norm})), fetch=True)
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+    matches: Dict[str, List[str]] = {}
+    for res in results:
+        matches.setdefault(res['alias_norm'], []).append(res['document'])
+    return RawJSONResponse(b"[" + b",".join(
+        dumps({"name": name})[:-1] + b',"matches":' + json_array(matches.get(norm, [])) + b"}"
+        for name, norm in zip(names, normalized)
+    ) + b"]")
+
+@app.get("/peps/search", response_model=List[Dict[str, Any]], summary="Recherche approchée d'un PPE par nom (similarité trigramme)")
+async def search_peps(
+    q: str = Query(..., description="Nom recherché (variantes, fautes de frappe et anciens noms acceptés)"),
+    country_code: str = Query("MA", description="Code pays (MA par défaut)"),
+    threshold: float = Query(0.3, ge=0.0, le=1.0, description="Similarité trigramme minimale (0.0 à 1.0)"),
+    limit: int = Query(20, ge=1, le=100, description="Nombre maximum de résultats")
+):
+    """
+    Recherche les PPE dont un nom ou alias normalisé est proche de la requête
+    (opérateur % de pg_trgm, index GIN de pep_alias). Les résultats sont classés
+    par score décroissant, avec le meilleur alias trouvé pour chaque PPE.
+    """
+    country_code = normalize_country_code(country_code)
+    query_norm = normalize_name(q)
+    if not query_norm:
+        raise HTTPException(status_code=400, detail="Requête vide.")
+    try:
+        with DBConnector() as db:
+            # Seuil de l'opérateur %, limité à la transaction en cours
+            db.execute("SELECT set_config('pg_trgm.similarity_threshold', %s, true);", (str(threshold),))
+            query = """
+            WITH best AS (
+                SELECT DISTINCT ON (pa.pep_id) pa.pep_id, pa.alias_name,
+                       similarity(pa.alias_norm, %(q)s) AS score
+                FROM pep_alias pa
+                WHERE pa.country_code = %(country_code)s AND pa.alias_norm %% %(q)s
+                ORDER BY pa.pep_id, score DESC
+            )
+            SELECT b.pep_id, b.alias_name AS matched_name, b.score, pv.data_jsonb::text AS document
+            FROM best b
+            JOIN pep_master pm ON pm.id = b.pep_id
+            JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+            ORDER BY b.score DESC, pm.master_name
+            LIMIT %(limit)s;
+            """
+            results = db.execute(query, {"q": query_norm, "country_code": country_code, "limit": limit}, fetch=True)
+            # En-tête du résultat sérialisé, puis le document tel que rendu par PostgreSQL
+            return RawJSONResponse(b"[" + b",".join(
+                dumps({
+                    "pep_id": str(res['pep_id']),
+                    "score": round(float(res['score']), 4),
+                    "matched_name": res['matched_name'],
+                })[:-1] + b',"record":' + res['document'].encode("utf-8") + b"}"
+                for res in results
+            ) + b"]")
     except Exception as e:
         print(f"Erreur de base de données: {e}")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
 
 @app.get("/peps/{pep_id}", summary="Récupère les détails complets d'un PPE")
-async def get_pep_details(pep_id: str):
+async def get_pep_details(
+    pep_id: str,
+    as_of: Optional[datetime] = Query(None, description="Date (ISO 8601, UTC par défaut): version valide à cette date")
+):
     """
-    Récupère la version actuelle d'un enregistrement PPE par son ID.
+    Récupère la version actuelle d'un enregistrement PPE par son ID, ou la version
+    valide à la date as_of (document renvoyé tel que rendu par PostgreSQL).
     """
-    pep_data = fetch_pep_details(pep_id)
-    if pep_data is None:
+    try:
+        with DBConnector() as db:
+            document = fetch_current_document(db, pep_id, as_utc(as_of) if as_of else None)
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur lors de la récupération des données.")
+    if document is None:
         raise HTTPException(status_code=404, detail="PPE non trouvé.")
-    return pep_data
+    return RawJSONResponse(document)
 
 @app.get("/peps/{pep_id}/history", summary="Récupère les détails, l'historique des versions et l'audit log d'un PPE")
-async def get_pep_history(pep_id: str):
+async def get_pep_history(
+    pep_id: str,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=500, description="Nombre maximum de versions et d'entrées d'audit")
+):
     """
-    Récupère la version actuelle, l'historique des versions et le journal d'audit pour un enregistrement PPE.
+    Récupère la version actuelle et la première page de l'historique des versions et du
+    journal d'audit. Les pages suivantes sont servies par /peps/{pep_id}/versions et
+    /peps/{pep_id}/audit avec les curseurs retournés.
     """
-    pep_data = fetch_pep_details(pep_id, fetch_history=True)
+    pep_data = fetch_pep_details(pep_id, fetch_history=True, history_limit=limit)
     if pep_data is None:
         raise HTTPException(status_code=404, detail="PPE non trouvé.")
     return pep_data
 
+@app.get("/peps/{pep_id}/versions", summary="Historique paginé des versions d'un PPE")
+async def get_pep_versions(
+    pep_id: str,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=500, description="Nombre maximum de versions"),
+    cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente (next_cursor)"),
+    include_archived: bool = Query(False, description="Inclure les versions archivées par la compaction")
+):
+    """
+    Retourne une page de versions (de la plus récente à la plus ancienne) et le curseur
+    de la page suivante (null sur la dernière page).
+    """
+    try:
+        with DBConnector() as db:
+            page = fetch_version_page(db, pep_id, limit, cursor, include_archived)
+            if not page['items'] and not cursor and not pep_exists(db, pep_id):
+                raise HTTPException(status_code=404, detail="PPE non trouvé.")
+            return page
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.get("/peps/{pep_id}/audit", summary="Journal d'audit paginé d'un PPE")
+async def get_pep_audit(
+    pep_id: str,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=500, description="Nombre maximum d'entrées"),
+    cursor: Optional[str] = Query(None, description="Curseur retourné par la page précédente (next_cursor)"),
+    include_archived: bool = Query(False, description="Inclure les entrées archivées par la compaction")
+):
+    """
+    Retourne une page du journal d'audit (de la plus récente à la plus ancienne) et le
+    curseur de la page suivante (null sur la dernière page).
+    """
+    try:
+        with DBConnector() as db:
+            page = fetch_audit_page(db, pep_id, limit, cursor, include_archived)
+            if not page['items'] and not cursor and not pep_exists(db, pep_id):
+                raise HTTPException(status_code=404, detail="PPE non trouvé.")
+            return page
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.get("/changes", summary="Événements du flux de changements après un event_id")
+async def list_changes(
+    since: int = Query(0, ge=0, description="Dernier event_id reçu (0: depuis le début)"),
+    country_code: Optional[str] = Query(None, description="Code pays (tous les pays par défaut)"),
+    limit: int = Query(CHANGE_BATCH_SIZE, ge=1, le=CHANGE_BATCH_SIZE, description="Nombre maximum d'événements")
+):
+    """
+    Retourne les créations de PPE et de versions publiées par le loader après since,
+    et la valeur de since à utiliser pour l'appel suivant. Le version_id d'un événement
+    peut désigner une version fusionnée puis archivée par la compaction: elle se lit via
+    /peps/{id}/versions?include_archived=true.
+    """
+    country_code = normalize_country_code(country_code)
+    try:
+        items = fetch_changes(country_code, since, limit)
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+    return {"items": items, "next_since": items[-1]['event_id'] if items else since}
+
+@app.get("/changes/stream", summary="Flux de changements en continu (Server-Sent Events)")
+async def stream_change_feed(
+    country_code: Optional[str] = Query(None, description="Code pays (tous les pays par défaut)"),
+    since: Optional[int] = Query(None, ge=0, description="Reprendre après cet event_id (par défaut: nouveaux événements seulement)"),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID")
+):
+    """
+    Diffuse les événements du registre (pep_created, version_created) au format
+    text/event-stream. Un client qui se reconnecte envoie Last-Event-ID (automatique
+    avec EventSource) et reprend sans perte.
+    """
+    country_code = normalize_country_code(country_code)
+    if last_event_id is not None:
+        if not last_event_id.isdigit():
+            raise HTTPException(status_code=400, detail="Last-Event-ID invalide.")
+        since = int(last_event_id)
+    return StreamingResponse(
+        stream_changes(country_code, since),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Fonction utilitaire pour récupérer la dernière exécution du pipeline ETL
+def fetch_last_etl_run(db: DBConnector, country_code: str, successful_only: bool = False) -> Optional[Dict[str, Any]]:
+    """Récupère la dernière exécution enregistrée dans etl_run (lecture indexée, une seule ligne)."""
+    query = """
+    SELECT run_id, country_code, started_at, finished_at, status, duration_seconds,
+           stage_durations, items_crawled, entities_extracted, dedup_hits,
+           versions_created, versions_skipped, extra_counters
+    FROM etl_run
+    WHERE country_code = %s AND finished_at IS NOT NULL
+    """
+    if successful_only:
+        query += " AND status = 'success'"
+    query += " ORDER BY finished_at DESC LIMIT 1;"
+    result = db.execute(query, (country_code,), fetch=True)
+    return result[0] if result else None
+
 @app.get("/metrics/last_updated", summary="Retourne la date et l'heure de la dernière mise à jour du registre")
-async def get_last_updated():
+async def get_last_updated(country_code: str = Query("MA", description="Code pays (MA par défaut)")):
     """
     Retourne le timestamp de la dernière exécution réussie du pipeline ETL.
     """
+    country_code = normalize_country_code(country_code)
     try:
         with DBConnector() as db:
+            last_run = fetch_last_etl_run(db, country_code, successful_only=True)
+            if last_run:
+                return {"last_updated": last_run['finished_at'].isoformat()}
+
+            # Repli pour les bases sans historique etl_run (index idx_pep_version_last_updated)
             query = """
-            SELECT last_updated
-            FROM pep_version
-            ORDER BY last_updated DESC
+            SELECT pv.last_updated
+            FROM pep_version pv
+            JOIN pep_master pm ON pm.id = pv.pep_id
+            WHERE pm.country_code = %s
+            ORDER BY pv.last_updated DESC
             LIMIT 1;
             """
-            result = db.execute(query, fetch=True)
+            result = db.execute(query, (country_code,), fetch=True)
             if result:
                 return {"last_updated": result[0]['last_updated'].isoformat()}
             return {"last_updated": "N/A"}
     except Exception as e:
         print(f"Erreur de base de données: {e}")
         raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+@app.get("/metrics/etl_run", summary="Retourne les statistiques de la dernière exécution du pipeline ETL")
+async def get_last_etl_run(country_code: str = Query("MA", description="Code pays (MA par défaut)")):
+    """
+    Retourne les durées par étape et les compteurs de la dernière exécution du pipeline ETL.
+    """
+    country_code = normalize_country_code(country_code)
+    try:
+        with DBConnector() as db:
+            last_run = fetch_last_etl_run(db, country_code)
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+    if last_run is None:
+        raise HTTPException(status_code=404, detail="Aucune exécution ETL enregistrée.")
+    last_run['run_id'] = str(last_run['run_id'])
+    last_run['duration_seconds'] = float(last_run['duration_seconds'] or 0)
+    return last_run
+
+@app.get("/metrics", response_class=PlainTextResponse, summary="Métriques du pipeline ETL au format texte Prometheus")
+async def get_prometheus_metrics(country_code: str = Query("MA", description="Code pays (MA par défaut)")):
+    """
+    Expose la dernière exécution du pipeline ETL au format d'exposition texte de Prometheus.
+    """
+    country_code = normalize_country_code(country_code)
+    try:
+        with DBConnector() as db:
+            last_run = fetch_last_etl_run(db, country_code)
+            last_success = fetch_last_etl_run(db, country_code, successful_only=True)
+    except Exception as e:
+        print(f"Erreur de base de données: {e}")
+        raise HTTPException(status_code=500, detail="Erreur interne du serveur.")
+
+    return render_prometheus_metrics(country_code, last_run, last_success)
+
+def render_prometheus_metrics(country_code: str, last_run: Optional[Dict[str, Any]], last_success: Optional[Dict[str, Any]]) -> str:
+    """Construit le texte Prometheus à partir des lignes etl_run."""
+    labels = f'country_code="{country_code}"'
+    lines = []
+
+    def metric(name: str, metric_type: str, help_text: str, samples: List[tuple]):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample_labels, value in samples:
+            lines.append(f"{name}{{{sample_labels}}} {value}")
+
+    if last_success:
+        metric("pep_etl_last_success_timestamp_seconds", "gauge",
+               "Horodatage de la dernière exécution ETL réussie.",
+               [(labels, last_success['finished_at'].timestamp())])
+
+    if last_run:
+        metric("pep_etl_last_run_success", "gauge",
+               "1 si la dernière exécution ETL a réussi, 0 sinon.",
+               [(labels, 1 if last_run['status'] == 'success' else 0)])
+        metric("pep_etl_last_run_duration_seconds", "gauge",
+               "Durée totale de la dernière exécution ETL.",
+               [(labels, float(last_run['duration_seconds'] or 0))])
+        metric("pep_etl_stage_duration_seconds", "gauge",
+               "Durée de chaque étape de la dernière exécution ETL.",
+               [(f'{labels},stage="{stage}"', duration) for stage, duration in (last_run['stage_durations'] or {}).items()])
+        for counter in ["items_crawled", "entities_extracted", "dedup_hits", "versions_created", "versions_skipped"]:
+            metric(f"pep_etl_last_run_{counter}", "gauge",
+                   f"Compteur {counter} de la dernière exécution ETL.",
+                   [(labels, last_run[counter])])
+
+    return "\n".join(lines) + "\n"
@@ -14,6 +14,11 @@ class Config:
         self.config_file = self.CONFIG_DIR / f"{self.country_code.lower()}.json"
         self.data = self._load_config()
 
+    @classmethod
+    def available_countries(cls):
+        """Codes pays des configurations présentes dans config/ (un fichier <code>.json par pays)."""
+        return sorted(path.stem.upper() for path in cls.CONFIG_DIR.glob("*.json"))
+
     def _load_config(self):
         if not self.config_file.exists():
             raise FileNotFoundError(f"Configuration file not found for country code {self.country_code}: {self.config_file}")
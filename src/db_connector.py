@@ -1,36 +1,93 @@
+import os
+import threading
 import psycopg2
-from psycopg2 import extras
+from psycopg2 import extras, pool
 from src.config import DB_CONFIG
 
+# Connexions gardées ouvertes par processus et réutilisées d'un DBConnector à l'autre
+# (0: une connexion par DBConnector). Au-delà, DBConnector ouvre une connexion directe.
+DB_POOL_SIZE = int(os.getenv("PEP_DB_POOL_SIZE", "5"))
+
+class LazyConnectionPool(pool.ThreadedConnectionPool):
+    """Pool qui ouvre ses connexions à la demande et garde jusqu'à maxconn connexions inactives."""
+
+    def __init__(self, maxconn, **kwargs):
+        super().__init__(0, maxconn, **kwargs)
+        # psycopg2 ferme les connexions rendues au-delà de minconn
+        self.minconn = maxconn
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Pool de connexions du processus courant (recréé après un fork: les connexions ne se partagent pas entre processus)."""
+    global _pool, _pool_pid
+    if DB_POOL_SIZE <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = LazyConnectionPool(DB_POOL_SIZE, **DB_CONFIG)
+            _pool_pid = os.getpid()
+        return _pool
+
 class DBConnector:
     """Gère la connexion et les opérations de base de données."""
-    
-    def __init__(self):
+
+    def __init__(self, instrumentation=None):
         self.conn = None
         self.cursor = None
+        self.pool = None
+        # Instrumentation optionnelle: chaque requête est mesurée sous "db.<verbe SQL>"
+        self.instrumentation = instrumentation
 
     def __enter__(self):
         try:
-            self.conn = psycopg2.connect(**DB_CONFIG)
+            self.conn = self._connect()
             self.cursor = self.conn.cursor(cursor_factory=extras.RealDictCursor)
             return self
         except psycopg2.OperationalError as e:
             print(f"Erreur de connexion à la base de données: {e}")
             raise
 
+    def _connect(self):
+        self.pool = get_pool()
+        if self.pool is not None:
+            try:
+                conn = self.pool.getconn()
+            except pool.PoolError:
+                # Pool épuisé: connexion directe, fermée en sortie
+                self.pool = None
+            else:
+                if not conn.closed:
+                    return conn
+                self.pool.putconn(conn, close=True)
+                return self.pool.getconn()
+        return psycopg2.connect(**DB_CONFIG)
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         if self.cursor:
             self.cursor.close()
         if self.conn:
-            if exc_type is None:
-                self.conn.commit()
-            else:
-                self.conn.rollback()
-            self.conn.close()
+            try:
+                if exc_type is None:
+                    self.conn.commit()
+                else:
+                    self.conn.rollback()
+            finally:
+                if self.pool is not None:
+                    # Connexion rompue pendant l'utilisation: retirée du pool
+                    self.pool.putconn(self.conn, close=bool(self.conn.closed))
+                else:
+                    self.conn.close()
 
     def execute(self, query, params=None, fetch=False):
         """Exécute une requête SQL."""
-        self.cursor.execute(query, params)
-        if fetch:
-            return self.cursor.fetchall()
-        return None
+        if self.instrumentation is None:
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall() if fetch else None
+
+        verb = query.split(None, 1)[0].lower() if query.strip() else "query"
+        with self.instrumentation.timer(f"db.{verb}"):
+            self.cursor.execute(query, params)
+            return self.cursor.fetchall() if fetch else None
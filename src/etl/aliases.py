@@ -0,0 +1,107 @@
+import sys
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from psycopg2 import extras
+from src.db_connector import DBConnector
+from src.etl.normalization import normalize_name
+from src.etl.partitions import ensure_country_partitions
+
+def collect_aliases(names: List[str]) -> Dict[str, str]:
+    """
+    Rassemble les noms d'un PEP (variantes extraites, nom complet, alias du corps JSONB).
+    Retourne {alias_norm: alias_name}, en préférant la forme d'origine (avec casse et
+    accents) à la forme en minuscules.
+    """
+    aliases: Dict[str, str] = {}
+    for name in names:
+        norm = normalize_name(name or "")
+        if norm and (norm not in aliases or aliases[norm].islower() and not name.islower()):
+            aliases[norm] = name
+    return aliases
+
+def alias_rows(pep_id: str, names: List[str], country_code: str, version_id: Optional[str], seen_at: datetime) -> List[Dict[str, Any]]:
+    """Lignes pep_alias des noms d'un PEP."""
+    pep_id = str(pep_id)
+    return [
+        {
+            "pep_id": pep_id,
+            "country_code": country_code,
+            "alias_name": name,
+            "alias_norm": norm,
+            "first_seen_version_id": version_id,
+            "first_seen": seen_at,
+            "last_seen": seen_at,
+        }
+        for norm, name in collect_aliases(names).items()
+    ]
+
+def upsert_aliases(db: DBConnector, rows: List[Dict[str, Any]]):
+    """
+    Insère les alias (COPY dans une table temporaire puis INSERT ... ON CONFLICT):
+    un alias déjà connu met seulement à jour last_seen.
+    """
+    if not rows:
+        return
+    from src.etl.storage import copy_rows
+    db.execute("""
+    CREATE TEMP TABLE IF NOT EXISTS tmp_pep_alias (
+        pep_id UUID, country_code VARCHAR(2), alias_name TEXT, alias_norm TEXT,
+        first_seen_version_id UUID, first_seen TIMESTAMPTZ, last_seen TIMESTAMPTZ
+    ) ON COMMIT DELETE ROWS;
+    """)
+    columns = ["pep_id", "country_code", "alias_name", "alias_norm", "first_seen_version_id", "first_seen", "last_seen"]
+    copy_rows(db, "tmp_pep_alias", columns, (
+        tuple(row[c].isoformat() if isinstance(row[c], datetime) else row[c] for c in columns)
+        for row in rows
+    ))
+    db.execute("""
+    INSERT INTO pep_alias (pep_id, country_code, alias_name, alias_norm, first_seen_version_id, first_seen, last_seen)
+    SELECT DISTINCT ON (pep_id, alias_norm) pep_id, country_code, alias_name, alias_norm,
+           first_seen_version_id, first_seen, last_seen
+    FROM tmp_pep_alias
+    ORDER BY pep_id, alias_norm, first_seen
+    ON CONFLICT (country_code, pep_id, alias_norm) DO UPDATE SET last_seen = GREATEST(pep_alias.last_seen, EXCLUDED.last_seen);
+    """)
+    db.execute("DELETE FROM tmp_pep_alias;")
+
+def backfill_aliases(country_code: Optional[str] = None, chunk_size: int = 10000) -> int:
+    """
+    Remplit pep_alias à partir de toutes les versions existantes (migration initiale).
+    Les versions sont lues par curseur serveur pour ne pas charger tout l'historique en mémoire.
+    """
+    query = """
+    SELECT pv.pep_id, pm.country_code, pv.version_id, pv.data_jsonb, pv.last_updated
+    FROM pep_version pv
+    JOIN pep_master pm ON pm.id = pv.pep_id
+    """
+    params = ()
+    if country_code:
+        query += " WHERE pm.country_code = %s"
+        params = (country_code,)
+    query += " ORDER BY pv.last_updated;"
+
+    if country_code:
+        with DBConnector() as db:
+            ensure_country_partitions(db, country_code)
+
+    total = 0
+    with DBConnector() as reader, DBConnector() as writer:
+        cursor = reader.conn.cursor(name="backfill_aliases", cursor_factory=extras.RealDictCursor)
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            batch = []
+            for row in rows:
+                names = [row['data_jsonb'].get('full_name')] + list(row['data_jsonb'].get('aliases', []))
+                batch.extend(alias_rows(row['pep_id'], names, row['country_code'], str(row['version_id']), row['last_updated']))
+            upsert_aliases(writer, batch)
+            total += len(rows)
+            print(f"Backfill des alias: {total} versions traitées.")
+        cursor.close()
+    return total
+
+if __name__ == '__main__':
+    # Utilisation: python -m src.etl.aliases [CODE_PAYS]
+    backfill_aliases(sys.argv[1].upper() if len(sys.argv) > 1 else None)
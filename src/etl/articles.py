@@ -0,0 +1,136 @@
+"""
+Préparation des articles collectés avant l'extraction d'entités (NER).
+
+1. Nettoyage: espaces et Unicode normalisés, phrases de service retirées ("Lire aussi",
+   mentions de copyright...), ainsi que les phrases répétées dans plusieurs articles d'un
+   même domaine du lot (pied de page, encadrés).
+2. Quasi-doublons: une même dépêche reprise par Le360, Hespress et Le Matin ne passe qu'une
+   fois dans le NER. Chaque article reçoit une empreinte SimHash 64 bits (shingles de
+   SHINGLE_SIZE mots); deux articles dont les empreintes diffèrent d'au plus
+   MAX_HAMMING_DISTANCE bits sont regroupés. L'article le plus long du groupe est conservé
+   et garde toutes les URLs du groupe (clé "urls"), pour le score de confiance.
+"""
+import hashlib
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+import numpy as np
+from src.etl.instrumentation import Instrumentation
+from src.etl.normalization import strip_accents
+from src.etl.union_find import UnionFind
+
+SHINGLE_SIZE = 3
+# Distance de Hamming maximale entre deux empreintes d'une même dépêche (reprises avec une
+# phrase d'introduction ou de conclusion en plus); deux articles distincts sont vers 32
+MAX_HAMMING_DISTANCE = 6
+# Blocs de l'empreinte pour la recherche des candidats: deux empreintes à distance
+# <= MAX_HAMMING_DISTANCE ont au moins un bloc identique (MAX_HAMMING_DISTANCE + 1 blocs)
+SIMHASH_BLOCKS = MAX_HAMMING_DISTANCE + 1
+# En dessous, l'empreinte n'est pas fiable: l'article n'est comparé à aucun autre
+MIN_SHINGLES = 20
+# Une phrase présente dans au moins ce nombre d'articles d'un domaine (et dans la moitié
+# d'entre eux) est considérée comme un élément de page
+BOILERPLATE_MIN_ARTICLES = 3
+
+BOILERPLATE_PATTERN = re.compile(
+    r"^(?:à lire aussi|lire aussi|voir aussi|lire la suite|partager|abonnez-vous|suivez-nous|"
+    r"inscrivez-vous|publicité|newsletter|tous droits réservés|©|copyright)",
+    re.IGNORECASE
+)
+_SENTENCE_END = re.compile(r"(?<=[.!?»])\s+")
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"[a-z0-9]+")
+
+def split_sentences(text: str) -> List[str]:
+    text = _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text or "")).strip()
+    return [sentence for sentence in _SENTENCE_END.split(text) if sentence]
+
+def fingerprint_tokens(text: str) -> List[str]:
+    return _WORD.findall(strip_accents(text).lower())
+
+def simhash(text: str) -> Optional[int]:
+    """Empreinte SimHash 64 bits du texte (None si le texte est trop court)."""
+    tokens = fingerprint_tokens(text)
+    shingles = {" ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+    if len(shingles) < MIN_SHINGLES:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles],
+        dtype=np.uint64
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    # Bit i à 1 si la majorité des shingles ont ce bit à 1
+    majority = bits.sum(axis=0) * 2 > len(shingles)
+    return sum(1 << i for i in np.flatnonzero(majority).tolist())
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+def remove_boilerplate(articles: List[Dict[str, Any]]) -> Tuple[List[str], int]:
+    """Contenus nettoyés (dans l'ordre des articles) et nombre de phrases retirées."""
+    sentences = [split_sentences(article.get('content', '')) for article in articles]
+    domains = [urlparse(article.get('url', '')).netloc for article in articles]
+
+    # Nombre d'articles de chaque domaine contenant chaque phrase
+    per_domain: Dict[str, int] = defaultdict(int)
+    occurrences: Dict[Tuple[str, str], int] = defaultdict(int)
+    for domain, article_sentences in zip(domains, sentences):
+        per_domain[domain] += 1
+        for sentence in set(article_sentences):
+            occurrences[(domain, sentence)] += 1
+
+    cleaned, removed = [], 0
+    for domain, article_sentences in zip(domains, sentences):
+        kept = [
+            sentence for sentence in article_sentences
+            if not BOILERPLATE_PATTERN.match(sentence)
+            and not (occurrences[(domain, sentence)] >= BOILERPLATE_MIN_ARTICLES
+                     and occurrences[(domain, sentence)] * 2 >= per_domain[domain])
+        ]
+        removed += len(article_sentences) - len(kept)
+        cleaned.append(" ".join(kept))
+    return cleaned, removed
+
+def near_duplicate_groups(fingerprints: List[Optional[int]]) -> List[List[int]]:
+    """Groupes d'indices d'articles quasi identiques (chaque article est dans un seul groupe)."""
+    block_bits = 64 // SIMHASH_BLOCKS
+    mask = (1 << block_bits) - 1
+    buckets: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+    uf = UnionFind()
+    for index, fingerprint in enumerate(fingerprints):
+        uf.add(index)
+        if fingerprint is None:
+            continue
+        for block in range(SIMHASH_BLOCKS):
+            key = (block, (fingerprint >> (block * block_bits)) & mask)
+            for other in buckets[key]:
+                if uf.find(index) != uf.find(other) and hamming_distance(fingerprint, fingerprints[other]) <= MAX_HAMMING_DISTANCE:
+                    uf.union(index, other)
+            buckets[key].append(index)
+    return sorted(uf.groups().values(), key=min)
+
+def prepare_articles(raw_data: List[Dict[str, Any]], instrumentation: Optional[Instrumentation] = None) -> List[Dict[str, Any]]:
+    """
+    Nettoie les articles et fusionne les quasi-doublons. Retourne un article par groupe
+    (le plus long), avec le contenu nettoyé et toutes les URLs du groupe dans "urls".
+    """
+    instrumentation = instrumentation or Instrumentation()
+    with instrumentation.timer("transform.article_dedup"):
+        contents, removed = remove_boilerplate(raw_data)
+        groups = near_duplicate_groups([simhash(content) for content in contents])
+
+    articles = []
+    for group in groups:
+        keep = max(group, key=lambda i: (len(contents[i]), -i))
+        # URLs du groupe, celle de l'article gardé en premier (les articles sans URL n'en ajoutent pas)
+        urls = (raw_data[i].get('url') for i in sorted(group, key=lambda i: i != keep))
+        articles.append({
+            **raw_data[keep],
+            "content": contents[keep],
+            "urls": list(dict.fromkeys(url for url in urls if url)),
+        })
+    instrumentation.count("boilerplate_sentences_removed", removed)
+    instrumentation.count("articles_near_duplicates", len(raw_data) - len(articles))
+    return articles
@@ -0,0 +1,188 @@
+"""
+Points de reprise des exécutions du pipeline ETL (table etl_checkpoint), par run_id.
+
+- extract: items collectés par Scrapy (manifeste du crawl), par lots;
+- transform: enregistrements transformés, par lots de CHECKPOINT_BATCH_SIZE (les lots de chargement);
+- load: un marqueur par lot chargé, écrit dans la transaction du lot (COPY du backend
+  PostgreSQL ou fonction load_version_plan du backend Supabase): un lot est entièrement
+  chargé et marqué, ou pas du tout.
+
+Les lots d'une étape extract ou transform sont écrits dans une même transaction: l'étape
+est terminée si son lot 0 existe. Une exécution interrompue (conteneur arrêté, erreur
+transitoire) laisse ses points de reprise; l'exécution suivante du même pays reprend son
+run_id, saute les étapes terminées et les lots déjà chargés. Une exécution tient le verrou
+de son pays (country_run_lock) du début à la fin: une exécution concurrente du même pays ne
+démarre pas, et une exécution ayant des points de reprise sans détenir le verrou est morte. Les points de reprise d'une
+exécution sont supprimés à la fin de cette exécution si elle réussit; ceux des exécutions plus
+anciennes que RESUME_MAX_AGE_HOURS (les articles collectés ne sont plus à jour) ne sont plus
+repris et sont supprimés au démarrage suivant du pays.
+"""
+import os
+import uuid
+from contextlib import contextmanager
+from typing import Any, Iterator, List, Optional, Set
+import psycopg2
+from src.config import DB_CONFIG
+from src.db_connector import DBConnector
+from src.etl.instrumentation import Instrumentation
+from src.etl.models import dumps_str
+
+STAGE_EXTRACT = "extract"
+STAGE_TRANSFORM = "transform"
+STAGE_LOAD = "load"
+
+# Enregistrements par lot de chargement (et par ligne de etl_checkpoint)
+CHECKPOINT_BATCH_SIZE = int(os.getenv("PEP_ETL_CHECKPOINT_BATCH", "1000"))
+# Âge maximal d'une exécution interrompue reprise automatiquement
+RESUME_MAX_AGE_HOURS = float(os.getenv("PEP_ETL_RESUME_MAX_AGE_HOURS", "24"))
+
+def batched(items: List[Any], size: int = CHECKPOINT_BATCH_SIZE) -> List[List[Any]]:
+    """Lots de size éléments (un lot vide si items est vide: l'étape reste marquée terminée)."""
+    return [items[i:i + size] for i in range(0, len(items), size)] or [[]]
+
+@contextmanager
+def country_run_lock(country_code: str) -> Iterator[bool]:
+    """
+    Verrou consultatif PostgreSQL du pays, tenu pendant tout le bloc. Retourne False si une
+    autre exécution du pays le détient (elle est en cours). Connexion dédiée, hors du pool: le
+    verrou appartient à la session, et tombe avec elle si le processus meurt.
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s));", (country_code,))
+            acquired = cursor.fetchone()[0]
+        try:
+            yield acquired
+        finally:
+            if acquired and not conn.closed:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT pg_advisory_unlock(hashtext(%s));", (country_code,))
+    finally:
+        conn.close()
+
+class RunCheckpoints:
+    """Lecture et écriture des points de reprise d'une exécution du pipeline d'un pays."""
+
+    def __init__(self, country_code: str, run_id: Optional[str] = None, resumed: bool = False,
+                 instrumentation: Optional[Instrumentation] = None, enabled: bool = True):
+        self.country_code = country_code
+        self.run_id = run_id or str(uuid.uuid4())
+        # True si l'exécution reprend une exécution interrompue
+        self.resumed = resumed
+        # False si etl_checkpoint est inaccessible (schéma antérieur à la table): exécution sans reprise
+        self.enabled = enabled
+        self.instrumentation = instrumentation or Instrumentation()
+
+    @classmethod
+    def resume_or_start(cls, country_code: str, instrumentation: Optional[Instrumentation] = None,
+                        resume: bool = True, max_age_hours: float = RESUME_MAX_AGE_HOURS) -> "RunCheckpoints":
+        """
+        Reprend la dernière exécution interrompue du pays (si resume), sinon en démarre une nouvelle.
+        À appeler sous country_run_lock: les exécutions du pays ayant des points de reprise sont
+        alors toutes terminées ou mortes, aucune n'est reprise pendant qu'elle tourne encore.
+        """
+        query = """
+        SELECT run_id
+        FROM etl_checkpoint
+        WHERE country_code = %s
+        GROUP BY run_id
+        HAVING MIN(created_at) > NOW() - make_interval(secs => %s)
+        ORDER BY MIN(created_at) DESC
+        LIMIT 1;
+        """
+        try:
+            with DBConnector() as db:
+                cls.prune_expired(db, country_code, max_age_hours)
+                rows = db.execute(query, (country_code, max_age_hours * 3600), fetch=True)
+        except Exception as e:
+            print(f"Points de reprise indisponibles ({e}): exécution sans reprise possible.")
+            return cls(country_code, instrumentation=instrumentation, enabled=False)
+        if resume and rows:
+            print(f"Reprise de l'exécution interrompue {rows[0]['run_id']} ({country_code}).")
+            return cls(country_code, str(rows[0]['run_id']), resumed=True, instrumentation=instrumentation)
+        return cls(country_code, instrumentation=instrumentation)
+
+    @staticmethod
+    def prune_expired(db: DBConnector, country_code: str, max_age_hours: float = RESUME_MAX_AGE_HOURS) -> int:
+        """Supprime les points de reprise des exécutions du pays trop anciennes pour être reprises."""
+        removed = db.execute("""
+        DELETE FROM etl_checkpoint
+        WHERE country_code = %s AND run_id IN (
+            SELECT run_id
+            FROM etl_checkpoint
+            WHERE country_code = %s
+            GROUP BY run_id
+            HAVING MIN(created_at) <= NOW() - make_interval(secs => %s)
+        )
+        RETURNING run_id;
+        """, (country_code, country_code, max_age_hours * 3600), fetch=True)
+        if removed:
+            print(f"Points de reprise expirés supprimés: {len({row['run_id'] for row in removed})} exécutions ({country_code}).")
+        return len(removed)
+
+    def load_stage(self, stage: str) -> Optional[List[List[Any]]]:
+        """Lots enregistrés d'une étape terminée (None si l'étape n'a pas de point de reprise)."""
+        if not self.resumed:
+            return None
+        with self.instrumentation.timer("checkpoint.read"), DBConnector(self.instrumentation) as db:
+            rows = db.execute(
+                "SELECT batch_no, payload FROM etl_checkpoint WHERE run_id = %s AND stage = %s ORDER BY batch_no;",
+                (self.run_id, stage), fetch=True
+            )
+        if not rows or rows[0]['batch_no'] != 0:
+            return None
+        return [row['payload'] for row in rows]
+
+    def save_stage(self, stage: str, batches: List[List[Any]]):
+        """Enregistre tous les lots d'une étape en une transaction."""
+        if not self.enabled:
+            return
+        query = """
+        INSERT INTO etl_checkpoint (run_id, country_code, stage, batch_no, payload)
+        VALUES (%s, %s, %s, %s, %s::jsonb)
+        ON CONFLICT (run_id, stage, batch_no) DO UPDATE SET payload = EXCLUDED.payload;
+        """
+        try:
+            with self.instrumentation.timer("checkpoint.write"), DBConnector(self.instrumentation) as db:
+                for batch_no, batch in enumerate(batches):
+                    db.execute(query, (self.run_id, self.country_code, stage, batch_no, dumps_str(batch)))
+        except Exception as e:
+            # Sans point de reprise, seule une relance après interruption est plus coûteuse
+            print(f"Erreur lors de l'enregistrement du point de reprise '{stage}': {e}")
+
+    def loaded_batches(self) -> Set[int]:
+        if not self.resumed:
+            return set()
+        with DBConnector(self.instrumentation) as db:
+            rows = db.execute(
+                "SELECT batch_no FROM etl_checkpoint WHERE run_id = %s AND stage = %s;",
+                (self.run_id, STAGE_LOAD), fetch=True
+            )
+        return {row['batch_no'] for row in rows}
+
+    def mark_loaded(self, db: DBConnector, batch_no: int):
+        """
+        Marque un lot chargé, dans la transaction de l'appelant. Deux reprises concurrentes
+        d'un même lot se bloquent sur la clé primaire: la seconde échoue sans rien écrire.
+        """
+        if not self.enabled:
+            return
+        db.execute(
+            "INSERT INTO etl_checkpoint (run_id, country_code, stage, batch_no) VALUES (%s, %s, %s, %s);",
+            (self.run_id, self.country_code, STAGE_LOAD, batch_no)
+        )
+
+    def clear(self):
+        """
+        Supprime les points de reprise de cette exécution (réussie: plus rien à reprendre). Ceux
+        d'une autre exécution interrompue du pays ne sont pas touchés.
+        """
+        if not self.enabled:
+            return
+        try:
+            with DBConnector(self.instrumentation) as db:
+                db.execute("DELETE FROM etl_checkpoint WHERE run_id = %s;", (self.run_id,))
+        except Exception as e:
+            print(f"Erreur lors de la suppression des points de reprise: {e}")
@@ -0,0 +1,178 @@
+import uuid
+from collections import defaultdict
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from src.db_connector import DBConnector
+from src.etl.instrumentation import Instrumentation
+from src.etl.normalization import normalize_name, name_tokens
+from src.etl.matching import SIMILARITY_THRESHOLD, score_matrix, rounded
+from src.etl.union_find import UnionFind
+
+class EntityResolver:
+    """
+    Résolution d'entités sur l'ensemble d'une exécution: construit un graphe de
+    similarité entre tous les noms extraits et leurs voisins du registre (blocage
+    par jeton de nom), le regroupe par union-find, puis associe chaque groupe à
+    un seul PEP maître (existant ou nouveau).
+
+    Deux noms sont reliés si leur token_sort_ratio dépasse SIMILARITY_THRESHOLD (scores
+    calculés en matrice par bloc, voir src/etl/matching.py), ou si l'un est un nom de
+    famille seul désignant sans ambiguïté l'autre ("M. Akhannouch" / "Aziz Akhannouch").
+    Deux maîtres existants ne sont jamais fusionnés entre eux. Les voisins du registre
+    sont tous les alias connus (table pep_alias), pas seulement le nom de la version courante.
+    """
+
+    def __init__(self, country_code: str, instrumentation: Optional[Instrumentation] = None):
+        self.country_code = country_code
+        self.instrumentation = instrumentation or Instrumentation()
+
+    def fetch_registry_neighbours(self, tokens: List[str]) -> List[Dict[str, Any]]:
+        """
+        Récupère en une seule requête les alias du registre ayant l'un des jetons comme
+        jeton entier ("ali" ne ramène pas "khalid"), via l'index GIN des jetons de pep_alias,
+        avec le nom courant du PEP correspondant.
+        """
+        if not tokens:
+            return []
+        query = """
+        SELECT DISTINCT pa.pep_id AS id, pa.alias_norm, pv.data_jsonb->>'full_name' AS full_name
+        FROM pep_alias pa
+        JOIN pep_master pm ON pm.id = pa.pep_id
+        JOIN pep_version pv ON pv.version_id = pm.current_version_id AND pv.last_updated = pm.current_version_at
+        WHERE pa.country_code = %s AND string_to_array(pa.alias_norm, ' ') && %s::text[];
+        """
+        with DBConnector(self.instrumentation) as db:
+            rows = db.execute(query, (self.country_code, sorted(tokens)), fetch=True)
+        return [{"id": str(row['id']), "alias_norm": row['alias_norm'], "full_name": row['full_name']} for row in rows]
+
+    def resolve(self, names: List[str], registry: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Résout une liste de noms extraits.
+        registry: alias du registre {"id", "full_name", "alias_norm" (facultatif)};
+        par défaut, les voisins sont lus dans pep_alias.
+        Retourne {nom: {"pep_id", "existing", "canonical_name", "variants"}}.
+        """
+        # Noeuds: ("c", nom extrait) et ("r", pep_id, alias normalisé) pour chaque alias du registre
+        normalized: Dict[Tuple[str, ...], str] = {}
+        display: Dict[Tuple[str, ...], str] = {}
+        for name in names:
+            normalized[("c", name)] = normalize_name(name)
+            display[("c", name)] = name
+
+        candidate_tokens = {token for node, norm in normalized.items() for token in name_tokens(norm)}
+        if registry is None:
+            registry = self.fetch_registry_neighbours(list(candidate_tokens))
+
+        blocks = defaultdict(list)
+        for node, norm in list(normalized.items()):
+            for token in name_tokens(norm):
+                blocks[token].append(node)
+        for pep in registry:
+            norm = pep.get('alias_norm') or normalize_name(pep['full_name'] or "")
+            tokens = [t for t in name_tokens(norm) if t in candidate_tokens]
+            node = ("r", pep['id'], norm)
+            if not tokens or node in normalized:
+                continue
+            normalized[node] = norm
+            display[node] = pep['full_name']
+            for token in tokens:
+                blocks[token].append(node)
+
+        with self.instrumentation.timer("transform.er_graph"):
+            uf, scores = self._build_graph(normalized, blocks)
+
+        resolutions = {}
+        for members in uf.groups().values():
+            candidates = [m for m in members if m[0] == "c"]
+            if not candidates:
+                continue
+            masters = [m for m in members if m[0] == "r"]
+            for master, group in self._assign_masters(candidates, masters, scores, normalized).items():
+                if master is None:
+                    pep_id = str(uuid.uuid4())
+                    # Nom canonique d'un nouveau PEP: la variante la plus complète
+                    canonical = max((display[c] for c in group), key=lambda n: (len(normalize_name(n).split()), len(n)))
+                else:
+                    pep_id, canonical = master[1], display[master]
+                variants = [c[1] for c in group]
+                for candidate in group:
+                    resolutions[candidate[1]] = {
+                        "pep_id": pep_id,
+                        "existing": master is not None,
+                        "canonical_name": canonical,
+                        "variants": variants,
+                    }
+        return resolutions
+
+    def _build_graph(self, normalized: Dict[Tuple[str, str], str], blocks: Dict[str, List[Tuple[str, str]]]):
+        uf = UnionFind()
+        for node in normalized:
+            if node[0] == "c":
+                uf.add(node)
+
+        scores: Dict[Tuple[Any, Any], int] = {}
+        # Formes abrégées: nom court (un seul jeton) -> noms longs qui le contiennent
+        supersets = defaultdict(set)
+        for token, block in blocks.items():
+            candidates = [node for node in block if node[0] == "c"]
+            if not candidates:
+                continue
+            # Une matrice de scores par bloc (noms extraits x tous les noeuds du bloc);
+            # les noms sont déjà normalisés, pas de prétraitement supplémentaire
+            with self.instrumentation.timer("transform.fuzzy_match"):
+                block_scores = rounded(score_matrix(
+                    [normalized[c] for c in candidates], [normalized[n] for n in block], preprocess=False
+                ))
+            for i, j in zip(*np.nonzero(block_scores > SIMILARITY_THRESHOLD)):
+                a, b = candidates[i], block[j]
+                if a == b:
+                    continue
+                pair = (a, b) if a <= b else (b, a)
+                scores[pair] = int(block_scores[i, j])
+                uf.add(b)
+                uf.union(a, b)
+
+            for short in candidates:
+                if normalized[short] != token:
+                    continue
+                for node in block:
+                    tokens = normalized[node].split()
+                    if len(tokens) > 1 and tokens[-1] == token:
+                        supersets[short].add(node)
+
+        for short, longer in supersets.items():
+            # Liaison uniquement si la forme abrégée ne désigne qu'une seule personne
+            roots = {uf.find(n) if n in uf.parent else n for n in longer}
+            if len(roots) == 1:
+                target = next(iter(longer))
+                uf.add(target)
+                uf.union(short, target)
+                pair = (short, target) if short <= target else (target, short)
+                scores[pair] = SIMILARITY_THRESHOLD
+        return uf, scores
+
+    def _assign_masters(self, candidates, masters, scores, normalized) -> Dict[Any, List[Any]]:
+        """
+        Associe les noms d'un groupe à un maître existant (ou None pour un nouveau PEP).
+        Un maître peut être présent via plusieurs alias: la clé retournée est l'un de ses noeuds.
+        """
+        if not masters:
+            return {None: candidates}
+        by_pep = defaultdict(list)
+        for master in masters:
+            by_pep[master[1]].append(master)
+        if len(by_pep) == 1:
+            return {masters[0]: candidates}
+
+        # Plusieurs maîtres existants dans le même groupe: chaque nom rejoint le maître
+        # le plus similaire (les maîtres existants restent distincts)
+        assignment = defaultdict(list)
+        for candidate in candidates:
+            def similarity(master):
+                pair = (candidate, master) if candidate <= master else (master, candidate)
+                if pair in scores:
+                    return scores[pair]
+                return int(rounded(score_matrix([normalized[candidate]], [normalized[master]], preprocess=False, score_cutoff=0))[0, 0])
+            best = max(masters, key=similarity)
+            assignment[by_pep[best[1]][0]].append(candidate)
+        return assignment
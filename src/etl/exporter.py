@@ -1,39 +1,68 @@
-import json
 import csv
 from datetime import datetime
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from src.db_connector import DBConnector
+from src.etl.instrumentation import Instrumentation
+from src.etl.models import dumps
 
 class Exporter:
     """Gère la génération des exports quotidiens (JSON et CSV)."""
     
-    def __init__(self, output_dir: str = "exports"):
+    def __init__(self, output_dir: str = "exports", instrumentation: Optional[Instrumentation] = None,
+                 as_of: Optional[datetime] = None, country_code: Optional[str] = None):
         self.output_path = Path(output_dir)
-        self.output_path.mkdir(exist_ok=True)
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        self.instrumentation = instrumentation or Instrumentation()
+        # Date de l'état exporté (None: versions actuelles)
+        self.as_of = as_of
+        # Pays exporté (None: tous les pays du registre)
+        self.country_code = country_code
 
     def _fetch_active_peps(self) -> List[Dict[str, Any]]:
-        """Récupère tous les enregistrements PPE actifs (dernière version) de la DB."""
-        query = """
-        SELECT pv.data_jsonb
-        FROM pep_master pm
-        JOIN pep_version pv ON pm.current_version_id = pv.version_id
-        WHERE pv.status = 'active' OR pv.status = 'under_review';
-        """
-        with DBConnector() as db:
-            results = db.execute(query, fetch=True)
+        """Récupère tous les enregistrements PPE actifs (dernière version, ou version valide à as_of) de la DB."""
+        if self.as_of is not None:
+            query = """
+            SELECT pv.data_jsonb
+            FROM (
+                SELECT pep_id, data_jsonb, status, last_updated, valid_period FROM pep_version
+                UNION ALL
+                SELECT pep_id, data_jsonb, status, last_updated, valid_period FROM pep_version_archive
+            ) AS pv
+            JOIN pep_master pm ON pm.id = pv.pep_id
+            WHERE pv.last_updated <= %s AND pv.valid_period @> %s::timestamptz
+              AND (pv.status = 'active' OR pv.status = 'under_review')
+              AND (%s::text IS NULL OR pm.country_code = %s);
+            """
+            params = (self.as_of, self.as_of, self.country_code, self.country_code)
+        else:
+            query = """
+            SELECT pv.data_jsonb
+            FROM pep_master pm
+            JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+            WHERE (pv.status = 'active' OR pv.status = 'under_review')
+              AND (%s::text IS NULL OR pm.country_code = %s);
+            """
+            params = (self.country_code, self.country_code)
+        with self.instrumentation.timer("export.fetch"), DBConnector(self.instrumentation) as db:
+            results = db.execute(query, params, fetch=True)
             # data_jsonb est déjà un dictionnaire grâce à RealDictCursor
             return [res['data_jsonb'] for res in results]
 
+    def _snapshot_name(self) -> str:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if self.as_of is not None:
+            return f"pep_registry_snapshot_asof_{self.as_of.strftime('%Y%m%d_%H%M%S')}_{timestamp}"
+        return f"pep_registry_snapshot_{timestamp}"
+
     def generate_json_export(self) -> str:
         """Génère l'export JSON complet."""
         records = self._fetch_active_peps()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"pep_registry_snapshot_{timestamp}.json"
+        filename = f"{self._snapshot_name()}.json"
         filepath = self.output_path / filename
         
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(records, f, ensure_ascii=False, indent=4)
+        with self.instrumentation.timer("export.write_json"), open(filepath, 'wb') as f:
+            f.write(dumps(records, indent=True))
         
         print(f"Export JSON généré: {filepath}")
         return str(filepath)
@@ -45,8 +74,7 @@ class Exporter:
             print("Aucun enregistrement à exporter en CSV.")
             return ""
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"pep_registry_snapshot_{timestamp}.csv"
+        filename = f"{self._snapshot_name()}.csv"
         filepath = self.output_path / filename
 
         # Définir les champs CSV (aplati)
@@ -56,7 +84,7 @@ class Exporter:
             "sanctions_match_count", "first_seen", "last_updated"
         ]
 
-        with open(filepath, 'w', encoding='utf-8', newline='') as f:
+        with self.instrumentation.timer("export.write_csv"), open(filepath, 'w', encoding='utf-8', newline='') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             writer.writeheader()
             
@@ -114,3 +142,20 @@ class PEPRegistryETL:
         print(f"Pipeline ETL pour {self.country_code} terminé.")
 
     # ... (méthodes _extract_data et _load_data existantes) ...
+
+if __name__ == '__main__':
+    # Export ponctuel de l'état du registre à une date donnée:
+    # python -m src.etl.exporter --as-of 2025-01-01 [--country MA] [--output-dir exports/MA]
+    import argparse
+    from datetime import timezone
+    parser = argparse.ArgumentParser(description="Export JSON et CSV du registre PPE.")
+    parser.add_argument("--as-of", type=datetime.fromisoformat, default=None, help="Date ISO 8601 (UTC par défaut)")
+    parser.add_argument("--output-dir", default="exports")
+    parser.add_argument("--country", default=None, help="Code pays (tous les pays par défaut)")
+    args = parser.parse_args()
+    as_of = args.as_of
+    if as_of is not None and as_of.tzinfo is None:
+        as_of = as_of.replace(tzinfo=timezone.utc)
+    exporter = Exporter(output_dir=args.output_dir, as_of=as_of, country_code=args.country.upper() if args.country else None)
+    exporter.generate_json_export()
+    exporter.generate_csv_export()
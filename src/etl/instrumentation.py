@@ -0,0 +1,168 @@
+import os
+import json
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import wraps
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+class InstrumentationHook:
+    """
+    Interface des hooks d'instrumentation. Un hook reçoit les événements
+    (étapes, timers, compteurs) et peut les exporter où il le souhaite
+    (table etl_run, logs, APM...). Toutes les méthodes sont optionnelles.
+    """
+
+    def on_stage_start(self, name: str):
+        pass
+
+    def on_stage_end(self, name: str, duration: float):
+        pass
+
+    def on_timer(self, name: str, duration: float):
+        pass
+
+    def on_count(self, name: str, value: int):
+        pass
+
+class Instrumentation:
+    """
+    Surface d'instrumentation du pipeline ETL: timers et compteurs autour de
+    chaque étape et des fonctions critiques (lot NER, fuzzy matching, requête SQL),
+    capture de profil optionnelle par étape et rapport d'exécution JSON.
+    """
+
+    PROFILERS = ("cprofile", "pyinstrument")
+
+    def __init__(self, profiler: Optional[str] = None, profile_dir: str = "profiles",
+                 hooks: Optional[List[InstrumentationHook]] = None):
+        if profiler and profiler not in self.PROFILERS:
+            raise ValueError(f"Profileur inconnu: {profiler}. Valeurs possibles: {', '.join(self.PROFILERS)}")
+        self.profiler = profiler
+        self.profile_dir = Path(profile_dir)
+        self.hooks: List[InstrumentationHook] = list(hooks or [])
+        self.started_at = datetime.now(timezone.utc)
+        self.stages: Dict[str, float] = {}
+        self.timers: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {}
+        self.profiles: Dict[str, str] = {}
+
+    @classmethod
+    def from_env(cls, hooks: Optional[List[InstrumentationHook]] = None) -> "Instrumentation":
+        """Construit l'instrumentation à partir de PEP_ETL_PROFILE et PEP_ETL_PROFILE_DIR."""
+        return cls(
+            profiler=os.environ.get("PEP_ETL_PROFILE") or None,
+            profile_dir=os.environ.get("PEP_ETL_PROFILE_DIR", "profiles"),
+            hooks=hooks
+        )
+
+    def add_hook(self, hook: InstrumentationHook):
+        self.hooks.append(hook)
+
+    def _emit(self, event: str, *args):
+        for hook in self.hooks:
+            getattr(hook, event)(*args)
+
+    @contextmanager
+    def stage(self, name: str):
+        """Mesure une étape du pipeline (E, T, L, X) et capture son profil si demandé."""
+        self._emit("on_stage_start", name)
+        profiler = self._start_profiler()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            if profiler is not None:
+                self._stop_profiler(profiler, name)
+            self.stages[name] = self.stages.get(name, 0.0) + duration
+            self._emit("on_stage_end", name, duration)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Mesure une fonction critique; les appels sont agrégés (nombre, total, max)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            timer_stats = self.timers.setdefault(name, {"calls": 0, "total": 0.0, "max": 0.0})
+            timer_stats["calls"] += 1
+            timer_stats["total"] += duration
+            timer_stats["max"] = max(timer_stats["max"], duration)
+            self._emit("on_timer", name, duration)
+
+    def timed(self, name: str):
+        """Décorateur équivalent à timer() pour une fonction entière."""
+        def decorator(func):
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def count(self, name: str, value: int = 1):
+        """Incrémente un compteur nommé."""
+        self.counters[name] = self.counters.get(name, 0) + value
+        self._emit("on_count", name, value)
+
+    def _start_profiler(self):
+        if self.profiler == "cprofile":
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+            return profiler
+        if self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument n'est pas installé. Profilage désactivé pour cette étape.")
+                return None
+            profiler = Profiler()
+            profiler.start()
+            return profiler
+        return None
+
+    def _stop_profiler(self, profiler, stage_name: str):
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        timestamp = self.started_at.strftime("%Y%m%d_%H%M%S")
+        if self.profiler == "cprofile":
+            profiler.disable()
+            path = self.profile_dir / f"{timestamp}_{stage_name}.prof"
+            profiler.dump_stats(str(path))
+        else:
+            profiler.stop()
+            path = self.profile_dir / f"{timestamp}_{stage_name}.html"
+            path.write_text(profiler.output_html(), encoding="utf-8")
+        self.profiles[stage_name] = str(path)
+        print(f"Profil de l'étape '{stage_name}' enregistré: {path}")
+
+    def report(self) -> Dict[str, Any]:
+        """Retourne le rapport d'exécution lisible par machine."""
+        return {
+            "started_at": self.started_at.isoformat(),
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "stages": {name: round(duration, 6) for name, duration in self.stages.items()},
+            "timers": {
+                name: {
+                    "calls": int(stats["calls"]),
+                    "total": round(stats["total"], 6),
+                    "mean": round(stats["total"] / stats["calls"], 6) if stats["calls"] else 0.0,
+                    "max": round(stats["max"], 6),
+                }
+                for name, stats in self.timers.items()
+            },
+            "counters": dict(self.counters),
+            "profiles": dict(self.profiles),
+        }
+
+    def write_report(self, path: str) -> str:
+        """Écrit le rapport d'exécution au format JSON."""
+        report_path = Path(path)
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=4)
+        print(f"Rapport d'instrumentation généré: {report_path}")
+        return str(report_path)
@@ -0,0 +1,209 @@
+"""
+Maintenance de l'historique du registre.
+
+Compaction (python -m src.etl.maintenance compact [CODE_PAYS]):
+1. les suites de versions consécutives identiques d'un PPE (mêmes données hors
+   VOLATILE_FIELDS, même statut et même score) sont fusionnées en une seule version,
+   qui conserve le premier first_seen et couvre la période de validité de toute la suite; les entrées d'audit, les alias
+   et les événements du flux de changements qui référençaient les versions supprimées sont rattachés
+   à la version conservée;
+2. les versions plus anciennes que keep_days, ou au-delà des max_versions plus récentes
+   d'un PPE, sont déplacées vers pep_version_archive avec les entrées d'audit qui
+   les référencent (audit_log_archive), tables partitionnées par année. Les événements de
+   change_event gardent leur version_id: une version archivée se lit avec include_archived=true.
+La version courante d'un PPE (pep_master.current_version_id) n'est jamais supprimée ni archivée.
+
+Partitions (python -m src.etl.maintenance partitions): crée les partitions mensuelles
+de pep_version et audit_log des mois à venir (voir src/etl/partitions.py).
+
+Flux de changements (python -m src.etl.maintenance prune-changes): supprime les
+événements de change_event plus anciens que la rétention du flux.
+"""
+import argparse
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from src.db_connector import DBConnector
+from src.etl.partitions import PARTITION_MONTHS_AHEAD, ensure_archive_partitions, ensure_partitions
+from src.etl.storage import VOLATILE_FIELDS
+
+# Rétention par défaut de l'historique "chaud" (interrogé par l'API sans include_archived)
+DEFAULT_KEEP_DAYS = 365
+DEFAULT_MAX_VERSIONS = 50
+# Rétention des événements du flux de changements (reprise possible pendant cette durée)
+DEFAULT_CHANGE_RETENTION_DAYS = 30
+
+def collapse_identical_versions(db: DBConnector, country_code: Optional[str] = None) -> int:
+    """Fusionne les suites de versions consécutives identiques. Retourne le nombre de versions supprimées."""
+    query = """
+    CREATE TEMP TABLE tmp_version_runs ON COMMIT DROP AS
+    WITH ordered AS (
+        SELECT pv.version_id, pv.pep_id, pv.first_seen, pv.last_updated, pv.valid_period,
+               pv.data_jsonb - %s::text[] AS body, pv.status, pv.confidence_score,
+               pv.version_id = pm.current_version_id AS is_current
+        FROM pep_version pv
+        JOIN pep_master pm ON pm.id = pv.pep_id
+        WHERE %s::text IS NULL OR pm.country_code = %s
+    ), marked AS (
+        SELECT *,
+               CASE WHEN body = LAG(body) OVER w AND status = LAG(status) OVER w
+                         AND confidence_score = LAG(confidence_score) OVER w
+                    THEN 0 ELSE 1 END AS is_start
+        FROM ordered
+        WINDOW w AS (PARTITION BY pep_id ORDER BY last_updated, version_id)
+    ), grouped AS (
+        SELECT *, SUM(is_start) OVER (PARTITION BY pep_id ORDER BY last_updated, version_id) AS run_no
+        FROM marked
+    )
+    SELECT version_id, pep_id,
+           -- Version conservée: la version courante si elle fait partie de la suite, sinon la plus récente
+           COALESCE(
+               (MAX(CASE WHEN is_current THEN version_id::text END) OVER r)::uuid,
+               LAST_VALUE(version_id) OVER r
+           ) AS keep_id,
+           MIN(first_seen) OVER r AS run_first_seen,
+           -- Période de validité de la suite: du début de la première version à la fin de la dernière
+           tstzrange(
+               MIN(lower(valid_period)) OVER r,
+               CASE WHEN bool_or(upper_inf(valid_period)) OVER r THEN NULL ELSE MAX(upper(valid_period)) OVER r END
+           ) AS run_valid_period
+    FROM grouped
+    WINDOW r AS (PARTITION BY pep_id, run_no ORDER BY last_updated, version_id
+                 ROWS BETWEEN UNBOUNDED PRECEDING AND UNBOUNDED FOLLOWING);
+    """
+    db.execute(query, (list(VOLATILE_FIELDS), country_code, country_code))
+
+    db.execute("""
+    UPDATE audit_log a SET version_id = t.keep_id
+    FROM tmp_version_runs t
+    WHERE a.version_id = t.version_id AND t.version_id <> t.keep_id;
+    """)
+    db.execute("""
+    UPDATE change_event e SET version_id = t.keep_id
+    FROM tmp_version_runs t
+    WHERE e.version_id = t.version_id AND t.version_id <> t.keep_id;
+    """)
+    db.execute("""
+    UPDATE pep_alias pa SET first_seen_version_id = t.keep_id
+    FROM tmp_version_runs t
+    WHERE pa.first_seen_version_id = t.version_id AND t.version_id <> t.keep_id;
+    """)
+    db.execute("""
+    UPDATE pep_version pv SET first_seen = t.run_first_seen, valid_period = t.run_valid_period
+    FROM tmp_version_runs t
+    WHERE pv.version_id = t.keep_id AND t.version_id = t.keep_id
+      AND (pv.first_seen <> t.run_first_seen OR pv.valid_period <> t.run_valid_period);
+    """)
+    removed = db.execute("""
+    DELETE FROM pep_version pv
+    USING tmp_version_runs t
+    WHERE pv.version_id = t.version_id AND t.version_id <> t.keep_id
+    RETURNING pv.version_id;
+    """, fetch=True)
+    db.execute("DROP TABLE tmp_version_runs;")
+    return len(removed)
+
+def archive_old_versions(db: DBConnector, country_code: Optional[str] = None,
+                         keep_days: int = DEFAULT_KEEP_DAYS, max_versions: int = DEFAULT_MAX_VERSIONS) -> Dict[str, int]:
+    """
+    Déplace vers le stockage froid les versions (non courantes) plus anciennes que keep_days
+    ou au-delà des max_versions plus récentes de chaque PPE, avec leurs entrées d'audit.
+    """
+    query = """
+    CREATE TEMP TABLE tmp_version_archive ON COMMIT DROP AS
+    SELECT version_id FROM (
+        SELECT pv.version_id, pv.last_updated, pv.version_id = pm.current_version_id AS is_current,
+               ROW_NUMBER() OVER (PARTITION BY pv.pep_id ORDER BY pv.last_updated DESC, pv.version_id DESC) AS rank
+        FROM pep_version pv
+        JOIN pep_master pm ON pm.id = pv.pep_id
+        WHERE %s::text IS NULL OR pm.country_code = %s
+    ) ranked
+    WHERE NOT is_current
+      AND (last_updated < NOW() - make_interval(days => %s) OR rank > %s);
+    """
+    db.execute(query, (country_code, country_code, keep_days, max_versions))
+
+    # Partitions annuelles des années archivées (versions et entrées d'audit)
+    bounds = db.execute("""
+    SELECT LEAST(MIN(pv.last_updated), MIN(a.timestamp)) AS first_at,
+           GREATEST(MAX(pv.last_updated), MAX(a.timestamp)) AS last_at
+    FROM tmp_version_archive t
+    JOIN pep_version pv ON pv.version_id = t.version_id
+    LEFT JOIN audit_log a ON a.version_id = t.version_id;
+    """, fetch=True)[0]
+    if bounds['first_at'] is not None:
+        ensure_archive_partitions(db, bounds['first_at'], bounds['last_at'])
+
+    versions = db.execute("""
+    INSERT INTO pep_version_archive (version_id, pep_id, data_jsonb, confidence_score, status, first_seen, last_updated, valid_period)
+    SELECT pv.version_id, pv.pep_id, pv.data_jsonb, pv.confidence_score, pv.status, pv.first_seen, pv.last_updated, pv.valid_period
+    FROM pep_version pv
+    JOIN tmp_version_archive t ON t.version_id = pv.version_id
+    RETURNING version_id;
+    """, fetch=True)
+    audits = db.execute("""
+    WITH moved AS (
+        DELETE FROM audit_log a
+        USING tmp_version_archive t
+        WHERE a.version_id = t.version_id
+        RETURNING a.log_id, a.timestamp, a.pep_id, a.version_id, a.actor, a.source, a.reason
+    )
+    INSERT INTO audit_log_archive (log_id, timestamp, pep_id, version_id, actor, source, reason)
+    SELECT log_id, timestamp, pep_id, version_id, actor, source, reason FROM moved
+    RETURNING log_id;
+    """, fetch=True)
+    db.execute("DELETE FROM pep_version pv USING tmp_version_archive t WHERE pv.version_id = t.version_id;")
+    db.execute("DROP TABLE tmp_version_archive;")
+    return {"versions_archived": len(versions), "audit_archived": len(audits)}
+
+def compact_history(country_code: Optional[str] = None, keep_days: int = DEFAULT_KEEP_DAYS,
+                    max_versions: int = DEFAULT_MAX_VERSIONS) -> Dict[str, int]:
+    """Compaction complète de l'historique, en une transaction."""
+    with DBConnector() as db:
+        stats = {"versions_collapsed": collapse_identical_versions(db, country_code)}
+        stats.update(archive_old_versions(db, country_code, keep_days, max_versions))
+    print(f"Compaction de l'historique ({country_code or 'tous pays'}): {stats['versions_collapsed']} versions fusionnées, "
+          f"{stats['versions_archived']} versions et {stats['audit_archived']} entrées d'audit archivées.")
+    return stats
+
+def create_upcoming_partitions(months_ahead: int = PARTITION_MONTHS_AHEAD) -> List[str]:
+    """Crée les partitions du mois courant et des months_ahead mois suivants."""
+    with DBConnector() as db:
+        created = ensure_partitions(db, datetime.now(timezone.utc), months_ahead=months_ahead)
+    if not created:
+        print("Partitions: aucune partition à créer.")
+    return created
+
+def prune_change_events(keep_days: int = DEFAULT_CHANGE_RETENTION_DAYS) -> int:
+    """Supprime les événements plus anciens que keep_days. Retourne le nombre d'événements supprimés."""
+    with DBConnector() as db:
+        removed = db.execute(
+            "DELETE FROM change_event WHERE created_at < NOW() - make_interval(days => %s) RETURNING event_id;",
+            (keep_days,), fetch=True
+        )
+    print(f"Flux de changements: {len(removed)} événements supprimés.")
+    return len(removed)
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance de l'historique du registre PPE.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    compact = subparsers.add_parser("compact", help="Fusionne les versions identiques et archive l'historique ancien")
+    compact.add_argument("country_code", nargs="?", help="Code pays (tous les pays par défaut)")
+    compact.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS, help="Âge maximal des versions non archivées")
+    compact.add_argument("--max-versions", type=int, default=DEFAULT_MAX_VERSIONS, help="Nombre maximal de versions non archivées par PPE")
+    partitions = subparsers.add_parser("partitions", help="Crée les partitions mensuelles des mois à venir")
+    partitions.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD, help="Nombre de mois créés à l'avance")
+    prune = subparsers.add_parser("prune-changes", help="Supprime les anciens événements du flux de changements")
+    prune.add_argument("--keep-days", type=int, default=DEFAULT_CHANGE_RETENTION_DAYS, help="Rétention des événements")
+    args = parser.parse_args(argv)
+
+    if args.command == "compact":
+        compact_history(args.country_code.upper() if args.country_code else None, args.keep_days, args.max_versions)
+    elif args.command == "partitions":
+        create_upcoming_partitions(args.months_ahead)
+    elif args.command == "prune-changes":
+        prune_change_events(args.keep_days)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,74 @@
+"""
+Moteur de scoring fuzzy vectorisé (rapidfuzz).
+
+Les scores sont calculés en matrice (requêtes x choix) par process.cdist, en C++
+et sur plusieurs threads, au lieu d'une boucle Python de fuzz.token_sort_ratio.
+
+Équivalence avec l'implémentation fuzzywuzzy historique:
+- fuzzywuzzy.fuzz.token_sort_ratio (avec python-Levenshtein) et
+  rapidfuzz.fuzz.token_sort_ratio calculent le même ratio d'Indel; fuzzywuzzy
+  l'arrondit à l'entier (round(), arrondi bancaire) avant la comparaison;
+- la règle historique est "score entier > 85". Elle est reproduite par
+  is_match(): np.rint(score) > SIMILARITY_THRESHOLD (np.rint arrondit comme round());
+- le prétraitement full_process de fuzzywuzzy (force_ascii=True) est remplacé par
+  preprocess_name(): accents retirés (é -> e), puis utils.default_process (minuscules,
+  caractères non alphanumériques remplacés par des espaces). Les résultats sont identiques
+  pour les noms ASCII. Ils diffèrent pour les autres: fuzzywuzzy supprime les caractères
+  non ASCII ("Hélène" -> "hlne", un nom en alphabet arabe devient vide et obtient 0),
+  preprocess_name() compare les lettres sans accents et conserve les autres alphabets.
+Le script benchmarks/matching_equivalence.py vérifie cette équivalence sur un corpus
+synthétique (noms ASCII); tests/test_matching.py fige les scores de quelques paires.
+"""
+from typing import List, Optional, Tuple
+import numpy as np
+from rapidfuzz import fuzz, process, utils
+from src.etl.normalization import strip_accents
+
+# Seuil historique de déduplication: score (entier) strictement supérieur à 85
+SIMILARITY_THRESHOLD = 85
+
+def preprocess_name(name: str) -> str:
+    """Prétraitement d'un nom avant scoring: accents retirés, puis utils.default_process."""
+    return utils.default_process(strip_accents(name))
+
+def score_matrix(queries: List[str], choices: List[str], preprocess: bool = True,
+                 score_cutoff: float = SIMILARITY_THRESHOLD, workers: int = -1) -> np.ndarray:
+    """
+    Matrice des scores token_sort_ratio (len(queries) x len(choices)).
+    Les scores inférieurs à score_cutoff sont mis à 0 (calcul abandonné plus tôt).
+    workers=-1 utilise tous les coeurs disponibles.
+    """
+    if not queries or not choices:
+        return np.zeros((len(queries), len(choices)), dtype=np.float64)
+    return process.cdist(
+        queries, choices,
+        scorer=fuzz.token_sort_ratio,
+        processor=preprocess_name if preprocess else None,
+        score_cutoff=score_cutoff,
+        dtype=np.float64,
+        workers=workers
+    )
+
+def rounded(scores: np.ndarray) -> np.ndarray:
+    """Arrondit les scores comme fuzzywuzzy (entier, arrondi bancaire)."""
+    return np.rint(scores).astype(np.int64)
+
+def is_match(scores: np.ndarray, threshold: int = SIMILARITY_THRESHOLD) -> np.ndarray:
+    """Masque booléen des correspondances selon la règle historique (score entier > seuil)."""
+    return rounded(scores) > threshold
+
+def best_matches(queries: List[str], choices: List[str], preprocess: bool = True,
+                 threshold: int = SIMILARITY_THRESHOLD) -> List[Optional[Tuple[int, int]]]:
+    """
+    Pour chaque requête, retourne (index du meilleur choix, score entier) ou None.
+    En cas d'égalité, le premier choix l'emporte, comme dans la boucle historique.
+    """
+    if not choices:
+        return [None] * len(queries)
+    scores = rounded(score_matrix(queries, choices, preprocess=preprocess, score_cutoff=threshold))
+    best_index = scores.argmax(axis=1)
+    best_score = scores[np.arange(len(queries)), best_index]
+    return [
+        (int(index), int(score)) if score > threshold else None
+        for index, score in zip(best_index, best_score)
+    ]
@@ -0,0 +1,141 @@
+"""
+Modèles des enregistrements du chemin de transformation et sérialiseur JSON commun.
+
+Les candidats (noms extraits d'un lot) et les enregistrements transformés sont des
+dataclasses à __slots__ (pas de __dict__ par instance), au lieu de dictionnaires imbriqués.
+dumps()/loads() sont les seuls points de sérialisation JSON du transformer, du loader, de
+l'exporteur et de l'API: orjson (dépendance de requirements.txt; dataclasses, datetime et UUID
+sérialisés nativement). Le repli sur le module json de la bibliothèque standard, avec le même
+format, ne sert qu'en développement local sans orjson installé.
+"""
+import dataclasses
+import json
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+try:
+    import orjson
+except ImportError:  # développement local uniquement: orjson est requis en production
+    orjson = None
+
+@dataclass(slots=True)
+class Position:
+    title: str
+    institution: str
+    source_id: Optional[int]
+
+@dataclass(slots=True)
+class SourceReference:
+    source_id: int
+    snippet: str
+    publish_date: Optional[str]
+
+@dataclass(slots=True)
+class PepCandidate:
+    """Nom de personne extrait d'un lot d'articles, avec ses sources et ses fonctions."""
+    sources: List[str] = field(default_factory=list)
+    positions: List[Position] = field(default_factory=list)
+
+@dataclass(slots=True)
+class PepCluster:
+    """Noms d'un lot résolus sur un même PEP maître (voir EntityResolver)."""
+    full_name: str
+    existing: bool
+    variants: List[str] = field(default_factory=list)
+    sources: List[str] = field(default_factory=list)
+    positions: List[Position] = field(default_factory=list)
+
+@dataclass(slots=True)
+class PepRecord:
+    """Corps d'une version PPE (colonne data_jsonb de pep_version), dans l'ordre des champs exportés."""
+    id: str
+    full_name: str
+    aliases: List[str]
+    gender: Optional[str]
+    date_of_birth: Optional[str]
+    nationality: List[str]
+    relationship_type: List[str]
+    current_positions: List[Position]
+    past_positions: List[Any]
+    family_members: List[Any]
+    associated_entities: List[Any]
+    sanctions_match: List[Any]
+    confidence_score: float
+    source_documents: List[SourceReference]
+    first_seen: str
+    last_updated: str
+    status: str
+    notes: str
+
+@dataclass(slots=True)
+class TransformedRecord:
+    """Enregistrement produit par Transformer.process_raw_data et chargé par le Loader."""
+    pep_id: str
+    record: PepRecord
+    confidence_score: float
+    status: str
+    # Noms extraits regroupés sur ce PEP (alimentent la table pep_alias)
+    variants: List[str] = field(default_factory=list)
+
+    def names(self) -> List[str]:
+        """Noms sous lesquels le PEP a été rapporté: variantes extraites, nom complet, alias."""
+        return list(self.variants) + [self.record.full_name] + list(self.record.aliases)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TransformedRecord":
+        """Reconstruit un enregistrement sérialisé par dumps() (points de reprise du pipeline)."""
+        record = dict(data['record'])
+        record['current_positions'] = [Position(**position) for position in record['current_positions']]
+        record['source_documents'] = [SourceReference(**source) for source in record['source_documents']]
+        return cls(
+            pep_id=data['pep_id'],
+            record=PepRecord(**record),
+            confidence_score=data['confidence_score'],
+            status=data['status'],
+            variants=list(data.get('variants', [])),
+        )
+
+def fields_dict(obj: Any, exclude: Iterable[str] = ()) -> Dict[str, Any]:
+    """Champs de premier niveau d'une dataclass ou d'un dictionnaire (copie superficielle)."""
+    excluded = set(exclude)
+    if dataclasses.is_dataclass(obj):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj) if f.name not in excluded}
+    return {k: v for k, v in obj.items() if k not in excluded}
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if dataclasses.is_dataclass(obj):
+        return fields_dict(obj)
+    if orjson is None:
+        if isinstance(obj, (datetime, date)):
+            return obj.isoformat()
+        if isinstance(obj, UUID):
+            return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Type non sérialisable en JSON: {type(obj).__name__}")
+
+def dumps(obj: Any, sort_keys: bool = False, indent: bool = False) -> bytes:
+    """Sérialise obj en JSON UTF-8 (compact, caractères non ASCII conservés)."""
+    if orjson is not None:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        if sort_keys:
+            # orjson ne trie pas les champs des dataclasses: elles passent par _default (dictionnaires)
+            option |= orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATACLASS
+        return orjson.dumps(obj, default=_default, option=option)
+    return json.dumps(
+        obj, default=_default, sort_keys=sort_keys, ensure_ascii=False,
+        indent=2 if indent else None, separators=(",", ": ") if indent else (",", ":")
+    ).encode("utf-8")
+
+def dumps_str(obj: Any, sort_keys: bool = False) -> str:
+    return dumps(obj, sort_keys=sort_keys).decode("utf-8")
+
+def loads(data: Any) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
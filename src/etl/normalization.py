@@ -0,0 +1,35 @@
+import re
+import unicodedata
+from typing import List
+
+# Civilités et titres honorifiques retirés des noms avant comparaison
+HONORIFICS = {
+    "m", "mr", "mme", "mlle", "dr", "pr", "me", "sm", "sar", "monsieur", "madame",
+    "mademoiselle", "docteur", "professeur", "maitre", "si", "sidi", "lalla", "hadj", "el hadj"
+}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+def strip_accents(text: str) -> str:
+    """Retire les accents (é -> e, ç -> c...)."""
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+def normalize_name(name: str) -> str:
+    """
+    Normalise un nom de personne pour la déduplication et l'indexation:
+    minuscules, sans accents ni ponctuation, civilités retirées, espaces compactés.
+    "M. Aziz Akhannouch" -> "aziz akhannouch".
+    """
+    if not name:
+        return ""
+    tokens = _NON_ALNUM.sub(" ", strip_accents(name).lower()).split()
+    while tokens and tokens[0] in HONORIFICS:
+        tokens = tokens[1:]
+    # "El Hadj" est composé de deux mots
+    if len(tokens) >= 2 and f"{tokens[0]} {tokens[1]}" in HONORIFICS:
+        tokens = tokens[2:]
+    return " ".join(tokens)
+
+def name_tokens(normalized_name: str, min_length: int = 3) -> List[str]:
+    """Jetons significatifs d'un nom normalisé (utilisés comme clés de blocage)."""
+    return [token for token in normalized_name.split() if len(token) >= min_length]
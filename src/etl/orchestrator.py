@@ -0,0 +1,104 @@
+"""
+Exécution du pipeline ETL pour plusieurs pays (python -m src.etl.orchestrator [CODES_PAYS...]).
+
+Sans argument, tous les pays ayant une configuration dans config/ sont traités; un pays sans
+spider déclaré (clé "spiders" de sa configuration) n'a rien à collecter et est sauté. Chaque pays
+tourne dans son propre processus (démarré par "spawn"): le réacteur Twisted de Scrapy ne
+redémarre pas dans un même processus, RAW_DATA_LIST et les modèles spaCy restent propres à
+un pays, et l'échec ou le plantage d'un pays n'interrompt pas les autres.
+
+Au plus max_workers pays tournent en même temps (PEP_ETL_MAX_WORKERS, par défaut le nombre
+de processeurs). Chaque processus a son pool de connexions (PEP_DB_POOL_SIZE, voir
+src/db_connector.py): la base reçoit au plus max_workers * PEP_DB_POOL_SIZE connexions du pipeline.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+from multiprocessing.connection import wait
+from typing import Dict, List, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from src.config import Config
+from src.db_connector import DBConnector
+from src.etl.partitions import ensure_country_partitions
+from src.etl.scheduler import configured_spiders
+
+DEFAULT_MAX_WORKERS = int(os.getenv("PEP_ETL_MAX_WORKERS", str(os.cpu_count() or 1)))
+# Code de sortie du processus d'un pays dont une autre exécution est déjà en cours
+EXIT_ALREADY_RUNNING = 75
+
+def _run_country(country_code: str):
+    """Point d'entrée du processus d'un pays."""
+    from src.etl.pep_etl import run_etl_pipeline
+    if not run_etl_pipeline(country_code):
+        sys.exit(EXIT_ALREADY_RUNNING)
+
+def prepare_countries(country_codes: List[str]):
+    """Crée les partitions pays avant le lancement (le DDL ne concurrence pas les chargements des autres pays)."""
+    with DBConnector() as db:
+        for country_code in country_codes:
+            ensure_country_partitions(db, country_code)
+
+def run_countries(country_codes: Optional[List[str]] = None, max_workers: int = DEFAULT_MAX_WORKERS) -> Dict[str, str]:
+    """
+    Lance le pipeline de chaque pays dans un processus séparé, au plus max_workers à la fois.
+    Retourne {code pays: "success" | "failed" | "skipped"}.
+    """
+    results: Dict[str, str] = {}
+    selected = []
+    for country_code in (code.upper() for code in (country_codes or Config.available_countries())):
+        # Configuration absente ou invalide: erreur immédiate, avant tout lancement
+        if configured_spiders(Config(country_code)):
+            selected.append(country_code)
+        else:
+            results[country_code] = "skipped"
+            print(f"[{country_code}] aucun spider configuré: pays sauté.")
+    country_codes = selected
+    if not country_codes:
+        return results
+    prepare_countries(country_codes)
+
+    context = multiprocessing.get_context("spawn")
+    pending = list(country_codes)
+    running: Dict[int, tuple] = {}
+    max_workers = max(1, max_workers)
+    print(f"Orchestrateur ETL: {len(country_codes)} pays ({', '.join(country_codes)}), {max_workers} en parallèle.")
+
+    while pending or running:
+        while pending and len(running) < max_workers:
+            country_code = pending.pop(0)
+            process = context.Process(target=_run_country, args=(country_code,), name=f"etl-{country_code}")
+            process.start()
+            running[process.sentinel] = (country_code, process, time.monotonic())
+            print(f"[{country_code}] pipeline démarré (pid {process.pid}).")
+
+        for sentinel in wait(list(running)):
+            country_code, process, started = running.pop(sentinel)
+            process.join()
+            if process.exitcode == EXIT_ALREADY_RUNNING:
+                results[country_code] = "skipped"
+            else:
+                results[country_code] = "success" if process.exitcode == 0 else "failed"
+            print(f"[{country_code}] pipeline terminé en {time.monotonic() - started:.1f}s "
+                  f"({results[country_code]}, code {process.exitcode}).")
+
+    failed = sorted(code for code, status in results.items() if status == "failed")
+    succeeded = sum(1 for code in country_codes if results[code] == "success")
+    print(f"Orchestrateur ETL terminé: {succeeded} pays réussis"
+          + (f", échecs: {', '.join(failed)}." if failed else "."))
+    return results
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Pipeline ETL du registre PPE pour plusieurs pays.")
+    parser.add_argument("country_codes", nargs="*", help="Codes pays (tous les pays de config/ par défaut)")
+    parser.add_argument("--max-workers", type=int, default=DEFAULT_MAX_WORKERS, help="Nombre de pays traités en parallèle")
+    args = parser.parse_args(argv)
+    results = run_countries(args.country_codes, args.max_workers)
+    return 0 if all(status != "failed" for status in results.values()) else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
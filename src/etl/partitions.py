@@ -0,0 +1,177 @@
+"""
+Gestion des partitions mensuelles de pep_version (last_updated) et audit_log (timestamp).
+
+Les deux tables sont partitionnées par plage (PARTITION BY RANGE) sans partition par
+défaut: une ligne dont le mois n'a pas de partition est rejetée. Le loader appelle donc
+ensure_partitions() avant chaque écriture, et la commande de maintenance
+(python -m src.etl.maintenance partitions) crée les partitions des mois à venir.
+
+Les tables d'archive (pep_version_archive, audit_log_archive) sont partitionnées par année
+sur les mêmes colonnes: la compaction appelle ensure_archive_partitions() pour les années
+des lignes qu'elle archive.
+
+pep_alias est partitionnée par pays (PARTITION BY LIST (country_code)): chaque pays a sa
+partition et donc ses propres index de noms (B-tree et GIN trigramme), que les recherches
+filtrées par pays sont seules à parcourir. Les lignes d'un pays sans partition vont dans
+pep_alias_default; ensure_country_partitions() crée la partition d'un pays et y déplace ces lignes.
+"""
+from datetime import date, datetime, timezone
+from typing import Dict, List, Optional, Set, Tuple
+from src.db_connector import DBConnector
+
+# Table partitionnée -> colonne de partitionnement
+PARTITIONED_TABLES: Dict[str, str] = {
+    "pep_version": "last_updated",
+    "audit_log": "timestamp",
+}
+
+# Tables d'archive partitionnées par année -> colonne de partitionnement
+ARCHIVE_PARTITIONED_TABLES: Dict[str, str] = {
+    "pep_version_archive": "last_updated",
+    "audit_log_archive": "timestamp",
+}
+
+# Tables partitionnées par pays (partition par défaut: <table>_default)
+COUNTRY_PARTITIONED_TABLES = ("pep_alias",)
+
+# Nombre de mois créés à l'avance au-delà du mois courant
+PARTITION_MONTHS_AHEAD = 3
+
+# Partitions dont l'existence est déjà vérifiée dans ce processus (évite un DDL par lot)
+_known_partitions: Set[str] = set()
+
+def month_start(value: datetime) -> date:
+    """Premier jour du mois (UTC) de value."""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return date(value.year, value.month, 1)
+
+def month_bound(month: date) -> str:
+    """Borne de partition en UTC (indépendante du fuseau horaire de la session)."""
+    return f"{month.isoformat()} 00:00:00+00"
+
+def add_months(month: date, count: int) -> date:
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(table: str, month: date) -> str:
+    """pep_version, 2026-10 -> pep_version_y2026m10"""
+    return f"{table}_y{month.year}m{month.month:02d}"
+
+def month_range(start: datetime, end: Optional[datetime] = None, months_ahead: int = 0) -> List[date]:
+    """Premiers jours des mois de start à end (inclus), plus months_ahead mois."""
+    first = month_start(start)
+    last = add_months(month_start(end or start), months_ahead)
+    months = []
+    while first <= last:
+        months.append(first)
+        first = add_months(first, 1)
+    return months
+
+def existing_partitions(db: DBConnector, table: str) -> Set[str]:
+    rows = db.execute("""
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = %s;
+    """, (table,), fetch=True)
+    return {row['relname'] for row in rows}
+
+def ensure_partitions(db: DBConnector, start: datetime, end: Optional[datetime] = None,
+                      months_ahead: int = 0) -> List[str]:
+    """
+    Crée les partitions mensuelles manquantes des tables partitionnées pour la période
+    [start, end] (+ months_ahead mois). Retourne les noms des partitions créées.
+    """
+    months = month_range(start, end, months_ahead)
+    wanted: List[Tuple[str, str, date]] = [
+        (table, partition_name(table, month), month)
+        for table in PARTITIONED_TABLES for month in months
+    ]
+    if all(name in _known_partitions for _, name, _ in wanted):
+        return []
+
+    created = []
+    existing = {table: existing_partitions(db, table) for table in PARTITIONED_TABLES}
+    for table, name, month in wanted:
+        if name not in existing[table]:
+            # Noms générés (table connue + année/mois): pas d'entrée utilisateur dans le DDL
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s);",
+                (month_bound(month), month_bound(add_months(month, 1)))
+            )
+            created.append(name)
+        else:
+            # Seules les partitions déjà validées sont mises en cache (la création
+            # peut encore être annulée avec la transaction de l'appelant)
+            _known_partitions.add(name)
+    if created:
+        print(f"Partitions créées: {', '.join(created)}.")
+    return created
+
+def year_partition_name(table: str, year: int) -> str:
+    """pep_version_archive, 2025 -> pep_version_archive_y2025"""
+    return f"{table}_y{year}"
+
+def ensure_archive_partitions(db: DBConnector, start: datetime, end: Optional[datetime] = None) -> List[str]:
+    """
+    Crée les partitions annuelles manquantes des tables d'archive pour les années de
+    start à end (incluses). Retourne les noms des partitions créées.
+    """
+    first, last = month_start(start).year, month_start(end or start).year
+    wanted = [
+        (table, year_partition_name(table, year), year)
+        for table in ARCHIVE_PARTITIONED_TABLES for year in range(first, last + 1)
+    ]
+    if all(name in _known_partitions for _, name, _ in wanted):
+        return []
+
+    created = []
+    existing = {table: existing_partitions(db, table) for table in ARCHIVE_PARTITIONED_TABLES}
+    for table, name, year in wanted:
+        if name not in existing[table]:
+            db.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES FROM (%s) TO (%s);",
+                (month_bound(date(year, 1, 1)), month_bound(date(year + 1, 1, 1)))
+            )
+            created.append(name)
+        else:
+            _known_partitions.add(name)
+    if created:
+        print(f"Partitions créées: {', '.join(created)}.")
+    return created
+
+def country_partition_name(table: str, country_code: str) -> str:
+    """pep_alias, MA -> pep_alias_ma"""
+    if len(country_code) != 2 or not country_code.isascii() or not country_code.isalpha():
+        raise ValueError(f"Code pays invalide: {country_code!r}")
+    return f"{table}_{country_code.lower()}"
+
+def ensure_country_partitions(db: DBConnector, country_code: str) -> List[str]:
+    """
+    Crée les partitions de country_code des tables partitionnées par pays, en y déplaçant
+    les lignes du pays présentes dans la partition par défaut. Retourne les partitions créées.
+    """
+    country_code = country_code.upper()
+    wanted = [(table, country_partition_name(table, country_code)) for table in COUNTRY_PARTITIONED_TABLES]
+    if all(name in _known_partitions for _, name in wanted):
+        return []
+
+    created = []
+    for table, name in wanted:
+        if name in existing_partitions(db, table):
+            _known_partitions.add(name)
+            continue
+        # La partition est remplie avant d'être attachée: ATTACH vérifie que la partition
+        # par défaut ne contient plus de ligne du pays
+        db.execute(f"CREATE TABLE IF NOT EXISTS {name} (LIKE {table} INCLUDING DEFAULTS);")
+        db.execute(f"""
+        WITH moved AS (DELETE FROM {table}_default WHERE country_code = %s RETURNING *)
+        INSERT INTO {name} SELECT * FROM moved;
+        """, (country_code,))
+        db.execute(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES IN (%s);", (country_code,))
+        created.append(name)
+    if created:
+        print(f"Partitions créées: {', '.join(created)}.")
+    return created
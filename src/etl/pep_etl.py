@@ -1,139 +1,236 @@
 import sys
 import os
-import json
-import csv
 # Ajouter le répertoire parent de 'etl' au chemin Python
 # Cela permet de résoudre l'erreur ModuleNotFoundError: No module named 'etl'
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from datetime import datetime
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
-from supabase import create_client, Client
+from datetime import datetime, timezone
+from typing import Optional
 from dotenv import load_dotenv
 
-# Charger les variables d'environnement
+# Charger les variables d'environnement (avant src.config, qui lit DATABASE_URL à l'import)
 load_dotenv()
 
+from src.config import Config
+from src.db_connector import DBConnector
+from src.etl.run_stats import RunStats
+from src.etl.instrumentation import Instrumentation
+from src.etl.transformer import Transformer
+from src.etl.loader import Loader
+from src.etl.storage import get_storage_backend
+from src.etl.exporter import Exporter
+from src.etl.scheduler import CrawlScheduler, configured_spiders, match_source
+from src.etl.checkpoints import RunCheckpoints, STAGE_EXTRACT, STAGE_TRANSFORM, batched, country_run_lock
+from src.etl.models import TransformedRecord
+
+COUNTRY_CODE = "MA"
+
 # Configuration Supabase
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-# Initialisation du client Supabase
-supabase_client: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
+# Client Supabase créé au premier usage: importer ce module ne doit ni charger
+# le SDK Supabase ni ouvrir de connexion
+_supabase_client = None
+
+def get_supabase_client():
+    """Retourne le client Supabase, créé une seule fois par processus."""
+    global _supabase_client
+    if _supabase_client is None:
+        from supabase import create_client
+        _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
+    return _supabase_client
 
 # Liste pour collecter les données brutes
 RAW_DATA_LIST = []
 
-def transform_to_pep_master_format(raw_data_list):
+def to_raw_source(item, config: Config):
     """
-    Transforme la liste des données brutes (items Scrapy) en un format
-    compatible avec la table 'pep_version' (en mappant les données dans data_jsonb).
+    Convertit un item Scrapy au format attendu par Transformer.process_raw_data
+    (source_type, weight, content, publish_date), en rattachant l'URL de l'article
+    à une source déclarée dans la configuration pays.
     """
-    supabase_data = []
-    for item in raw_data_list:
-        # Vérifier si l'item est un article de L'Economiste
-        if item.get('source') == "L'Economiste":
-            
-            # Créer l'objet JSON qui sera inséré dans la colonne data_jsonb
-            data_jsonb_content = {
-                'url': item.get('url'),
-                'title': item.get('title'),
-                'content': item.get('content'),
-                'source': item.get('source'),
-                'date_published': item.get('date_published'),
-                'date_scraped': item.get('date_scraped', datetime.now().isoformat()),
-            }
-            
-            # Créer l'objet de données pour Supabase (pour la table pep_version)
-            data_entry = {
-                # pep_id est une clé étrangère, nous ne la fournissons pas ici
-                'data_jsonb': data_jsonb_content,
-                'confidence_score': 1.0, # Score de confiance élevé pour les données brutes
-                'status': 'under_review', # Statut par défaut
-                # first_seen et last_updated sont gérés par la base de données
-            }
-            supabase_data.append(data_entry)
-        
-    return supabase_data
+    source_type, weight = match_source(config, item.get('url', '')) or (
+        item.get('source_type', 'media'), item.get('weight', 0.0)
+    )
+
+    content = item.get('content', '')
+    if item.get('title') and not content.startswith(item['title']):
+        content = f"{item['title']}. {content}"
+
+    return {
+        **item,
+        "source_type": source_type,
+        "weight": weight,
+        "content": content,
+        # Les dates publiées par les spiders sont en texte libre: date de collecte par défaut
+        "publish_date": item.get('publish_date') or datetime.now(timezone.utc).strftime("%Y-%m-%d"),
+    }
+
+def require_database():
+    """
+    Vérifie que la base PostgreSQL (DATABASE_URL) est joignable. Le pipeline en a besoin quel que
+    soit le backend de stockage: sources (source_document), résolution d'entités, statistiques
+    (etl_run), points de reprise (etl_checkpoint), planificateur de crawl et exports. Le backend
+    supabase ne remplace que l'écriture des lots.
+    """
+    try:
+        with DBConnector() as db:
+            db.execute("SELECT 1;", fetch=True)
+    except Exception as e:
+        raise RuntimeError(
+            "Le pipeline ETL nécessite une connexion PostgreSQL directe (DATABASE_URL, par exemple la "
+            f"chaîne de connexion de la base Supabase), y compris avec PEP_STORAGE_BACKEND=supabase: {e}"
+        ) from e
+
+def run_etl_pipeline(country_code: str = COUNTRY_CODE, resume: Optional[bool] = None) -> bool:
+    """
+    Exécute le pipeline d'un pays. Par défaut (PEP_ETL_RESUME=1), une exécution interrompue
+    récente est reprise à partir de ses points de reprise (voir src/etl/checkpoints.py).
+    Retourne False, sans rien exécuter, si une autre exécution du pays est en cours.
+    """
+    config = Config(country_code)
+    print(f"Initialisation du pipeline ETL pour le pays : {config.get('country_name', country_code)}")
+    require_database()
+    if resume is None:
+        resume = os.environ.get("PEP_ETL_RESUME", "1") != "0"
+
+    # Une seule exécution par pays à la fois: sans ce verrou, une exécution en cours
+    # pourrait être reprise (et ses lots chargés deux fois) par une seconde exécution
+    with country_run_lock(config.country_code) as acquired:
+        if not acquired:
+            print(f"Une exécution du pipeline est déjà en cours pour {config.country_code}: exécution ignorée.")
+            return False
+        _run_locked(config, resume)
+    return True
+
+def _run_locked(config: Config, resume: bool):
+    checkpoints = RunCheckpoints.resume_or_start(config.country_code, resume=resume)
+    # Statistiques de l'exécution (enregistrées dans la table etl_run, sous le run_id repris)
+    stats = RunStats(config.country_code, run_id=checkpoints.run_id)
+    if checkpoints.resumed:
+        stats.resume_previous()
+    # Instrumentation (timers, compteurs, profilage optionnel via PEP_ETL_PROFILE)
+    instrumentation = Instrumentation.from_env(hooks=[stats])
+    checkpoints.instrumentation = instrumentation
+    try:
+        _run_etl_stages(config, instrumentation, checkpoints)
+        checkpoints.clear()
+    except Exception:
+        stats.finish(status="failed")
+        raise
+    else:
+        stats.finish()
+    finally:
+        stats.save()
+        report_path = os.environ.get("PEP_ETL_REPORT", f"reports/etl_run_{stats.run_id}.json")
+        instrumentation.write_report(report_path)
+
+def _run_etl_stages(config: Config, instrumentation: Instrumentation, checkpoints: RunCheckpoints):
+    country_code = config.country_code
 
-def run_etl_pipeline():
-    print("Initialisation du pipeline ETL pour le pays : Maroc")
-    
     # ÉTAPE 1 : EXTRACTION (E)
     print("\n--- ÉTAPE 1 : EXTRACTION (E) ---")
     
+    scheduler = None
+    extracted = checkpoints.load_stage(STAGE_EXTRACT)
+    if extracted is not None:
+        RAW_DATA_LIST[:] = [item for batch in extracted for item in batch]
+        print(f"Extraction reprise du point de reprise: {len(RAW_DATA_LIST)} éléments.")
+    else:
+        scheduler = _extract(config, instrumentation)
+        checkpoints.save_stage(STAGE_EXTRACT, batched(RAW_DATA_LIST))
+        # Compté par la tentative qui a crawlé (une reprise repart des compteurs enregistrés)
+        instrumentation.count("items_crawled", len(RAW_DATA_LIST))
+    
+    # ÉTAPE 2 : TRANSFORMATION (T)
+    print("\n--- ÉTAPE 2 : TRANSFORMATION (T) ---")
+    
+    transformed = checkpoints.load_stage(STAGE_TRANSFORM)
+    if transformed is not None:
+        batches = [[TransformedRecord.from_dict(data) for data in batch] for batch in transformed]
+        print(f"Transformation reprise du point de reprise: {sum(map(len, batches))} enregistrements.")
+    else:
+        with instrumentation.stage("transform"):
+            raw_data = [to_raw_source(item, config) for item in RAW_DATA_LIST]
+            # Articles déjà connus avant ce passage (le rendement des pages ne compte que les nouveaux)
+            known_urls = scheduler.known_article_urls([source['url'] for source in raw_data]) if scheduler else set()
+            transformer = Transformer(config.data, instrumentation)
+            processed_records = transformer.process_raw_data(raw_data)
+        batches = batched(processed_records)
+        checkpoints.save_stage(STAGE_TRANSFORM, batches)
+        print(f"Transformation terminée. {len(processed_records)} enregistrements PPE prêts à être chargés.")
+        # Statistiques de crawl des pages fetchées dans cette exécution seulement
+        if scheduler is not None:
+            scheduler.record_results(processed_records, known_urls)
+    record_count = sum(map(len, batches))
+    
+    # ÉTAPE 3 : CHARGEMENT (L)
+    print("\n--- ÉTAPE 3 : CHARGEMENT (L) ---")
+    
+    if not record_count:
+        print("Aucun enregistrement à charger.")
+        print(f"\nPipeline ETL pour {country_code} terminé.")
+        return
+
+    # Backend choisi par PEP_STORAGE_BACKEND (PostgreSQL/COPY par défaut, ou Supabase/rpc),
+    # avec le même versioning et le même audit dans les deux cas
+    backend = get_storage_backend(country_code, instrumentation)
+    print(f"{record_count} enregistrements à charger (backend: {backend.name}).")
+    with instrumentation.stage("load"):
+        Loader(country_code, instrumentation, backend=backend).load_checkpointed(batches, checkpoints)
+    print("Chargement (L) terminé.")
+        
+    # ÉTAPE 4 : EXPORT (X)
+    print("\n--- ÉTAPE 4 : EXPORT (X) ---")
+    
+    with instrumentation.stage("export"):
+        exporter = Exporter(output_dir=f"exports/{country_code}", instrumentation=instrumentation, country_code=country_code)
+        exporter.generate_json_export()
+        exporter.generate_csv_export()
+        
+    print(f"\nPipeline ETL pour {country_code} terminé.")
+
+def _extract(config: Config, instrumentation: Instrumentation) -> Optional[CrawlScheduler]:
+    """Crawl Scrapy des pages planifiées; les items sont ajoutés à RAW_DATA_LIST."""
+    if not configured_spiders(config):
+        print(f"Aucun spider configuré pour {config.country_code} (clé \"spiders\" de la configuration): extraction sautée.")
+        return None
+
+    # Imports différés: Scrapy (et Twisted) ne sont chargés que pour l'extraction
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+    
     # Récupérer les settings Scrapy
     settings = get_project_settings()
     
     # Injecter la liste de données brutes dans les settings pour le pipeline ItemCollector
     settings.set('RAW_DATA_LIST', RAW_DATA_LIST)
+    if not settings.getdict('ITEM_PIPELINES'):
+        settings.set('ITEM_PIPELINES', {'src.etl.pipelines.ItemCollector': 300})
+    
+    # Pages de départ (et spiders) retenues selon leur taux de changement et leur
+    # rendement, dans la limite du budget de requêtes (PEP_CRAWL_BUDGET)
+    scheduler = CrawlScheduler(config, instrumentation)
+    scheduler.plan()
+    settings.set('CRAWL_PAGE_STATS', scheduler.page_stats)
+    settings.set('SPIDER_MIDDLEWARES', {**settings.getdict('SPIDER_MIDDLEWARES'), 'src.etl.pipelines.CrawlPageAttribution': 100})
     
     # Initialiser le crawler process
     process = CrawlerProcess(settings)
     
-    # Importer et ajouter les spiders
-    from etl.spiders.leconomiste_spider import LEconomisteSpider
-    
-    # Ajouter les spiders au processus
-    process.crawl(LEconomisteSpider)
+    # Ajouter les spiders planifiés au processus
+    crawls = scheduler.spider_crawls()
+    for spider_cls, spider_kwargs in crawls:
+        process.crawl(spider_cls, **spider_kwargs)
     
     # Démarrer le crawling (bloquant)
-    process.start()
+    with instrumentation.stage("extract"):
+        if crawls:
+            process.start()
     
     print(f"Extraction réelle via Scrapy terminée. {len(RAW_DATA_LIST)} éléments capturés.")
-    
-    # ÉTAPE 2 : TRANSFORMATION (T)
-    print("\n--- ÉTAPE 2 : TRANSFORMATION (T) ---")
-    
-    # Transformer les données brutes en format Supabase pour la table pep_master
-    supabase_data = transform_to_pep_master_format(RAW_DATA_LIST)
-    
-    print(f"Transformation terminée. {len(supabase_data)} enregistrements prêts pour Supabase.")
-    
-    # ÉTAPE 3 : CHARGEMENT (L)
-    print("\n--- ÉTAPE 3 : CHARGEMENT (L) ---")
-    
-    if supabase_data:
-        print(f"{len(supabase_data)} enregistrements à charger.")
-        
-        # Insertion dans Supabase
-        try:
-            # Insérer les données dans la table 'pep_master'
-            supabase_client.table('pep_version').insert(supabase_data).execute()
-            print(f"Chargement (L) terminé. {len(supabase_data)} enregistrements chargés avec succès dans 'pep_master'.")
-        except Exception as e:
-            print(f"Erreur lors de l'insertion dans Supabase: {e}")
-            
-        # ÉTAPE 4 : EXPORT (X) - Facultatif, pour la vérification locale
-        print("\n--- ÉTAPE 4 : EXPORT (X) ---")
-        
-        # Générer un nom de fichier unique
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        json_filename = f"exports/MA/pep_registry_snapshot_{timestamp}.json"
-        csv_filename = f"exports/MA/pep_registry_snapshot_{timestamp}.csv"
-        
-        # Assurez-vous que le répertoire d'exportation existe
-        os.makedirs(os.path.dirname(json_filename), exist_ok=True)
-        
-        # Export JSON
-        with open(json_filename, 'w', encoding='utf-8') as f:
-            json.dump(supabase_data, f, ensure_ascii=False, indent=4)
-        print(f"Export JSON généré: {json_filename}")
-        
-        # Export CSV
-        if supabase_data:
-            keys = supabase_data[0].keys()
-            with open(csv_filename, 'w', newline='', encoding='utf-8') as f:
-                dict_writer = csv.DictWriter(f, fieldnames=keys)
-                dict_writer.writeheader()
-                dict_writer.writerows(supabase_data)
-            print(f"Export CSV généré: {csv_filename}")
-        
-    else:
-        print("Aucun enregistrement à charger.")
-        
-    print("\nPipeline ETL pour MA terminé.")
+    return scheduler
 
 if __name__ == '__main__':
-    run_etl_pipeline()
-
+    # python -m src.etl.pep_etl [CODE_PAYS] (tous les pays: python -m src.etl.orchestrator)
+    run_etl_pipeline(sys.argv[1] if len(sys.argv) > 1 else COUNTRY_CODE)
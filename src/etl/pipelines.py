@@ -1,3 +1,5 @@
+import hashlib
+from scrapy import Request
 from scrapy.exceptions import DropItem
 
 class ItemCollector:
@@ -18,3 +20,48 @@ class ItemCollector:
         # Ajouter l'item à la liste
         self.items.append(dict(item))
         return item
+
+class CrawlPageAttribution:
+    """
+    Middleware de spider: rattache chaque requête à la page de départ planifiée dont elle
+    provient (meta 'crawl_page') et relève, pour le planificateur de crawl (src/etl/scheduler.py),
+    l'empreinte des liens de la page, le nombre de requêtes suivies et les articles collectés.
+    Les statistiques sont écrites dans le dictionnaire CRAWL_PAGE_STATS passé via les settings.
+    """
+    def __init__(self, settings):
+        self.page_stats = settings.get('CRAWL_PAGE_STATS') or {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings)
+
+    def _tag(self, request, page):
+        if request.url in self.page_stats:
+            request.meta['crawl_page'] = request.url
+            request.meta['crawl_page_root'] = True
+        elif page is not None:
+            request.meta.setdefault('crawl_page', page)
+        return request
+
+    def process_start_requests(self, start_requests, spider):
+        for request in start_requests:
+            yield self._tag(request, None)
+
+    def process_spider_output(self, response, result, spider):
+        page = response.meta.get('crawl_page')
+        stats = self.page_stats.get(page)
+        is_root = response.meta.get('crawl_page_root', False)
+        links = set()
+        for output in result:
+            if isinstance(output, Request):
+                self._tag(output, page)
+                if stats is not None and not output.meta.get('crawl_page_root'):
+                    stats['requests'] += 1
+                    if is_root:
+                        links.add(output.url)
+            elif stats is not None and output.get('url'):
+                stats['articles'].append(output['url'])
+            yield output
+        if is_root and stats is not None:
+            stats['fetched'] = True
+            stats['signature'] = hashlib.sha1("\n".join(sorted(links)).encode("utf-8")).hexdigest()
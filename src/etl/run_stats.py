@@ -0,0 +1,120 @@
+import uuid
+import json
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from src.db_connector import DBConnector
+from src.etl.instrumentation import InstrumentationHook
+
+class RunStats(InstrumentationHook):
+    """
+    Collecte les statistiques d'une exécution du pipeline ETL (durée par étape,
+    compteurs) et les enregistre dans la table etl_run.
+    S'abonne à l'Instrumentation du pipeline en tant que hook.
+    """
+
+    # Compteurs persistés dans des colonnes dédiées de etl_run
+    COUNTERS = [
+        "items_crawled", "entities_extracted", "dedup_hits",
+        "versions_created", "versions_skipped"
+    ]
+
+    def __init__(self, country_code: str, run_id: Optional[str] = None):
+        self.country_code = country_code
+        self.run_id = run_id or str(uuid.uuid4())
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at = None
+        self.status = "running"
+        self.stage_durations: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {name: 0 for name in self.COUNTERS}
+        # Durée des tentatives précédentes d'une exécution reprise (voir resume_previous)
+        self.previous_duration = 0.0
+
+    def resume_previous(self):
+        """
+        Exécution reprise (même run_id): repart des compteurs et des durées déjà enregistrés
+        dans etl_run par les tentatives précédentes, auxquels s'ajoute cette tentative.
+        """
+        query = """
+        SELECT duration_seconds, stage_durations, items_crawled, entities_extracted,
+               dedup_hits, versions_created, versions_skipped, extra_counters
+        FROM etl_run
+        WHERE run_id = %s;
+        """
+        try:
+            with DBConnector() as db:
+                rows = db.execute(query, (self.run_id,), fetch=True)
+        except Exception as e:
+            print(f"Erreur lors de la lecture des statistiques de l'exécution reprise: {e}")
+            return
+        if not rows:
+            return
+        row = rows[0]
+        self.previous_duration = float(row['duration_seconds'] or 0)
+        self.stage_durations = {name: float(value) for name, value in row['stage_durations'].items()}
+        self.counters.update(row['extra_counters'])
+        self.counters.update({name: row[name] for name in self.COUNTERS})
+
+    def on_stage_end(self, name: str, duration: float):
+        # Durée cumulée si l'étape est répétée
+        self.stage_durations[name] = self.stage_durations.get(name, 0.0) + duration
+
+    def on_count(self, name: str, value: int):
+        self.incr(name, value)
+
+    def incr(self, counter: str, value: int = 1):
+        """Incrémente un compteur de l'exécution."""
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def finish(self, status: str = "success"):
+        """Marque la fin de l'exécution."""
+        self.finished_at = datetime.now(timezone.utc)
+        self.status = status
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "run_id": self.run_id,
+            "country_code": self.country_code,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "status": self.status,
+            "stage_durations": {k: round(v, 3) for k, v in self.stage_durations.items()},
+            **self.counters,
+        }
+
+    def save(self):
+        """Enregistre (ou met à jour) l'exécution dans la table etl_run."""
+        if self.finished_at is None:
+            self.finish()
+
+        # Les compteurs hors colonnes dédiées sont conservés dans extra_counters
+        extra = {k: v for k, v in self.counters.items() if k not in self.COUNTERS}
+        query = """
+        INSERT INTO etl_run (run_id, country_code, started_at, finished_at, status,
+                             duration_seconds, stage_durations, items_crawled, entities_extracted,
+                             dedup_hits, versions_created, versions_skipped, extra_counters)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (run_id) DO UPDATE SET
+            finished_at = EXCLUDED.finished_at,
+            status = EXCLUDED.status,
+            duration_seconds = EXCLUDED.duration_seconds,
+            stage_durations = EXCLUDED.stage_durations,
+            items_crawled = EXCLUDED.items_crawled,
+            entities_extracted = EXCLUDED.entities_extracted,
+            dedup_hits = EXCLUDED.dedup_hits,
+            versions_created = EXCLUDED.versions_created,
+            versions_skipped = EXCLUDED.versions_skipped,
+            extra_counters = EXCLUDED.extra_counters;
+        """
+        duration = self.previous_duration + (self.finished_at - self.started_at).total_seconds()
+        try:
+            with DBConnector() as db:
+                db.execute(query, (
+                    self.run_id, self.country_code, self.started_at, self.finished_at, self.status,
+                    duration, json.dumps(self.stage_durations),
+                    *(self.counters[name] for name in self.COUNTERS),
+                    json.dumps(extra)
+                ))
+            print(f"Statistiques de l'exécution {self.run_id} enregistrées ({self.status}, {duration:.1f}s).")
+        except Exception as e:
+            # Les statistiques ne doivent jamais faire échouer le pipeline
+            print(f"Erreur lors de l'enregistrement des statistiques d'exécution: {e}")
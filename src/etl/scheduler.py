@@ -0,0 +1,302 @@
+"""
+Planification adaptative du crawl.
+
+Chaque page de départ d'un spider (rubrique, flux RSS) est suivie dans la table
+crawl_page_stats: taux de changement (liens de la page différents de ceux du fetch
+précédent) et rendement (nouvelles mentions de PPE par fetch, c'est-à-dire les PPE
+cités par des articles encore absents de source_document). À chaque exécution, les
+pages sont classées par gain attendu par requête et retenues dans la limite d'un
+budget de requêtes (PEP_CRAWL_BUDGET); seuls les spiders ayant au moins une page
+retenue sont lancés. Les spiders d'un pays sont déclarés dans sa configuration
+(clé "spiders" de config/<pays>.json).
+
+Gain attendu d'une page = P(changement depuis le dernier fetch) x rendement x (1 + poids),
+avec P = 1 - exp(-taux x jours écoulés) (changements modélisés par un processus de Poisson)
+et le taux estimé à partir des changements observés (estimateur de Cho et Garcia-Molina).
+Une page jamais visitée, ou non visitée depuis MAX_REVISIT_DAYS, passe en priorité.
+
+Aperçu du plan sans crawler: python -m src.etl.scheduler [CODE_PAYS] [--budget N]
+"""
+import argparse
+import importlib
+import math
+import os
+import sys
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from src.db_connector import DBConnector
+from src.etl.instrumentation import Instrumentation
+from src.etl.models import TransformedRecord
+
+# Nombre maximal de requêtes (pages et articles) par exécution
+DEFAULT_CRAWL_BUDGET = 500
+# Requêtes d'un spider hors pages planifiées (connexion, redirections)
+SPIDER_REQUEST_MARGIN = 2
+
+# A priori d'une page sans historique: taux de changement (par jour), rendement et coût (requêtes par fetch)
+PRIOR_CHANGE_RATE = {"media": 1.0, "official": 1 / 7, "sanctions": 1 / 7}
+PRIOR_YIELD = 5.0
+PRIOR_COST = 30.0
+# Rendement minimal: une page improductive garde un gain non nul et finit par être revisitée
+MIN_YIELD = 0.1
+# Délai au-delà duquel une page est revisitée quel que soit son gain attendu
+MAX_REVISIT_DAYS = {"media": 7, "official": 30, "sanctions": 30}
+# Lissage exponentiel du rendement et du coût (poids du dernier fetch)
+SMOOTHING = 0.3
+
+def load_spider(path: str):
+    module, name = path.rsplit(".", 1)
+    return getattr(importlib.import_module(module), name)
+
+def spider_start_pages(spider_cls) -> Tuple[str, List[str]]:
+    """Attribut des pages de départ du spider et sa valeur par défaut."""
+    if hasattr(spider_cls, "start_urls_list"):
+        return "start_urls_list", list(spider_cls.start_urls_list)
+    return "start_urls", list(getattr(spider_cls, "start_urls", []))
+
+def configured_spiders(config) -> Dict[str, str]:
+    """
+    Spiders planifiables du pays: clé "spiders" de la configuration, {nom: chemin de la classe}
+    (importée au premier usage, Scrapy n'est chargé que pour le crawl).
+    """
+    return dict(config.get('spiders', {}))
+
+def match_source(config, url: str) -> Optional[Tuple[str, float]]:
+    """(type, poids) de la source déclarée dans la configuration pays pour le domaine de url."""
+    domain = urlparse(url).netloc
+    for type_key, sources in config.get('sources', {}).items():
+        for source in sources:
+            if urlparse(source['url']).netloc == domain:
+                return type_key, source['weight']
+    return None
+
+def change_rate(fetches: int, changes: int, observed_days: float, source_type: str) -> float:
+    """
+    Taux de changement estimé (changements par jour). Sur n intervalles observés de
+    durée moyenne I dont X avec changement: -ln((n - X + 0.5) / (n + 0.5)) / I.
+    """
+    intervals = fetches - 1
+    if intervals < 1 or observed_days <= 0:
+        return PRIOR_CHANGE_RATE.get(source_type, 1.0)
+    return -math.log((intervals - changes + 0.5) / (intervals + 0.5)) / (observed_days / intervals)
+
+def smooth(previous: Optional[float], value: float) -> float:
+    return value if previous is None else (1 - SMOOTHING) * previous + SMOOTHING * value
+
+def new_page_stats() -> Dict[str, Any]:
+    """Statistiques d'un fetch, remplies par le middleware CrawlPageAttribution."""
+    return {"fetched": False, "signature": None, "requests": 0, "articles": []}
+
+class CrawlScheduler:
+    """Choisit les pages à crawler dans le budget de requêtes et enregistre leurs statistiques."""
+
+    def __init__(self, config, instrumentation: Optional[Instrumentation] = None,
+                 budget: Optional[int] = None, now: Optional[datetime] = None):
+        self.config = config
+        self.country_code = config.country_code
+        self.spiders = configured_spiders(config)
+        self.instrumentation = instrumentation or Instrumentation()
+        self.budget = budget if budget is not None else int(os.environ.get("PEP_CRAWL_BUDGET", DEFAULT_CRAWL_BUDGET))
+        self.now = now or datetime.now(timezone.utc)
+        # Pages retenues (url -> page) et statistiques de leur fetch (url -> new_page_stats())
+        self.pages: Dict[str, Dict[str, Any]] = {}
+        self.page_stats: Dict[str, Dict[str, Any]] = {}
+
+    def _load_stats(self) -> Dict[str, Dict[str, Any]]:
+        rows = []
+        with DBConnector(self.instrumentation) as db:
+            rows = db.execute("""
+            SELECT page_url, fetches, changes, observed_days, yield_avg, cost_avg, last_signature, last_crawled_at
+            FROM crawl_page_stats
+            WHERE country_code = %s;
+            """, (self.country_code,), fetch=True)
+        return {
+            row['page_url']: {
+                "fetches": row['fetches'],
+                "changes": row['changes'],
+                "observed_days": float(row['observed_days']),
+                "yield_avg": float(row['yield_avg']) if row['yield_avg'] is not None else None,
+                "cost_avg": float(row['cost_avg']) if row['cost_avg'] is not None else None,
+                "last_signature": row['last_signature'],
+                "last_crawled_at": row['last_crawled_at'],
+            }
+            for row in rows
+        }
+
+    def candidate_pages(self) -> List[Dict[str, Any]]:
+        """Pages de départ de tous les spiders, avec leur historique et leur priorité."""
+        stats = self._load_stats()
+        pages = []
+        for spider_name, path in self.spiders.items():
+            spider_cls = load_spider(path)
+            _, urls = spider_start_pages(spider_cls)
+            for url in urls:
+                source_type, weight = match_source(self.config, url) or (
+                    getattr(spider_cls, "source_type", "media"), getattr(spider_cls, "source_weight", 0.0)
+                )
+                page = {
+                    "url": url, "spider": spider_name, "source_type": source_type, "weight": weight,
+                    "fetches": 0, "changes": 0, "observed_days": 0.0, "yield_avg": None, "cost_avg": None,
+                    "last_signature": None, "last_crawled_at": None,
+                    **stats.get(url, {}),
+                }
+                page["priority"], page["cost"] = self.score(page)
+                pages.append(page)
+        return pages
+
+    def score(self, page: Dict[str, Any]) -> Tuple[float, float]:
+        """(gain attendu par requête, coût en requêtes) d'un fetch de la page."""
+        cost = page['cost_avg'] or PRIOR_COST
+        if page['last_crawled_at'] is None:
+            return math.inf, cost
+        elapsed = (self.now - page['last_crawled_at']).total_seconds() / 86400
+        if elapsed >= MAX_REVISIT_DAYS.get(page['source_type'], 30):
+            return math.inf, cost
+        rate = change_rate(page['fetches'], page['changes'], page['observed_days'], page['source_type'])
+        p_changed = 1 - math.exp(-rate * elapsed)
+        page_yield = max(page['yield_avg'] if page['yield_avg'] is not None else PRIOR_YIELD, MIN_YIELD)
+        return p_changed * page_yield * (1 + page['weight']) / cost, cost
+
+    def plan(self) -> Dict[str, List[str]]:
+        """
+        Retient les pages par priorité décroissante tant que le budget le permet
+        (une page trop coûteuse est sautée au profit des suivantes, sauf si aucune page n'est
+        encore retenue). Retourne {spider: [pages]}.
+        """
+        remaining = self.budget
+        selected = []
+        candidates = sorted(self.candidate_pages(), key=lambda p: (-p['priority'], -p['weight'], p['url']))
+        for page in candidates:
+            if page['cost'] > remaining and (selected or remaining <= 0):
+                continue
+            selected.append(page)
+            remaining -= page['cost']
+
+        self.pages = {page['url']: page for page in selected}
+        self.page_stats = {url: new_page_stats() for url in self.pages}
+        crawls: Dict[str, List[str]] = {}
+        for page in selected:
+            crawls.setdefault(page['spider'], []).append(page['url'])
+
+        planned = sum(page['cost'] for page in selected)
+        self.instrumentation.count("crawl_pages_planned", len(selected))
+        self.instrumentation.count("crawl_requests_planned", int(math.ceil(planned)))
+        print(f"Planification du crawl: {len(selected)}/{len(candidates)} pages, "
+              f"{len(crawls)} spiders, ~{planned:.0f}/{self.budget} requêtes.")
+        return crawls
+
+    def spider_crawls(self) -> List[Tuple[type, Dict[str, Any]]]:
+        """
+        (classe de spider, arguments) à passer à CrawlerProcess.crawl pour le plan courant:
+        pages de départ restreintes aux pages retenues et arrêt du spider à son budget
+        (CLOSESPIDER_PAGECOUNT).
+        """
+        crawls = []
+        by_spider: Dict[str, List[Dict[str, Any]]] = {}
+        for page in self.pages.values():
+            by_spider.setdefault(page['spider'], []).append(page)
+        for spider_name, pages in by_spider.items():
+            spider_cls = load_spider(self.spiders[spider_name])
+            attribute, _ = spider_start_pages(spider_cls)
+            page_count = int(math.ceil(sum(page['cost'] for page in pages))) + SPIDER_REQUEST_MARGIN
+            budgeted = type(spider_cls.__name__, (spider_cls,), {
+                "custom_settings": {**(spider_cls.custom_settings or {}), "CLOSESPIDER_PAGECOUNT": page_count},
+            })
+            crawls.append((budgeted, {attribute: [page['url'] for page in pages]}))
+        return crawls
+
+    def known_article_urls(self, urls: List[str]) -> Set[str]:
+        """Articles déjà présents dans source_document (à appeler avant la transformation)."""
+        if not urls:
+            return set()
+        with DBConnector(self.instrumentation) as db:
+            rows = db.execute("SELECT url FROM source_document WHERE url = ANY(%s);", (list(set(urls)),), fetch=True)
+        return {row['url'] for row in rows}
+
+    def new_mentions(self, processed_records: List[TransformedRecord], known_urls: Set[str]) -> Counter:
+        """Nombre de PPE cités par des articles nouveaux, par page de départ."""
+        article_page = {
+            url: page_url for page_url, stats in self.page_stats.items()
+            for url in stats['articles'] if url not in known_urls
+        }
+        if not article_page:
+            return Counter()
+        with DBConnector(self.instrumentation) as db:
+            rows = db.execute("SELECT source_id, url FROM source_document WHERE url = ANY(%s);",
+                              (list(article_page),), fetch=True)
+        source_urls = {row['source_id']: row['url'] for row in rows}
+
+        mentions: Counter = Counter()
+        for record_data in processed_records:
+            pages = {
+                article_page[source_urls[doc.source_id]]
+                for doc in record_data.record.source_documents
+                if doc.source_id in source_urls
+            }
+            mentions.update(pages)
+        return mentions
+
+    def record_results(self, processed_records: List[TransformedRecord], known_urls: Set[str]):
+        """Met à jour crawl_page_stats pour les pages effectivement récupérées."""
+        query = """
+        INSERT INTO crawl_page_stats (country_code, page_url, spider, source_type, weight, fetches, changes,
+                                      observed_days, yield_avg, cost_avg, last_signature, last_crawled_at, last_changed_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (country_code, page_url) DO UPDATE SET
+            spider = EXCLUDED.spider,
+            source_type = EXCLUDED.source_type,
+            weight = EXCLUDED.weight,
+            fetches = EXCLUDED.fetches,
+            changes = EXCLUDED.changes,
+            observed_days = EXCLUDED.observed_days,
+            yield_avg = EXCLUDED.yield_avg,
+            cost_avg = EXCLUDED.cost_avg,
+            last_signature = EXCLUDED.last_signature,
+            last_crawled_at = EXCLUDED.last_crawled_at,
+            last_changed_at = COALESCE(EXCLUDED.last_changed_at, crawl_page_stats.last_changed_at);
+        """
+        try:
+            mentions = self.new_mentions(processed_records, known_urls)
+            fetched = 0
+            with DBConnector(self.instrumentation) as db:
+                for url, stats in self.page_stats.items():
+                    if not stats['fetched']:
+                        continue
+                    fetched += 1
+                    page = self.pages[url]
+                    # Un intervalle n'est observé qu'entre deux fetchs (le premier sert de référence)
+                    observed = page['last_crawled_at'] is not None
+                    changed = observed and stats['signature'] != page['last_signature']
+                    elapsed = (self.now - page['last_crawled_at']).total_seconds() / 86400 if observed else 0.0
+                    db.execute(query, (
+                        self.country_code, url, page['spider'], page['source_type'], page['weight'],
+                        page['fetches'] + 1, page['changes'] + int(changed), page['observed_days'] + elapsed,
+                        smooth(page['yield_avg'], mentions[url]), smooth(page['cost_avg'], 1 + stats['requests']),
+                        stats['signature'], self.now, self.now if changed or not observed else None
+                    ))
+            self.instrumentation.count("crawl_pages_fetched", fetched)
+            self.instrumentation.count("crawl_new_mentions", sum(mentions.values()))
+            print(f"Statistiques de crawl: {fetched} pages récupérées, {sum(mentions.values())} nouvelles mentions de PPE.")
+        except Exception as e:
+            # Les statistiques de crawl ne doivent jamais faire échouer le pipeline
+            print(f"Erreur lors de l'enregistrement des statistiques de crawl: {e}")
+
+def main(argv=None) -> int:
+    from src.config import Config
+
+    parser = argparse.ArgumentParser(description="Aperçu du plan de crawl (sans crawler).")
+    parser.add_argument("country_code", nargs="?", default="MA", help="Code pays")
+    parser.add_argument("--budget", type=int, default=None, help="Budget de requêtes (PEP_CRAWL_BUDGET par défaut)")
+    args = parser.parse_args(argv)
+
+    scheduler = CrawlScheduler(Config(args.country_code), budget=args.budget)
+    scheduler.plan()
+    for page in sorted(scheduler.pages.values(), key=lambda p: -p['priority']):
+        priority = "nouvelle/échue" if math.isinf(page['priority']) else f"{page['priority']:.4f}"
+        print(f"  {page['spider']:<20} {page['url']:<55} priorité {priority}, ~{page['cost']:.0f} requêtes")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
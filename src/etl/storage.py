@@ -0,0 +1,374 @@
+import io
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Optional, Iterable
+from src.db_connector import DBConnector
+from src.etl.instrumentation import Instrumentation
+from src.etl.aliases import alias_rows, upsert_aliases
+from src.etl.checkpoints import RunCheckpoints
+from src.etl.models import TransformedRecord, dumps, dumps_str, fields_dict, loads
+from src.etl.partitions import ensure_country_partitions, ensure_partitions
+
+AUDIT_ACTOR = "ETL_Process"
+AUDIT_REASON_CREATED = "Nouveau PEP créé par le pipeline ETL."
+AUDIT_REASON_UPDATED = "Mise à jour de la version du PEP (changement de données)."
+
+EVENT_PEP_CREATED = "pep_created"
+EVENT_VERSION_CREATED = "version_created"
+
+# Champs horodatés à chaque exécution: ils ne constituent pas un changement de données
+VOLATILE_FIELDS = ("first_seen", "last_updated")
+
+def canonical_json(record: Any) -> str:
+    """
+    Sérialisation canonique utilisée pour comparer deux versions d'un enregistrement
+    (PepRecord ou data_jsonb lu en base), hors VOLATILE_FIELDS, sinon chaque exécution
+    créerait une nouvelle version.
+    """
+    return dumps_str(fields_dict(record, exclude=VOLATILE_FIELDS), sort_keys=True)
+
+class VersionPlan:
+    """
+    Résultat de la logique de versioning pour un lot d'enregistrements:
+    lignes à écrire dans pep_master, pep_version et audit_log.
+    Identique quel que soit le backend de stockage.
+    """
+
+    def __init__(self, now: Optional[datetime] = None):
+        # Horodatage commun des versions et entrées d'audit du lot (clé de partitionnement)
+        self.now = now or datetime.now(timezone.utc)
+        self.master_inserts: Dict[str, Dict[str, Any]] = {}
+        self.master_updates: Dict[str, str] = {}  # pep_id -> nouvelle current_version_id
+        self.versions: List[Dict[str, Any]] = []
+        self.audits: List[Dict[str, Any]] = []
+        self.skipped: List[str] = []
+        # Alias de tous les enregistrements du lot, y compris ceux sans nouvelle version
+        self.aliases: List[Dict[str, Any]] = []
+        # Événements du flux de changements (table change_event)
+        self.events: List[Dict[str, Any]] = []
+
+    def is_empty(self) -> bool:
+        return not self.versions and not self.aliases
+
+def plan_versions(records: List[TransformedRecord], current_versions: Dict[str, Dict[str, Any]],
+                  country_code: str, now: Optional[datetime] = None) -> VersionPlan:
+    """
+    Applique les règles de versioning du registre à un lot:
+    - PEP inconnu: création du maître, d'une version et d'une entrée d'audit;
+    - PEP connu et données identiques à la version courante: aucune nouvelle version;
+    - PEP connu et données modifiées: nouvelle version, mise à jour du maître, audit.
+    current_versions associe chaque pep_id existant au data_jsonb de sa version courante.
+    Un même pep_id présent plusieurs fois dans le lot est traité dans l'ordre du lot.
+    """
+    plan = VersionPlan(now)
+    now = plan.now
+    # Version courante "vue" par le lot (inclut les versions créées plus tôt dans ce lot)
+    current = {pep_id: canonical_json(data) for pep_id, data in current_versions.items()}
+    planned: Dict[str, Dict[str, Any]] = {}
+
+    for record_data in records:
+        pep_id = str(uuid.UUID(str(record_data.pep_id)))
+        record = record_data.record
+        serialized = canonical_json(record)
+
+        if pep_id in current and current[pep_id] == serialized:
+            plan.skipped.append(pep_id)
+            plan.aliases.extend(alias_rows(pep_id, record_data.names(), country_code, None, now))
+            continue
+
+        version_id = str(uuid.uuid4())
+        if pep_id not in current:
+            plan.master_inserts[pep_id] = {
+                "id": pep_id,
+                "country_code": country_code,
+                "master_name": record.full_name,
+                "current_version_id": version_id,
+                "current_version_at": now,
+            }
+            reason = AUDIT_REASON_CREATED
+        else:
+            if pep_id in plan.master_inserts:
+                plan.master_inserts[pep_id]["current_version_id"] = version_id
+            else:
+                plan.master_updates[pep_id] = version_id
+            reason = AUDIT_REASON_UPDATED
+
+        # Une version remplacée plus loin dans le même lot a une période de validité vide
+        if pep_id in planned:
+            planned[pep_id]["valid_period"][1] = now
+        planned[pep_id] = {
+            "version_id": version_id,
+            "pep_id": pep_id,
+            "data_jsonb": record,
+            "confidence_score": record_data.confidence_score,
+            "status": record_data.status,
+            "first_seen": now,
+            "last_updated": now,
+            # [début, fin): fin None tant que la version est courante (clôturée en base par
+            # le trigger trg_close_replaced_version lorsqu'une version la remplace)
+            "valid_period": [now, None],
+        }
+        plan.versions.append(planned[pep_id])
+        plan.audits.append({
+            "timestamp": now,
+            "pep_id": pep_id,
+            "version_id": version_id,
+            "actor": AUDIT_ACTOR,
+            "source": f"Pipeline {country_code}",
+            "reason": reason,
+        })
+        plan.events.append({
+            "created_at": now,
+            "country_code": country_code,
+            "pep_id": pep_id,
+            "version_id": version_id,
+            "event_type": EVENT_PEP_CREATED if reason == AUDIT_REASON_CREATED else EVENT_VERSION_CREATED,
+            "payload": {
+                "full_name": record.full_name,
+                "status": record_data.status,
+                "confidence_score": record_data.confidence_score,
+                "reason": reason,
+            },
+        })
+        plan.aliases.extend(alias_rows(pep_id, record_data.names(), country_code, version_id, now))
+        current[pep_id] = serialized
+
+    return plan
+
+def format_period(start: datetime, end: Optional[datetime] = None) -> str:
+    """Littéral tstzrange [start, end) (borne supérieure infinie si end est None)."""
+    return f"[{start.isoformat()},{end.isoformat() if end else ''})"
+
+def chunked(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+class StorageBackend:
+    """
+    Interface commune de chargement du registre. Les sous-classes fournissent la
+    lecture des versions courantes et l'écriture d'un VersionPlan; le versioning
+    et l'audit sont appliqués ici, de la même façon pour tous les backends.
+    """
+
+    name = "base"
+
+    def __init__(self, country_code: str, instrumentation: Optional[Instrumentation] = None, batch_size: int = 5000):
+        self.country_code = country_code
+        self.instrumentation = instrumentation or Instrumentation()
+        self.batch_size = batch_size
+
+    def fetch_current_versions(self, pep_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        raise NotImplementedError
+
+    def write_plan(self, plan: VersionPlan, checkpoints: Optional[RunCheckpoints] = None, batch_no: Optional[int] = None):
+        """Écrit un plan; avec checkpoints, marque aussi le lot batch_no comme chargé."""
+        raise NotImplementedError
+
+    def load_records(self, processed_records: List[TransformedRecord]):
+        """Charge les enregistrements transformés par lots de batch_size."""
+        for batch in chunked(processed_records, self.batch_size):
+            self.load_batch(batch)
+
+    def load_batch(self, batch: List[TransformedRecord], checkpoints: Optional[RunCheckpoints] = None,
+                   batch_no: Optional[int] = None) -> VersionPlan:
+        pep_ids = list({str(item.pep_id) for item in batch})
+        with self.instrumentation.timer(f"load.{self.name}.fetch_current"):
+            current_versions = self.fetch_current_versions(pep_ids)
+        plan = plan_versions(batch, current_versions, self.country_code)
+        if not plan.is_empty():
+            with self.instrumentation.timer(f"load.{self.name}.write"):
+                self.write_plan(plan, checkpoints, batch_no)
+        elif checkpoints is not None:
+            with DBConnector(self.instrumentation) as db:
+                checkpoints.mark_loaded(db, batch_no)
+
+        self.instrumentation.count("versions_created", len(plan.versions))
+        self.instrumentation.count("versions_skipped", len(plan.skipped))
+        self.instrumentation.count("masters_created", len(plan.master_inserts))
+        print(f"Lot chargé ({self.name}): {len(plan.master_inserts)} nouveaux PEP, "
+              f"{len(plan.versions)} versions créées, {len(plan.skipped)} inchangés.")
+        return plan
+
+class PostgresBackend(StorageBackend):
+    """Backend PostgreSQL (psycopg2): écriture de chaque lot par COPY dans une seule transaction."""
+
+    name = "postgres"
+
+    def fetch_current_versions(self, pep_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        query = """
+        SELECT pm.id, pv.data_jsonb
+        FROM pep_master pm
+        JOIN pep_version pv ON pm.current_version_id = pv.version_id AND pm.current_version_at = pv.last_updated
+        WHERE pm.id = ANY(%s::uuid[]);
+        """
+        with DBConnector(self.instrumentation) as db:
+            rows = db.execute(query, (pep_ids,), fetch=True)
+        return {str(row['id']): row['data_jsonb'] for row in rows}
+
+    def write_plan(self, plan: VersionPlan, checkpoints: Optional[RunCheckpoints] = None, batch_no: Optional[int] = None):
+        # Partitions du mois (et du pays) créées dans une transaction courte, avant le lot
+        # (le DDL verrouille la table parente jusqu'à la fin de sa transaction)
+        with DBConnector(self.instrumentation) as db:
+            ensure_partitions(db, plan.now, months_ahead=1)
+            ensure_country_partitions(db, self.country_code)
+        with DBConnector(self.instrumentation) as db:
+            # Marqueur d'abord: une reprise concurrente du même lot attend puis échoue
+            if checkpoints is not None:
+                checkpoints.mark_loaded(db, batch_no)
+            self._write_plan(db, plan)
+
+    def _write_plan(self, db: DBConnector, plan: VersionPlan):
+        """Écrit un plan avec une connexion existante (la transaction est celle de l'appelant)."""
+        copy_rows(db, "pep_master", ["id", "country_code", "master_name", "current_version_id", "current_version_at"], (
+            (m["id"], m["country_code"], m["master_name"], m["current_version_id"], m["current_version_at"].isoformat())
+            for m in plan.master_inserts.values()
+        ))
+        copy_rows(db, "pep_version", ["version_id", "pep_id", "data_jsonb", "confidence_score", "status", "first_seen",
+                                      "last_updated", "valid_period"], (
+            (v["version_id"], v["pep_id"], dumps_str(v["data_jsonb"]), v["confidence_score"], v["status"],
+             v["first_seen"].isoformat(), v["last_updated"].isoformat(), format_period(*v["valid_period"]))
+            for v in plan.versions
+        ))
+        if plan.master_updates:
+            db.execute("CREATE TEMP TABLE tmp_master_update (id UUID, current_version_id UUID) ON COMMIT DROP;")
+            copy_rows(db, "tmp_master_update", ["id", "current_version_id"], plan.master_updates.items())
+            db.execute("""
+            UPDATE pep_master pm SET current_version_id = t.current_version_id, current_version_at = %s
+            FROM tmp_master_update t
+            WHERE pm.id = t.id;
+            """, (plan.now,))
+        copy_rows(db, "audit_log", ["timestamp", "pep_id", "version_id", "actor", "source", "reason"], (
+            (a["timestamp"].isoformat(), a["pep_id"], a["version_id"], a["actor"], a["source"], a["reason"])
+            for a in plan.audits
+        ))
+        upsert_aliases(db, plan.aliases)
+        # En dernier: l'insertion sérialise les transactions qui publient des événements
+        # (trigger trg_change_event_serialize), le verrou est donc tenu le moins longtemps possible
+        copy_rows(db, "change_event", ["created_at", "country_code", "pep_id", "version_id", "event_type", "payload"], (
+            (e["created_at"].isoformat(), e["country_code"], e["pep_id"], e["version_id"], e["event_type"], dumps_str(e["payload"]))
+            for e in plan.events
+        ))
+
+def copy_rows(db: DBConnector, table: str, columns: List[str], rows: Iterable[tuple]) -> int:
+    """Insère des lignes avec COPY ... FROM STDIN (format texte)."""
+    buffer = io.StringIO()
+    count = 0
+    for row in rows:
+        buffer.write("\t".join(_copy_value(value) for value in row) + "\n")
+        count += 1
+    if count:
+        buffer.seek(0)
+        db.cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    return count
+
+def _copy_value(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+class SupabaseBackend(StorageBackend):
+    """
+    Backend Supabase/PostgREST: les lectures sont découpées en morceaux (limite de
+    taille des requêtes) et relancées en cas d'erreur transitoire. Chaque lot est écrit
+    par un seul appel à la fonction load_version_plan (sql/schema.sql), donc dans une
+    seule transaction avec son marqueur de reprise, comme le lot COPY du backend
+    PostgreSQL. PostgREST n'exécute pas de DDL: les partitions mensuelles sont créées
+    à l'avance par python -m src.etl.maintenance partitions.
+    """
+
+    name = "supabase"
+
+    def __init__(self, country_code: str, instrumentation: Optional[Instrumentation] = None, batch_size: int = 5000,
+                 client=None, chunk_size: int = 500, max_retries: int = 3, retry_delay: float = 1.0):
+        super().__init__(country_code, instrumentation, batch_size)
+        self._client = client
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+
+    @property
+    def client(self):
+        if self._client is None:
+            from src.etl.pep_etl import get_supabase_client
+            self._client = get_supabase_client()
+        return self._client
+
+    def _with_retry(self, action, description: str):
+        """Exécute action() avec un backoff exponentiel sur les erreurs."""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                return action()
+            except Exception as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                print(f"Supabase: échec de {description} (tentative {attempt}/{self.max_retries}): {e}. Nouvel essai dans {delay:.1f}s.")
+                self.instrumentation.count("supabase_retries")
+                time.sleep(delay)
+
+    def fetch_current_versions(self, pep_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        masters = []
+        for chunk in chunked(pep_ids, self.chunk_size):
+            response = self._with_retry(
+                lambda: self.client.table('pep_master').select('id, current_version_id').in_('id', chunk).execute(),
+                "lecture de pep_master"
+            )
+            masters.extend(response.data)
+
+        version_to_pep = {m['current_version_id']: m['id'] for m in masters if m.get('current_version_id')}
+        current = {}
+        for chunk in chunked(list(version_to_pep), self.chunk_size):
+            response = self._with_retry(
+                lambda: self.client.table('pep_version').select('version_id, data_jsonb').in_('version_id', chunk).execute(),
+                "lecture de pep_version"
+            )
+            for row in response.data:
+                current[version_to_pep[row['version_id']]] = row['data_jsonb']
+        return current
+
+    def write_plan(self, plan: VersionPlan, checkpoints: Optional[RunCheckpoints] = None, batch_no: Optional[int] = None):
+        payload = plan_payload(plan)
+        if checkpoints is not None and checkpoints.enabled:
+            payload["checkpoint"] = {"run_id": checkpoints.run_id, "country_code": self.country_code, "batch_no": batch_no}
+        # Un appel relancé après une réponse perdue ne réécrit pas un lot déjà marqué chargé
+        response = self._with_retry(
+            lambda: self.client.rpc('load_version_plan', {"plan": payload}).execute(),
+            f"chargement du lot ({len(plan.versions)} versions)"
+        )
+        if response.data is False:
+            print(f"Lot {batch_no} déjà chargé: ignoré.")
+
+def plan_payload(plan: VersionPlan) -> Dict[str, Any]:
+    """Plan de versioning au format JSON attendu par la fonction SQL load_version_plan."""
+    # Aller-retour JSON: dataclasses, dates et décimaux convertis comme pour le COPY
+    return loads(dumps({
+        "master_inserts": list(plan.master_inserts.values()),
+        "versions": [{**v, "valid_period": format_period(*v["valid_period"])} for v in plan.versions],
+        "master_updates": [
+            {"id": pep_id, "current_version_id": version_id, "current_version_at": plan.now}
+            for pep_id, version_id in plan.master_updates.items()
+        ],
+        "audits": plan.audits,
+        "aliases": plan.aliases,
+        "events": plan.events,
+    }))
+
+BACKENDS = {
+    PostgresBackend.name: PostgresBackend,
+    SupabaseBackend.name: SupabaseBackend,
+}
+
+def get_storage_backend(country_code: str, instrumentation: Optional[Instrumentation] = None,
+                        name: Optional[str] = None, **kwargs) -> StorageBackend:
+    """
+    Retourne le backend de stockage demandé (PEP_STORAGE_BACKEND: 'postgres' par défaut, ou
+    'supabase'). Le backend ne concerne que l'écriture des lots: le reste du pipeline lit et écrit
+    directement dans PostgreSQL (voir pep_etl.require_database), DATABASE_URL est donc requis
+    dans les deux cas.
+    """
+    name = name or os.environ.get("PEP_STORAGE_BACKEND", "postgres")
+    if name not in BACKENDS:
+        raise ValueError(f"Backend de stockage inconnu: {name}. Valeurs possibles: {', '.join(BACKENDS)}")
+    return BACKENDS[name](country_code, instrumentation, **kwargs)
@@ -1,16 +1,37 @@
-import spacy
-from fuzzywuzzy import fuzz
+import threading
 from datetime import datetime, timezone
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from urllib.parse import urlparse
 from src.db_connector import DBConnector
+from src.etl.instrumentation import Instrumentation
+from src.etl.articles import prepare_articles
+from src.etl.entity_resolution import EntityResolver
+from src.etl.models import PepCandidate, PepCluster, PepRecord, Position, SourceReference, TransformedRecord
 import uuid
 
-# Charger le modèle de PNL français
-try:
-    nlp = spacy.load("fr_core_news_sm")
-except OSError:
-    print("Modèle fr_core_news_sm non trouvé. Veuillez l'installer avec 'python3 -m spacy download fr_core_news_sm'")
-    nlp = None
+NLP_MODEL_NAME = "fr_core_news_sm"
+
+# Le modèle de PNL français est chargé au premier usage (et non à l'import),
+# pour que l'API et l'exporteur ne paient pas son chargement.
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """Retourne le modèle spaCy, chargé une seule fois par processus (None si absent)."""
+    global _nlp, _nlp_loaded
+    if _nlp_loaded:
+        return _nlp
+    with _nlp_lock:
+        if not _nlp_loaded:
+            import spacy
+            try:
+                _nlp = spacy.load(NLP_MODEL_NAME)
+            except OSError:
+                print(f"Modèle {NLP_MODEL_NAME} non trouvé. Veuillez l'installer avec 'python3 -m spacy download {NLP_MODEL_NAME}'")
+                _nlp = None
+            _nlp_loaded = True
+    return _nlp
 
 class Transformer:
     """
@@ -18,10 +39,11 @@ class Transformer:
     Normalisation, Extraction d'Entités Nommées (PNL), Déduplication et Scoring.
     """
     
-    def __init__(self, config: Dict[str, Any]):
+    def __init__(self, config: Dict[str, Any], instrumentation: Optional[Instrumentation] = None):
         self.config = config
         self.country_code = config.get('country_code', 'MA')
         self.source_weights = self._get_source_weights()
+        self.instrumentation = instrumentation or Instrumentation()
 
     def _get_source_weights(self) -> Dict[str, float]:
         """Compile les poids des sources pour le calcul du score de confiance."""
@@ -40,10 +62,12 @@ class Transformer:
 
     def extract_entities(self, text: str) -> List[Dict[str, str]]:
         """Utilise le PNL pour l'Extraction d'Entités Nommées (EEN)."""
+        nlp = get_nlp()
         if not nlp:
             return []
         
-        doc = nlp(text)
+        with self.instrumentation.timer("transform.ner"):
+            doc = nlp(text)
         entities = []
         
         # Simuler l'extraction de Personnes (PER) et d'Organisations (ORG) pertinentes
@@ -58,69 +82,54 @@ class Transformer:
                 
         return entities
 
-    def calculate_confidence_score(self, source_urls: List[str]) -> float:
-        """Calcule le score de confiance basé sur la pondération des sources."""
-        score = 0.0
-        unique_urls = set(source_urls)
-        
-        for url in unique_urls:
-            score += self.source_weights.get(url, 0.0) # 0.0 si la source n'est pas répertoriée
-            
-        return min(score, 1.0) # Plafonner le score à 1.0
+    def source_weight(self, url: str) -> float:
+        """Poids de la source déclarée dont relève url (URL racine, sinon même domaine)."""
+        if url in self.source_weights:
+            return self.source_weights[url]
+        domain = urlparse(url).netloc
+        for source_url, weight in self.source_weights.items():
+            if urlparse(source_url).netloc == domain:
+                return weight
+        return 0.0 # 0.0 si la source n'est pas répertoriée
 
-    def find_potential_pep(self, full_name: str) -> Dict[str, Any]:
+    def calculate_confidence_score(self, source_urls: List[str], article_weights: Optional[Dict[str, float]] = None) -> float:
         """
-        Recherche dans la base de données un PEP existant par déduplication (fuzzy matching).
-        Retourne l'enregistrement maître si trouvé, sinon None.
+        Calcule le score de confiance basé sur la pondération des sources. Les URLs sont
+        celles des articles: leur poids est celui calculé à l'extraction (article_weights),
+        sinon celui de la source déclarée du même domaine.
         """
-        normalized_name = self.normalize_text(full_name)
+        score = 0.0
+        unique_urls = sorted(set(source_urls)) # ordre fixe: même somme à chaque exécution
+        article_weights = article_weights or {}
         
-        # 1. Recherche exacte (simulée)
-        with DBConnector() as db:
-            # Récupérer tous les noms de PEP actifs pour le pays
-            query = """
-            SELECT pm.id, pm.master_name, pv.data_jsonb->>'full_name' AS current_full_name
-            FROM pep_master pm
-            JOIN pep_version pv ON pm.current_version_id = pv.version_id
-            WHERE pm.country_code = %s;
-            """
-            existing_peps = db.execute(query, (self.country_code,), fetch=True)
-            
-            best_match = None
-            highest_score = 85 # Seuil de similarité pour le fuzzy matching
-            
-            for pep in existing_peps:
-                # 2. Fuzzy Matching (basé sur le nom complet actuel)
-                score = fuzz.token_sort_ratio(normalized_name, self.normalize_text(pep['current_full_name']))
-                
-                if score > highest_score:
-                    highest_score = score
-                    best_match = pep
-            
-            if best_match:
-                print(f"Déduplication: Correspondance trouvée pour '{full_name}' avec '{best_match['current_full_name']}' (Score: {highest_score}).")
-                return best_match
+        for url in unique_urls:
+            weight = article_weights.get(url)
+            score += weight if weight is not None else self.source_weight(url)
             
-            return None
+        return min(score, 1.0) # Plafonner le score à 1.0
 
-    def process_raw_data(self, raw_data: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def process_raw_data(self, raw_data: List[Dict[str, Any]]) -> List[TransformedRecord]:
         """
         Processus principal de transformation:
         1. Insertion des sources dans la DB.
-        2. Extraction des entités.
+        2. Nettoyage des articles et fusion des quasi-doublons (src/etl/articles.py), puis
+           extraction des entités (une fois par groupe, pour toutes les URLs du groupe).
         3. Création des enregistrements PPE potentiels.
-        4. Déduplication.
+        4. Déduplication (résolution d'entités sur tout le lot).
         """
         
         # Étape 1: Insertion des sources dans la DB (pour obtenir les source_id)
         source_ids = {}
-        with DBConnector() as db:
+        # Date de publication enregistrée dans source_document (celle de la première collecte)
+        source_dates = {}
+        article_weights = {}
+        with DBConnector(self.instrumentation) as db:
             for i, source in enumerate(raw_data):
                 query = """
                 INSERT INTO source_document (url, title, snippet, publish_date, raw_data_path)
                 VALUES (%s, %s, %s, %s, %s)
                 ON CONFLICT (url) DO UPDATE SET title = EXCLUDED.title
-                RETURNING source_id;
+                RETURNING source_id, publish_date;
                 """
                 title = f"Source {i+1} - {source['source_type']}"
                 snippet = source['content'][:50] + "..."
@@ -129,43 +138,71 @@ class Transformer:
                 # Simuler le chemin vers le Data Lake
                 raw_data_path = f"/data/{self.country_code}/{source['source_type']}_{i}.html"
                 
-                source_id = db.execute(query, (source['url'], title, snippet, date_str, raw_data_path), fetch=True)[0]['source_id']
+                row = db.execute(query, (source['url'], title, snippet, date_str, raw_data_path), fetch=True)[0]
+                source_id = row['source_id']
                 source_ids[source['url']] = source_id
+                source_dates[source_id] = row['publish_date'].isoformat() if row['publish_date'] else None
+                if source.get('weight') is not None:
+                    article_weights[source['url']] = float(source['weight'])
         
         # Étape 2: Extraction des entités et création des enregistrements PPE potentiels
-        potential_peps = {} # {full_name: {sources: [], positions: []...}}
+        potential_peps: Dict[str, PepCandidate] = {}
         
-        for source in raw_data:
+        articles = prepare_articles(raw_data, self.instrumentation)
+        for source in articles:
             entities = self.extract_entities(source['content'])
+            self.instrumentation.count("entities_extracted", len(entities))
             
             # Logique simplifiée: si une PERSONNE et un TITRE DE POSTE sont trouvés ensemble
             person_names = [e['text'] for e in entities if e['label'] == 'PER']
             job_titles = [e['text'] for e in entities if e['label'] == 'JOB_TITLE']
             
             for name in person_names:
-                if name not in potential_peps:
-                    potential_peps[name] = {"sources": [], "positions": []}
+                candidate = potential_peps.get(name)
+                if candidate is None:
+                    candidate = potential_peps[name] = PepCandidate()
                 
-                # Ajouter la source
-                source_url = source['url']
-                source_id = source_ids[source_url]
+                # Ajouter la source (et les reprises du même article)
+                source_id = source_ids[source['url']]
                 
-                potential_peps[name]['sources'].append(source_url)
+                candidate.sources.extend(source['urls'])
                 
                 # Ajouter la position (si un titre de poste est trouvé)
                 if job_titles:
-                    potential_peps[name]['positions'].append({
-                        "title": job_titles[0],
-                        "institution": "Institution Déduite (Simulée)",
-                        "source_id": source_id
-                    })
+                    candidate.positions.append(Position(
+                        title=job_titles[0],
+                        institution="Institution Déduite (Simulée)",
+                        source_id=source_id
+                    ))
+        
+        # Étape 3: Résolution d'entités sur l'ensemble du lot (un seul passage, une seule
+        # lecture du registre): les variantes d'un même nom rejoignent un seul PEP maître
+        resolver = EntityResolver(self.country_code, self.instrumentation)
+        with self.instrumentation.timer("transform.entity_resolution"):
+            resolutions = resolver.resolve(list(potential_peps))
         
-        # Étape 3: Vérification et Finalisation des enregistrements
-        final_records = []
-        for full_name, data in potential_peps.items():
+        clusters: Dict[str, PepCluster] = {}
+        for name, candidate in potential_peps.items():
+            resolution = resolutions[name]
+            cluster = clusters.get(resolution['pep_id'])
+            if cluster is None:
+                cluster = clusters[resolution['pep_id']] = PepCluster(
+                    full_name=resolution['canonical_name'], existing=resolution['existing']
+                )
+            cluster.variants.append(name)
+            cluster.sources.extend(candidate.sources)
+            cluster.positions.extend(candidate.positions)
+        
+        self.instrumentation.count("dedup_hits", sum(1 for c in clusters.values() if c.existing))
+        self.instrumentation.count("er_merged_names", len(potential_peps) - len(clusters))
+        
+        # Étape 4: Vérification et Finalisation des enregistrements
+        final_records: List[TransformedRecord] = []
+        for pep_id, cluster in clusters.items():
+            full_name = cluster.full_name
             
             # Calcul du score de confiance
-            confidence_score = self.calculate_confidence_score(data['sources'])
+            confidence_score = self.calculate_confidence_score(cluster.sources, article_weights)
             
             # Appliquer la règle de vérification (score >= 0.6 pour auto-création)
             if confidence_score < 0.6:
@@ -173,46 +210,42 @@ class Transformer:
             else:
                 status = "active"
             
-            # Déduplication
-            master_record = self.find_potential_pep(full_name)
-            if master_record:
-                pep_id = master_record['id']
-            else:
-                pep_id = str(uuid.uuid4())
-            
             now = datetime.now(timezone.utc).isoformat()
             
             # Création du corps JSONB (simplifié)
-            pep_record = {
-                "id": pep_id,
-                "full_name": full_name,
-                "aliases": [self.normalize_text(full_name)],
-                "gender": None,
-                "date_of_birth": None,
-                "nationality": [self.country_code],
-                "relationship_type": ["DomesticPEP"], # Simplifié
-                "current_positions": data['positions'],
-                "past_positions": [],
-                "family_members": [],
-                "associated_entities": [],
-                "sanctions_match": [],
-                "confidence_score": confidence_score,
-                "source_documents": [
-                    {"source_id": source_ids[url], "snippet": "Snippet simulé...", "publish_date": now[:10]}
-                    for url in set(data['sources'])
+            pep_record = PepRecord(
+                id=pep_id,
+                full_name=full_name,
+                aliases=list(dict.fromkeys(self.normalize_text(n) for n in [full_name] + cluster.variants)),
+                gender=None,
+                date_of_birth=None,
+                nationality=[self.country_code],
+                relationship_type=["DomesticPEP"], # Simplifié
+                current_positions=sorted(cluster.positions, key=lambda p: (p.source_id or 0, p.title, p.institution)),
+                past_positions=[],
+                family_members=[],
+                associated_entities=[],
+                sanctions_match=[],
+                confidence_score=confidence_score,
+                # Ordre et dates stables d'une exécution à l'autre: le corps d'un PEP inchangé
+                # garde la même forme canonique (pas de nouvelle version, voir storage.canonical_json)
+                source_documents=[
+                    SourceReference(source_id=source_id, snippet="Snippet simulé...", publish_date=source_dates[source_id])
+                    for source_id in sorted({source_ids[url] for url in cluster.sources})
                 ],
-                "first_seen": now,
-                "last_updated": now,
-                "status": status,
-                "notes": f"Enregistrement créé par le pipeline ETL. Score: {confidence_score}"
-            }
+                first_seen=now,
+                last_updated=now,
+                status=status,
+                notes=f"Enregistrement créé par le pipeline ETL. Score: {confidence_score}"
+            )
             
-            final_records.append({
-                "pep_id": pep_id,
-                "record": pep_record,
-                "confidence_score": confidence_score,
-                "status": status
-            })
+            final_records.append(TransformedRecord(
+                pep_id=pep_id,
+                record=pep_record,
+                confidence_score=confidence_score,
+                status=status,
+                variants=cluster.variants
+            ))
             
         return final_records
 
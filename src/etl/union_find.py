@@ -0,0 +1,43 @@
+"""
+Structure union-find, partagée par la résolution d'entités (src/etl/entity_resolution.py)
+et la fusion des quasi-doublons d'articles (src/etl/articles.py).
+"""
+from collections import defaultdict
+from typing import Any, Dict, List
+
+class UnionFind:
+    """Structure union-find (compression de chemin + union par rang)."""
+
+    def __init__(self):
+        self.parent: Dict[Any, Any] = {}
+        self.rank: Dict[Any, int] = {}
+
+    def add(self, node):
+        if node not in self.parent:
+            self.parent[node] = node
+            self.rank[node] = 0
+
+    def find(self, node):
+        root = node
+        while self.parent[root] != root:
+            root = self.parent[root]
+        # Compression de chemin
+        while self.parent[node] != root:
+            self.parent[node], node = root, self.parent[node]
+        return root
+
+    def union(self, a, b):
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a == root_b:
+            return
+        if self.rank[root_a] < self.rank[root_b]:
+            root_a, root_b = root_b, root_a
+        self.parent[root_b] = root_a
+        if self.rank[root_a] == self.rank[root_b]:
+            self.rank[root_a] += 1
+
+    def groups(self) -> Dict[Any, List[Any]]:
+        groups = defaultdict(list)
+        for node in self.parent:
+            groups[self.find(node)].append(node)
+        return groups
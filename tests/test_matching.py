@@ -0,0 +1,34 @@
+"""Scores figés du moteur de scoring fuzzy (src/etl/matching.py)."""
+import numpy as np
+import pytest
+
+from src.etl.matching import best_matches, is_match, rounded, score_matrix
+
+
+@pytest.mark.parametrize("query, choice, expected", [
+    ("aziz akhannouch", "akhannouch aziz", 100),  # ordre des jetons ignoré
+    ("Aziz Akhannouch", "aziz akhanouch", 97),
+    ("aziz akhannouch", "aziz akhanneu", 86),  # 85.71: arrondi à 86, correspondance
+    ("rachid talbi alami", "rachid talbi", 80),
+    ("Aziz Akhannouch", "Abdellatif Hammouchi", 46),
+    # Accents retirés avant scoring (fuzzywuzzy supprimait les caractères non ASCII)
+    ("Hélène Benali", "helene benali", 100),
+    ("Saâd Eddine El Othmani", "saad eddine el othmani", 100),
+    ("عزيز أخنوش", "عزيز اخنوش", 100),
+])
+def test_pinned_scores(query, choice, expected):
+    scores = score_matrix([query], [choice], score_cutoff=0)
+    assert rounded(scores)[0, 0] == expected
+    assert bool(is_match(scores)[0, 0]) == (expected > 85)
+
+
+def test_best_matches():
+    choices = ["nizar barakat", "nizar baraka", "helene benali", "fouzi lekjaâ"]
+    queries = ["M. Nizar Baraka", "Fouzi Lekjaa", "Hélène Benali", "Abdellatif Hammouchi"]
+    assert best_matches(queries, choices) == [(1, 92), (3, 100), (2, 100), None]
+
+
+def test_best_matches_without_choices():
+    assert best_matches(["nizar baraka"], []) == [None]
+    assert score_matrix(["nizar baraka"], []).shape == (1, 0)
+    assert np.array_equal(is_match(np.array([[85.0, 85.4, 85.6]])), np.array([[False, False, True]]))